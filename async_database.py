@@ -0,0 +1,293 @@
+import asyncio
+import functools
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Optional, Set, Tuple
+
+from config import METRICS_ENABLED
+from database import Database, VACUUM_STEP_PAGES
+from metrics import timed_call
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncDatabase:
+    """Database metodlarini event loop ni bloklamasdan chaqirish uchun o'ram.
+
+    Yozuvlar bitta alohida writer oqimida ketma-ket bajariladi, o'qishlar esa
+    bir nechta reader oqimlarida parallel ishlaydi. Har bir oqim o'zining
+    doimiy WAL connectionidan foydalanadi.
+    """
+
+    def __init__(self, database: Database, reader_threads: int = 4):
+        self.db = database
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix='db-writer')
+        self._readers = ThreadPoolExecutor(max_workers=reader_threads, thread_name_prefix='db-reader')
+
+    async def _run(self, executor, func, *args, **kwargs):
+        if METRICS_ENABLED:
+            func = timed_call(func)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(executor, functools.partial(func, *args, **kwargs))
+
+    async def _read(self, func, *args, **kwargs):
+        return await self._run(self._readers, func, *args, **kwargs)
+
+    async def _write(self, func, *args, **kwargs):
+        return await self._run(self._writer, func, *args, **kwargs)
+
+    async def migrate(self) -> int:
+        return await self._write(self.db.migrate)
+
+    def close(self):
+        """Oqimlarni to'xtatish va connectionlarni yopish"""
+        self._writer.shutdown(wait=True)
+        self._readers.shutdown(wait=True)
+        self.db.close()
+
+    # ============ USER OPERATIONS ============
+
+    async def add_user(self, user_id: int, username: str = None, first_name: str = None, last_name: str = None):
+        return await self._write(self.db.add_user, user_id, username, first_name, last_name)
+
+    async def add_users(self, users: List[Tuple[int, str, str, str]]):
+        return await self._write(self.db.add_users, users)
+
+    async def get_all_users(self) -> List[int]:
+        return await self._read(self.db.get_all_users)
+
+    async def get_user_ids_page(self, after_user_id: int, limit: int) -> List[int]:
+        return await self._read(self.db.get_user_ids_page, after_user_id, limit)
+
+    async def mark_users_blocked(self, user_ids: List[int]):
+        return await self._write(self.db.mark_users_blocked, user_ids)
+
+    # ============ TEST OPERATIONS ============
+
+    async def add_test(self, test_id: int, answers: str, created_by: int) -> Optional[Dict]:
+        return await self._write(self.db.add_test, test_id, answers, created_by)
+
+    async def add_tests_bulk(self, tests: List[Tuple[int, str]], created_by: int) -> Dict:
+        return await self._write(self.db.add_tests_bulk, tests, created_by)
+
+    async def regrade_test(self, test_id: int) -> Optional[Dict]:
+        return await self._write(self.db.regrade_test, test_id)
+
+    async def get_test(self, test_id: int) -> Optional[str]:
+        return await self._read(self.db.get_test, test_id)
+
+    async def load_answer_keys(self):
+        return await self._read(self.db.load_answer_keys)
+
+    @property
+    def tests_version(self) -> int:
+        return self.db.tests_version
+
+    async def get_all_tests(self, include_archived: bool = True) -> List[int]:
+        return await self._read(self.db.get_all_tests, include_archived)
+
+    # ============ USER ANSWER OPERATIONS ============
+
+    async def save_user_answer(self, user_id: int, test_id: int, user_answer: str,
+                               correct_count: int, total_count: int) -> bool:
+        return await self._write(self.db.save_user_answer, user_id, test_id, user_answer,
+                                 correct_count, total_count)
+
+    async def submit_answer(self, user_id: int, test_id: int, user_answer: str) -> Dict:
+        return await self._write(self.db.submit_answer, user_id, test_id, user_answer)
+
+    async def import_answer_sheets(self, rows: List[Tuple[int, object, int, str]]) -> Dict:
+        return await self._write(self.db.import_answer_sheets, rows)
+
+    async def has_user_submitted(self, user_id: int, test_id: int) -> bool:
+        return await self._read(self.db.has_user_submitted, user_id, test_id)
+
+    async def get_leaderboard(self, test_id: int, limit: int = 10) -> List[Dict]:
+        return await self._read(self.db.get_leaderboard, test_id, limit)
+
+    async def get_user_rank(self, user_id: int, test_id: int) -> Optional[Dict]:
+        return await self._read(self.db.get_user_rank, user_id, test_id)
+
+    # ============ GLOBAL LEADERBOARD ============
+
+    async def get_global_leaderboard(self, limit: int = 10) -> List[Dict]:
+        return await self._read(self.db.get_global_leaderboard, limit)
+
+    async def get_user_global_rank(self, user_id: int) -> Optional[Dict]:
+        return await self._read(self.db.get_user_global_rank, user_id)
+
+    # ============ QUESTION STATISTICS ============
+
+    async def rebuild_question_stats(self, test_id: int) -> bool:
+        return await self._write(self.db.rebuild_question_stats, test_id)
+
+    async def get_question_stats(self, test_id: int) -> Optional[List[Dict]]:
+        return await self._read(self.db.get_question_stats, test_id)
+
+    # ============ ARCHIVE OPERATIONS ============
+
+    async def archive_test(self, test_id: int) -> Optional[Dict]:
+        return await self._write(self.db.archive_test, test_id)
+
+    def is_test_archived(self, test_id: int) -> bool:
+        return self.db.is_test_archived(test_id)
+
+    async def get_storage_stats(self) -> Dict:
+        return await self._read(self.db.get_storage_stats)
+
+    async def check_auto_vacuum(self) -> bool:
+        """auto_vacuum INCREMENTAL ekanini tekshirish, bo'lmasa operatorga ogohlantirish
+
+        Pragma faqat yangi database da darhol kuchga kiradi, eskisida bir
+        martalik to'liq VACUUM kerak (ishga tushishda va compact() da tekshiriladi).
+        """
+        if (await self.get_storage_stats())['incremental']:
+            return True
+        logger.warning(
+            f"{self.db.db_path}: auto_vacuum INCREMENTAL emas, arxivlangan javoblar joyi "
+            f"fayldan qaytarilmaydi. Bot to'xtatilganda bir marta: "
+            f"sqlite3 {self.db.db_path} 'PRAGMA auto_vacuum = INCREMENTAL; VACUUM;'"
+        )
+        return False
+
+    async def compact(self, pages: int = VACUUM_STEP_PAGES) -> Dict:
+        """Bo'sh sahifalarni qismlab qaytarish (qadamlar orasida boshqa yozuvlar o'tadi)"""
+        if not await self.check_auto_vacuum():
+            return await self.get_storage_stats()
+
+        while await self._write(self.db.vacuum_step, pages):
+            pass
+        await self._write(self.db.checkpoint)
+        return await self.get_storage_stats()
+
+    # ============ CHANNEL OPERATIONS ============
+
+    async def add_channel(self, channel_id: str, channel_name: str = None):
+        return await self._write(self.db.add_channel, channel_id, channel_name)
+
+    async def remove_channel(self, channel_id: str):
+        return await self._write(self.db.remove_channel, channel_id)
+
+    @property
+    def channels_version(self) -> int:
+        return self.db.channels_version
+
+    async def get_all_channels(self) -> List[Tuple[str, str]]:
+        # Kesh issiq bo'lsa oqimga o'tkazmasdan darhol qaytaramiz
+        cached = self.db.get_cached_channels()
+        if cached is not None:
+            return cached
+        return await self._read(self.db.get_all_channels)
+
+    # ============ SUBSCRIPTION STATE OPERATIONS ============
+
+    async def set_channel_member(self, channel_id: str, user_id: int, is_member: bool):
+        return await self._write(self.db.set_channel_member, channel_id, user_id, is_member)
+
+    async def clear_channel_members(self, channel_id: str):
+        return await self._write(self.db.clear_channel_members, channel_id)
+
+    async def get_channel_members(self) -> List[Tuple[str, int, bool]]:
+        return await self._read(self.db.get_channel_members)
+
+    # ============ PERSISTENCE OPERATIONS ============
+
+    async def get_persistence_data(self, kind: str) -> Dict[int, str]:
+        return await self._read(self.db.get_persistence_data, kind)
+
+    async def get_persistence_entry(self, kind: str, key: int) -> Optional[str]:
+        return await self._read(self.db.get_persistence_entry, kind, key)
+
+    async def save_persistence_data(self, rows: List[Tuple[str, int, Optional[str]]]):
+        await self._write(self.db.save_persistence_data, rows)
+
+    # ============ BROADCAST OPERATIONS ============
+
+    async def create_broadcast_job(self, text: str, chat_id: int, message_id: int = None) -> int:
+        return await self._write(self.db.create_broadcast_job, text, chat_id, message_id)
+
+    async def update_broadcast_progress(self, job_id: int, last_user_id: int, sent_count: int,
+                                        failed_count: int, blocked_count: int):
+        return await self._write(self.db.update_broadcast_progress, job_id, last_user_id,
+                                 sent_count, failed_count, blocked_count)
+
+    async def record_broadcast_delivery(self, job_id: int, user_id: int, result: str):
+        await self._write(self.db.record_broadcast_delivery, job_id, user_id, result)
+
+    async def get_broadcast_delivered(self, job_id: int, user_ids: List[int]) -> Set[int]:
+        return await self._read(self.db.get_broadcast_delivered, job_id, user_ids)
+
+    async def get_broadcast_counts(self, job_id: int) -> Dict[str, int]:
+        return await self._read(self.db.get_broadcast_counts, job_id)
+
+    async def finish_broadcast_job(self, job_id: int, status: str = 'done'):
+        return await self._write(self.db.finish_broadcast_job, job_id, status)
+
+    async def get_broadcast_job(self, job_id: int) -> Optional[Dict]:
+        return await self._read(self.db.get_broadcast_job, job_id)
+
+    async def get_running_broadcast_jobs(self) -> List[Dict]:
+        return await self._read(self.db.get_running_broadcast_jobs)
+
+
+class UserWriteBuffer:
+    """Foydalanuvchi yozuvlarini yig'ib, guruh bilan saqlovchi write-behind bufer.
+
+    add() faqat xotiraga yozadi; bufer har flush_interval soniyada yoki
+    max_rows ta yozuv yig'ilganda bitta executemany tranzaksiyasida
+    saqlanadi. Bitta foydalanuvchining bir nechta yozuvidan oxirgisi olinadi.
+    stop() qolgan yozuvlarni saqlab bo'lgach qaytadi.
+    """
+
+    def __init__(self, db: AsyncDatabase, flush_interval: float = 0.2, max_rows: int = 500):
+        self.db = db
+        self.flush_interval = flush_interval
+        self.max_rows = max_rows
+        self._pending: Dict[int, Tuple[int, str, str, str]] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+
+    def add(self, user_id: int, username: str = None, first_name: str = None, last_name: str = None):
+        self._pending[user_id] = (user_id, username, first_name, last_name)
+        if len(self._pending) >= self.max_rows:
+            self._wakeup.set()
+
+    async def flush(self):
+        """Buferdagi barcha yozuvlarni saqlash"""
+        async with self._flush_lock:
+            if not self._pending:
+                return
+
+            rows, self._pending = self._pending, {}
+            try:
+                await self.db.add_users(list(rows.values()))
+            except Exception as e:
+                logger.error(f"Foydalanuvchilarni saqlashda xato: {e}")
+                # Keyingi urinishda saqlash uchun qaytaramiz (yangi yozuvlar ustun)
+                rows.update(self._pending)
+                self._pending = rows
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Fon vazifasini to'xtatib, qolgan yozuvlarni saqlash"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
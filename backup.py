@@ -0,0 +1,162 @@
+import asyncio
+import glob
+import logging
+import os
+import pathlib
+import sqlite3
+import time
+from datetime import datetime
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_PREFIX = 'backup-'
+ARCHIVE_SNAPSHOT_PREFIX = 'archive-'
+SNAPSHOT_SUFFIX = '.db'
+
+# Bot API orqali yuborish mumkin bo'lgan fayl hajmi
+MAX_DOCUMENT_SIZE = 50 * 1024 * 1024
+
+
+def backup_database(source_path: str, dest_path: str, pages: int = 256, sleep: float = 0.005) -> Dict:
+    """Database ning izchil nusxasini olish (sqlite3 backup API)
+
+    Nusxa alohida faqat o'qish uchun ulanishdan olinadi. Bu ulanish
+    nusxalash tugaguncha o'qish tranzaksiyasini ochiq tutadi, shuning uchun
+    WAL snapshoti qotib qoladi: yozuvchilar ishlashda davom etadi, lekin
+    nusxa boshidan boshlanmaydi (tranzaksiyasiz manba har yozuvdan keyin
+    nusxalashni qaytadan boshlardi). Nusxa pages sahifadan qadamlab olinadi,
+    qadamlar orasida sleep soniya kutiladi. Nusxalash davomida checkpoint
+    snapshotdan keyingi yozuvlarni ko'chira olmaydi, WAL vaqtincha o'sadi.
+
+    Nusxa avval vaqtinchalik faylga yoziladi va tayyor bo'lgach nomi
+    o'zgartiriladi.
+    """
+    tmp_path = dest_path + '.tmp'
+    stats = {'steps': 0, 'restarts': 0}
+    last_remaining = None
+
+    def progress(status, remaining, total):
+        nonlocal last_remaining
+        stats['steps'] += 1
+        if last_remaining is not None and remaining > last_remaining:
+            stats['restarts'] += 1
+        last_remaining = remaining
+        # backup() ning sleep parametri faqat BUSY/LOCKED da kutadi,
+        # qadamlar orasidagi tanaffus shu yerda
+        if remaining:
+            time.sleep(sleep)
+
+    started = time.perf_counter()
+    source = sqlite3.connect(f'{pathlib.Path(source_path).absolute().as_uri()}?mode=ro', uri=True)
+    try:
+        # O'qish tranzaksiyasi birinchi o'qishda boshlanadi va snapshotni ushlab turadi
+        source.execute('BEGIN')
+        source.execute('SELECT COUNT(*) FROM sqlite_master').fetchone()
+        dest = sqlite3.connect(tmp_path)
+        try:
+            source.backup(dest, pages=pages, progress=progress, sleep=sleep)
+        finally:
+            dest.close()
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    finally:
+        source.close()
+
+    os.replace(tmp_path, dest_path)
+    stats['seconds'] = time.perf_counter() - started
+    stats['size'] = os.path.getsize(dest_path)
+    return stats
+
+
+class BackupManager:
+    """Database ning davriy zaxira nusxalari.
+
+    Nusxalar backup_dir da vaqt belgisi bilan saqlanadi, eng yangi keep
+    tasi qoladi. Nusxalash alohida oqimda va alohida ulanish orqali
+    bajariladi, writer oqimi band qilinmaydi.
+
+    archive_path berilsa, arxiv database ham xuddi shu vaqt belgisi bilan
+    yoniga nusxalanadi. Avval asosiy, keyin arxiv nusxalanadi: arxivlash
+    javoblarni avval arxivga yozib, keyin asosiy jadvaldan o'chiradi,
+    shuning uchun har bir javob kamida bitta nusxada bo'ladi.
+    """
+
+    def __init__(self, db_path: str, backup_dir: str, keep: int = 5,
+                 pages: int = 256, sleep: float = 0.005, archive_path: str = None):
+        self.db_path = db_path
+        self.archive_path = archive_path
+        self.backup_dir = backup_dir
+        self.keep = keep
+        self.pages = pages
+        self.sleep = sleep
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    def snapshots(self) -> List[str]:
+        """Mavjud nusxalar (eskidan yangiga)"""
+        return sorted(glob.glob(os.path.join(self.backup_dir, f'{SNAPSHOT_PREFIX}*{SNAPSHOT_SUFFIX}')))
+
+    def latest(self) -> Optional[str]:
+        snapshots = self.snapshots()
+        return snapshots[-1] if snapshots else None
+
+    def archive_snapshot(self, path: str) -> Optional[str]:
+        """Asosiy nusxa yonidagi arxiv nusxasi (bo'lmasa None)"""
+        name = os.path.basename(path).replace(SNAPSHOT_PREFIX, ARCHIVE_SNAPSHOT_PREFIX, 1)
+        archive = os.path.join(os.path.dirname(path), name)
+        return archive if os.path.exists(archive) else None
+
+    def _rotate(self):
+        for path in self.snapshots()[:-self.keep]:
+            archive = self.archive_snapshot(path)
+            if archive:
+                os.remove(archive)
+            os.remove(path)
+
+    async def run_backup(self) -> str:
+        """Yangi nusxa olish va eskilarini o'chirish (nusxa yo'lini qaytaradi)"""
+        async with self._lock:
+            os.makedirs(self.backup_dir, exist_ok=True)
+            name = f"{SNAPSHOT_PREFIX}{datetime.now().strftime('%Y%m%d-%H%M%S')}{SNAPSHOT_SUFFIX}"
+            path = os.path.join(self.backup_dir, name)
+
+            stats = await asyncio.to_thread(backup_database, self.db_path, path, self.pages, self.sleep)
+            if self.archive_path and os.path.exists(self.archive_path):
+                archive_path = os.path.join(self.backup_dir, name.replace(SNAPSHOT_PREFIX, ARCHIVE_SNAPSHOT_PREFIX, 1))
+                archive_stats = await asyncio.to_thread(
+                    backup_database, self.archive_path, archive_path, self.pages, self.sleep
+                )
+                stats['size'] += archive_stats['size']
+                stats['seconds'] += archive_stats['seconds']
+            self._rotate()
+
+        logger.info(
+            f"Zaxira nusxa: {name}, {stats['size'] / 1024 / 1024:.1f} MB, "
+            f"{stats['seconds']:.1f} s, qadamlar: {stats['steps']}, qayta boshlanish: {stats['restarts']}"
+        )
+        return path
+
+    async def _run(self, interval: float):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.run_backup()
+            except Exception as e:
+                logger.error(f"Zaxira nusxa olishda xato: {e}")
+
+    def start(self, interval: float):
+        """Har interval soniyada nusxa olishni boshlash"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(interval))
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
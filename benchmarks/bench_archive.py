@@ -0,0 +1,109 @@
+"""
+Arxivlash benchmarki: --tests ta testdan --archive tasi yopiladi.
+
+O'lchanadi: arxivlash va incremental vacuum vaqti, asosiy fayl hajmi,
+ochiq testga javob topshirish kechikishi va arxivlangan test
+leaderboardini (keshsiz) o'qish vaqti.
+
+Ishga tushirish:
+    python benchmarks/bench_archive.py --tests 20 --answers 20000 --archive 15
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from async_database import AsyncDatabase
+from database import Database
+
+QUESTIONS = 50
+
+
+async def submit_latency(db: AsyncDatabase, test_id: int, user_ids, count: int = 500) -> float:
+    """Ochiq testga javob topshirishning median kechikishi (ms)"""
+    latencies = []
+    for _ in range(count):
+        started = time.perf_counter()
+        await db.submit_answer(next(user_ids), test_id, 'a' * QUESTIONS)
+        latencies.append(time.perf_counter() - started)
+    return statistics.median(latencies) * 1000
+
+
+async def run(args, db_path: str, rng: random.Random):
+    db = AsyncDatabase(Database(db_path))
+    await db.migrate()
+    await db.add_users([(user_id, None, f"User {user_id}", None) for user_id in range(1, args.answers + 1)])
+    await db.add_tests_bulk(
+        [(test_id, ''.join(rng.choice('abcd') for _ in range(QUESTIONS))) for test_id in range(1, args.tests + 1)],
+        created_by=0
+    )
+    for test_id in range(1, args.tests + 1):
+        rows = [
+            (user_id, user_id, test_id, ''.join(rng.choice('abcd') for _ in range(QUESTIONS)))
+            for user_id in range(1, args.answers + 1)
+        ]
+        await db.import_answer_sheets(rows)
+    user_ids = iter(range(args.answers + 1, 10 ** 9))
+    open_test = args.tests
+
+    before = await db.get_storage_stats()
+    submit_before = await submit_latency(db, open_test, user_ids)
+
+    started = time.perf_counter()
+    archived = 0
+    for test_id in range(1, args.archive + 1):
+        archived += (await db.archive_test(test_id))['archived']
+    archive_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    after = await db.compact()
+    compact_seconds = time.perf_counter() - started
+
+    submit_after = await submit_latency(db, open_test, user_ids)
+
+    started = time.perf_counter()
+    await db.get_leaderboard(1, 10)
+    archived_leaderboard = (time.perf_counter() - started) * 1000
+
+    db.close()
+    archive_size = os.path.getsize(db.db.archive_path)
+    return {
+        'archived': archived,
+        'archive_seconds': archive_seconds,
+        'compact_seconds': compact_seconds,
+        'size_before': before['size'],
+        'size_after': after['size'],
+        'archive_size': archive_size,
+        'submit_before': submit_before,
+        'submit_after': submit_after,
+        'archived_leaderboard': archived_leaderboard,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--tests', type=int, default=20)
+    parser.add_argument('--answers', type=int, default=20000, help="har bir testga javoblar soni")
+    parser.add_argument('--archive', type=int, default=15, help="yopiladigan testlar soni")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        result = asyncio.run(run(args, os.path.join(tmp, 'archive.db'), random.Random(42)))
+
+    mb = 1024 * 1024
+    print(f"Arxivlandi: {result['archived']} javob, {result['archive_seconds']:.2f} s; "
+          f"vacuum: {result['compact_seconds']:.2f} s")
+    print(f"Asosiy fayl: {result['size_before'] / mb:.1f} MB -> {result['size_after'] / mb:.1f} MB, "
+          f"arxiv: {result['archive_size'] / mb:.1f} MB")
+    print(f"Javob topshirish (median): {result['submit_before']:.3f} ms -> {result['submit_after']:.3f} ms")
+    print(f"Arxivlangan test leaderboardi (keshsiz): {result['archived_leaderboard']:.2f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,139 @@
+"""
+Zaxira nusxa benchmarki: backup vaqtida javob topshirish kechikishi.
+
+--rows ta javobli database yaratiladi, so'ng javoblar --rate tezlikda
+AsyncDatabase.submit_answer orqali yuboriladi: avval backupsiz, keyin
+BackupManager.run_backup() ishlayotgan vaqtda. p99 kechikish o'sishi
+--budget-ms dan oshmasligi kerak (oshsa chiqish kodi 1).
+
+Ishga tushirish:
+    python benchmarks/bench_backup.py --rows 500000 --rate 200 --budget-ms 5
+"""
+import argparse
+import asyncio
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from async_database import AsyncDatabase
+from backup import BackupManager
+from database import Database
+
+QUESTIONS = 50
+
+
+def percentile(values, fraction: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def build_database(path: str, rows: int, rng: random.Random):
+    db = Database(path)
+    db.add_test(1, ''.join(rng.choice('abcd') for _ in range(QUESTIONS)), created_by=0)
+    db.close()
+
+    conn = sqlite3.connect(path)
+    answer = 'a' * QUESTIONS
+    conn.executemany(
+        'INSERT INTO user_answers (user_id, test_id, user_answer, correct_count, total_count, score) '
+        'VALUES (?, 1, ?, ?, ?, ?)',
+        ((user_id, answer, user_id % QUESTIONS, QUESTIONS, user_id % QUESTIONS * 2.0) for user_id in range(1, rows + 1))
+    )
+    conn.commit()
+    # Katta WAL ning checkpoint i birinchi javob kechikishiga tushmasin
+    conn.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+    conn.close()
+
+
+async def submit_loop(db: AsyncDatabase, user_ids, rate: float, stop: asyncio.Event):
+    """Javoblarni bir tekis tezlikda yuborish, kechikishlarni qaytarish"""
+    latencies = []
+    answer = 'b' * QUESTIONS
+    interval = 1 / rate
+    next_at = time.perf_counter()
+
+    while not stop.is_set():
+        started = time.perf_counter()
+        await db.submit_answer(next(user_ids), 1, answer)
+        latencies.append(time.perf_counter() - started)
+
+        next_at += interval
+        await asyncio.sleep(max(0.0, next_at - time.perf_counter()))
+
+    return latencies
+
+
+async def run(args, db_path: str, backup_dir: str):
+    db = AsyncDatabase(Database(db_path))
+    user_ids = iter(range(args.rows + 1, 10 ** 9))
+    manager = BackupManager(db_path, backup_dir, pages=args.pages, sleep=args.sleep)
+    # Migratsiya va birinchi javobdagi keshlarni to'ldirish o'lchovga kirmasin
+    await db.migrate()
+    await db.submit_answer(next(user_ids), 1, 'b' * QUESTIONS)
+
+    # Backupsiz
+    stop = asyncio.Event()
+    task = asyncio.create_task(submit_loop(db, user_ids, args.rate, stop))
+    await asyncio.sleep(args.seconds)
+    stop.set()
+    baseline = await task
+
+    # Backup vaqtida (kamida shuncha vaqt davomida ketma-ket nusxalar olinadi)
+    stop = asyncio.Event()
+    task = asyncio.create_task(submit_loop(db, user_ids, args.rate, stop))
+    backup_times = []
+    deadline = time.perf_counter() + args.seconds
+    while not backup_times or time.perf_counter() < deadline:
+        started = time.perf_counter()
+        path = await manager.run_backup()
+        backup_times.append(time.perf_counter() - started)
+    stop.set()
+    during = await task
+    backup_seconds = sum(backup_times) / len(backup_times)
+
+    db.close()
+
+    conn = sqlite3.connect(path)
+    copied = conn.execute('SELECT COUNT(*) FROM user_answers').fetchone()[0]
+    integrity = conn.execute('PRAGMA quick_check').fetchone()[0]
+    conn.close()
+    return baseline, during, backup_seconds, os.path.getsize(path), copied, integrity
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=500000)
+    parser.add_argument('--rate', type=float, default=200, help="javob/soniya")
+    parser.add_argument('--seconds', type=float, default=3, help="backupsiz o'lchash davomiyligi")
+    parser.add_argument('--pages', type=int, default=256)
+    parser.add_argument('--sleep', type=float, default=0.005)
+    parser.add_argument('--budget-ms', type=float, default=5, help="p99 kechikishning ruxsat etilgan o'sishi")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'backup.db')
+        build_database(db_path, args.rows, random.Random(42))
+        baseline, during, seconds, size, copied, integrity = asyncio.run(
+            run(args, db_path, os.path.join(tmp, 'backups'))
+        )
+
+    print(f"Backup: {size / 1024 / 1024:.1f} MB, o'rtacha {seconds:.2f} s, nusxadagi javoblar: {copied}, tekshiruv: {integrity}")
+    print(f"{'':<14}{'javoblar':>10}{'p50 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    for name, latencies in (('backupsiz', baseline), ('backup vaqtida', during)):
+        print(f"{name:<14}{len(latencies):>10}{percentile(latencies, 0.5) * 1000:>10.2f}"
+              f"{percentile(latencies, 0.99) * 1000:>10.2f}{max(latencies) * 1000:>10.2f}")
+
+    growth = (percentile(during, 0.99) - percentile(baseline, 0.99)) * 1000
+    ok = growth <= args.budget_ms
+    print(f"p99 o'sishi: {growth:.2f} ms (chegara {args.budget_ms} ms) - {'OK' if ok else 'OSHIB KETDI'}")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,125 @@
+"""
+Database benchmark: eski (har chaqiruvda yangi connection) va yangi
+(doimiy WAL connection, bitta tranzaksiyali submit_answer) usullarda soniyasiga nechta javob saqlanishini solishtirish.
+
+Ishga tushirish:
+    python benchmarks/bench_database.py --submissions 2000
+"""
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import Database
+
+
+class LegacyDatabase:
+    """Avvalgi xatti-harakat: har bir so'rov uchun connect/commit/close"""
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+
+    def get_test(self, test_id):
+        conn = sqlite3.connect(self.db_path)
+        row = conn.execute('SELECT answers FROM tests WHERE test_id = ?', (test_id,)).fetchone()
+        conn.close()
+        return row[0] if row else None
+
+    def has_user_submitted(self, user_id, test_id):
+        conn = sqlite3.connect(self.db_path)
+        count = conn.execute(
+            'SELECT COUNT(*) FROM user_answers WHERE user_id = ? AND test_id = ?',
+            (user_id, test_id)
+        ).fetchone()[0]
+        conn.close()
+        return count > 0
+
+    def save_user_answer(self, user_id, test_id, user_answer, correct_count, total_count):
+        score = (correct_count / total_count * 100) if total_count > 0 else 0
+        conn = sqlite3.connect(self.db_path)
+        try:
+            conn.execute('''
+                INSERT INTO user_answers
+                (user_id, test_id, user_answer, correct_count, total_count, score)
+                VALUES (?, ?, ?, ?, ?, ?)
+            ''', (user_id, test_id, user_answer, correct_count, total_count, score))
+            conn.commit()
+            return True
+        except sqlite3.IntegrityError:
+            return False
+        finally:
+            conn.close()
+
+
+def prepare(db_path: str, answers: str):
+    """Jadvallarni yaratish va bitta test qo'shish"""
+    db = Database(db_path)
+    db.add_test(1, answers, created_by=0)
+    db.close()
+    # Eski usul uchun odatiy rollback journal rejimiga qaytarish
+    conn = sqlite3.connect(db_path)
+    conn.execute('PRAGMA journal_mode = DELETE')
+    conn.close()
+
+
+def run_submissions(db, count: int, answers: str) -> float:
+    """get_test + has_user_submitted + save_user_answer ketma-ketligini o'lchash"""
+    started = time.perf_counter()
+    for user_id in range(1, count + 1):
+        key = db.get_test(1)
+        if db.has_user_submitted(user_id, 1):
+            continue
+        correct = sum(1 for a, b in zip(answers, key) if a == b)
+        db.save_user_answer(user_id, 1, answers, correct, len(key))
+    return time.perf_counter() - started
+
+
+def run_atomic_submissions(db, count: int, answers: str) -> float:
+    """Bitta tranzaksiyali submit_answer ni o'lchash"""
+    started = time.perf_counter()
+    for user_id in range(1, count + 1):
+        db.submit_answer(user_id, 1, answers)
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--submissions', type=int, default=2000)
+    parser.add_argument('--questions', type=int, default=50)
+    args = parser.parse_args()
+
+    answers = ('abcd' * args.questions)[:args.questions]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        legacy_path = os.path.join(tmp, 'legacy.db')
+        prepare(legacy_path, answers)
+        legacy_time = run_submissions(LegacyDatabase(legacy_path), args.submissions, answers)
+
+        pooled_path = os.path.join(tmp, 'pooled.db')
+        prepare(pooled_path, answers)
+        pooled = Database(pooled_path)
+        pooled_time = run_submissions(pooled, args.submissions, answers)
+        pooled.close()
+
+        atomic_path = os.path.join(tmp, 'atomic.db')
+        prepare(atomic_path, answers)
+        atomic = Database(atomic_path)
+        atomic_time = run_atomic_submissions(atomic, args.submissions, answers)
+        atomic.close()
+
+    legacy_rate = args.submissions / legacy_time
+    pooled_rate = args.submissions / pooled_time
+    print(f"Javoblar soni: {args.submissions}, savollar: {args.questions}")
+    print(f"Eski usul (connect-per-call): {legacy_rate:10.1f} javob/s")
+    atomic_rate = args.submissions / atomic_time
+    print(f"Doimiy WAL connection:        {pooled_rate:10.1f} javob/s")
+    print(f"submit_answer (1 tranzaksiya):{atomic_rate:10.1f} javob/s")
+    print(f"Tezlashuv: {pooled_rate / legacy_rate:.1f}x / {atomic_rate / legacy_rate:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+"""
+Umumiy reyting benchmarki: N ta saqlangan javob bo'lganda user_totals
+jadvalidan top-N va foydalanuvchi o'rnini olish vaqtini o'lchash.
+
+Ishga tushirish:
+    python benchmarks/bench_global_rank.py --users 100000 --tests 10
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import Database
+
+
+def measure(func, args_list):
+    """Har bir chaqiruv vaqtini millisekundlarda qaytarish"""
+    timings = []
+    for args in args_list:
+        started = time.perf_counter()
+        func(*args)
+        timings.append((time.perf_counter() - started) * 1000)
+    return timings
+
+
+def report(name, timings):
+    timings = sorted(timings)
+    p99 = timings[int(len(timings) * 0.99) - 1]
+    print(f"{name:<28} median {statistics.median(timings):6.2f} ms, p99 {p99:6.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--users', type=int, default=100000)
+    parser.add_argument('--tests', type=int, default=10)
+    parser.add_argument('--questions', type=int, default=30)
+    parser.add_argument('--queries', type=int, default=1000)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'global_rank.db')
+        db = Database(path)
+
+        conn = db.get_connection()
+        conn.executemany(
+            'INSERT INTO users (user_id, first_name) VALUES (?, ?)',
+            ((user_id, f"User {user_id}") for user_id in range(1, args.users + 1))
+        )
+
+        def rows():
+            for test_id in range(1, args.tests + 1):
+                for user_id in range(1, args.users + 1):
+                    correct = rng.randint(0, args.questions)
+                    yield (user_id, test_id, correct, args.questions, correct / args.questions * 100)
+
+        conn.executemany('''
+            INSERT INTO user_answers
+            (user_id, test_id, user_answer, correct_count, total_count, score)
+            VALUES (?, ?, '', ?, ?, ?)
+        ''', rows())
+        # user_totals migratsiyasidan oldingi holatga qaytarib, jadval mavjud
+        # javoblardan to'ldirilishini (migratsiya 5 va keyingilar) o'lchaymiz
+        conn.execute('DROP TABLE user_totals')
+        conn.execute('PRAGMA user_version = 4')
+        conn.commit()
+        db.close()
+
+        db = Database(path)
+        started = time.perf_counter()
+        db.migrate()
+        backfill = time.perf_counter() - started
+
+        user_ids = [(rng.randint(1, args.users),) for _ in range(args.queries)]
+        top = measure(db.get_global_leaderboard, [(10,)] * args.queries)
+        ranks = measure(db.get_user_global_rank, user_ids)
+
+        started = time.perf_counter()
+        for user_id in range(args.users + 1, args.users + 1 + args.queries):
+            db.save_user_answer(user_id, 1, '', args.questions // 2, args.questions)
+        inserts = (time.perf_counter() - started) / args.queries * 1000
+        db.close()
+
+    print(f"Javoblar: {args.users * args.tests:,}, foydalanuvchilar: {args.users:,}")
+    print(f"user_totals to'ldirish:      {backfill:.2f} s")
+    report("Top 10:", top)
+    report("Foydalanuvchi o'rni:", ranks)
+    print(f"Javob + jamlanma yozish:      {inserts:.2f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,59 @@
+"""
+check_answer micro-benchmark: eski belgi-belgi Python sikli va oldindan
+tayyorlangan (AnswerKey) baytli tekshiruvni 50, 200 va 1000 savollik
+kalitlarda solishtirish.
+
+Ishga tushirish:
+    python benchmarks/bench_grading.py
+"""
+import argparse
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from grading import check_answer, compile_key
+
+
+def legacy_check_answer(user_answer: str, correct_answer: str) -> tuple:
+    """Avvalgi implementatsiya"""
+    user_answer = user_answer.lower().strip()
+    correct_answer = correct_answer.lower().strip()
+
+    min_len = min(len(user_answer), len(correct_answer))
+    correct_count = 0
+
+    for i in range(min_len):
+        if user_answer[i] == correct_answer[i]:
+            correct_count += 1
+
+    return correct_count, len(correct_answer)
+
+
+def measure(func, number: int) -> float:
+    """Bitta chaqiruvning o'rtacha vaqti (mikrosekund)"""
+    return min(timeit.repeat(func, number=number, repeat=5)) / number * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--number', type=int, default=20000)
+    args = parser.parse_args()
+
+    print(f"{'savollar':>8} {'eski':>10} {'check_answer':>14} {'AnswerKey':>11} {'tezlashuv':>10}")
+    for size in (50, 200, 1000):
+        correct = ('abcde' * size)[:size]
+        answer = ('abdce' * size)[:size]
+        key = compile_key(correct)
+
+        assert legacy_check_answer(answer, correct) == key.grade(answer)
+
+        legacy = measure(lambda: legacy_check_answer(answer, correct), args.number)
+        uncached = measure(lambda: check_answer(answer, correct), args.number)
+        compiled = measure(lambda: key.grade(answer), args.number)
+        print(f"{size:>8} {legacy:>8.2f}us {uncached:>12.2f}us {compiled:>9.2f}us {legacy / compiled:>9.1f}x")
+
+
+if __name__ == '__main__':
+    main()
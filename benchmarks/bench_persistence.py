@@ -0,0 +1,88 @@
+"""
+SQLitePersistence benchmarki: yangilanish boshiga holatni saqlash narxi.
+
+1. --users ta foydalanuvchidan /start (user_data bo'sh) o'tkaziladi va
+   Application.update_persistence() vaqti o'lchanadi - o'zgarmagan holat
+   database ga yozilmasligi kerak.
+2. --dirty ulush foydalanuvchilarning user_data si o'zgartiriladi va
+   saqlash (bitta tranzaksiya) vaqti o'lchanadi.
+3. Application qayta yaratilib holat database dan tiklanishi tekshiriladi.
+
+Ishga tushirish:
+    python benchmarks/bench_persistence.py --users 20000 --dirty 0.1
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fake_telegram import BOT_TOKEN, FakeTelegram, text_update, to_update
+
+
+async def process(application, updates) -> float:
+    started = time.perf_counter()
+    await asyncio.gather(*(application.process_update(update) for update in updates))
+    return time.perf_counter() - started
+
+
+async def timed_update_persistence(application) -> float:
+    started = time.perf_counter()
+    await application.update_persistence()
+    await application.persistence.flush()
+    return time.perf_counter() - started
+
+
+async def benchmark(args):
+    import bot
+
+    fake = FakeTelegram()
+    application = bot.build_application(request=fake)
+    users = range(1, args.users + 1)
+    dirty = users[:int(args.users * args.dirty)]
+
+    async with application:
+        updates = [to_update(text_update(user_id, user_id, '/start'), application.bot) for user_id in users]
+        processing = await process(application, updates)
+        await bot.user_buffer.flush()
+
+        clean = await timed_update_persistence(application)
+        persistence = application.persistence
+        written_clean = persistence.written
+
+        for user_id in dirty:
+            application.user_data[user_id]['waiting_for'] = 'test_add'
+        application.mark_data_for_update_persistence(user_ids=list(users))
+        changed = await timed_update_persistence(application)
+        written_changed = persistence.written - written_clean
+
+    print(f"/start qayta ishlash: {processing / len(users) * 1e6:.1f} µs/yangilanish")
+    print(f"Saqlash (o'zgarishsiz, {len(users)} foydalanuvchi): {clean * 1000:.1f} ms, "
+          f"{clean / len(users) * 1e6:.2f} µs/yangilanish, yozildi: {written_clean}")
+    print(f"Saqlash ({len(dirty)} o'zgargan): {changed * 1000:.1f} ms, "
+          f"{changed / len(users) * 1e6:.2f} µs/yangilanish, yozildi: {written_changed}")
+
+    # Qayta ishga tushgandan keyin holat tiklanadimi
+    restarted = bot.build_application(request=FakeTelegram())
+    async with restarted:
+        restored = sum(1 for user_id in dirty if restarted.user_data[user_id].get('waiting_for') == 'test_add')
+    print(f"Tiklangan holatlar: {restored}/{len(dirty)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--users', type=int, default=20000)
+    parser.add_argument('--dirty', type=float, default=0.1)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ['DATABASE_PATH'] = os.path.join(tmp, 'persistence.db')
+        os.environ['BOT_TOKEN'] = BOT_TOKEN
+        asyncio.run(benchmark(args))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,57 @@
+"""
+Qayta baholash benchmarki: N ta saqlangan javobni kalit o'zgarganda
+qayta baholash vaqtini o'lchash.
+
+Ishga tushirish:
+    python benchmarks/bench_regrade.py --rows 100000 --questions 50
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import Database
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--questions', type=int, default=50)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    key = ''.join(rng.choice('abcd') for _ in range(args.questions))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Database(os.path.join(tmp, 'regrade.db'))
+        db.add_test(1, key, created_by=0)
+
+        conn = db.get_connection()
+        conn.executemany('''
+            INSERT INTO user_answers
+            (user_id, test_id, user_answer, correct_count, total_count, score)
+            VALUES (?, 1, ?, 0, ?, 0)
+        ''', (
+            (user_id, ''.join(rng.choice('abcd') for _ in range(args.questions)), args.questions)
+            for user_id in range(1, args.rows + 1)
+        ))
+        conn.commit()
+        db.regrade_test(1)
+
+        # Bitta savol kalitini o'zgartirish
+        new_key = ('b' if key[0] != 'b' else 'c') + key[1:]
+        started = time.perf_counter()
+        summary = db.add_test(1, new_key, created_by=0)
+        elapsed = time.perf_counter() - started
+        db.close()
+
+    print(f"Javoblar: {summary['regraded']}, o'zgarganlar: {summary['changed']}")
+    print(f"Qayta baholash: {elapsed:.2f} s ({summary['regraded'] / elapsed:,.0f} javob/s)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,194 @@
+"""
+Offline replay benchmark: sintetik yangilanishlarni haqiqiy Application
+handlerlari orqali soxta Telegram bilan o'tkazish.
+
+Ssenariylar:
+    start        - ko'p foydalanuvchilardan /start
+    submit       - <test>*javoblar ko'rinishidagi javoblar
+    leaderboard  - admin panel orqali leaderboard so'rovlari
+
+Har bir ssenariy uchun yangilanish/soniya, kechikish persentillari,
+yangilanish boshiga database va Bot API chaqiruvlari soni hisoblanadi.
+Natijalar JSON ga yoziladi; --baseline bilan avvalgi natija bilan solishtiriladi.
+
+Ishga tushirish:
+    python benchmarks/bench_replay.py --users 2000 --output replay.json
+    python benchmarks/bench_replay.py --baseline replay.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fake_telegram import BOT_TOKEN, FakeTelegram, callback_update, text_update, to_update
+
+ADMIN = 1000000000
+QUESTIONS = 50
+
+
+def percentile(values, fraction: float) -> float:
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def db_operations() -> int:
+    import metrics
+    with metrics.DB_QUERY_SECONDS._lock:
+        return sum(state[2] for state in metrics.DB_QUERY_SECONDS._values.values())
+
+
+async def run_scenario(name: str, application, fake: FakeTelegram, updates, concurrency: int):
+    """Yangilanishlarni process_update orqali o'tkazib, statistikani yig'ish"""
+    latencies = []
+    semaphore = asyncio.Semaphore(concurrency)
+    api_before = sum(fake.counts.values())
+    chat_member_before = fake.counts['getChatMember']
+    db_before = db_operations()
+
+    async def process(update):
+        async with semaphore:
+            started = time.perf_counter()
+            await application.process_update(update)
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(process(update) for update in updates))
+    elapsed = time.perf_counter() - started
+
+    count = len(updates)
+    return {
+        'scenario': name,
+        'updates': count,
+        'seconds': round(elapsed, 4),
+        'updates_per_second': round(count / elapsed, 1),
+        'latency_ms': {
+            'p50': round(percentile(latencies, 0.50) * 1000, 3),
+            'p95': round(percentile(latencies, 0.95) * 1000, 3),
+            'p99': round(percentile(latencies, 0.99) * 1000, 3),
+            'max': round(max(latencies) * 1000, 3),
+        },
+        'db_ops_per_update': round((db_operations() - db_before) / count, 3),
+        'api_calls_per_update': round((sum(fake.counts.values()) - api_before) / count, 3),
+        'get_chat_member_calls': fake.counts['getChatMember'] - chat_member_before,
+    }
+
+
+async def benchmark(args):
+    import bot
+
+    fake = FakeTelegram(latency=args.api_latency / 1000)
+    application = bot.build_application(request=fake)
+    key = ('abcd' * QUESTIONS)[:QUESTIONS]
+    answer = ('abdc' * QUESTIONS)[:QUESTIONS]
+
+    await bot.db.add_test(1, key, ADMIN)
+    for index in range(args.channels):
+        await bot.db.add_channel(f"@channel{index}", f"Kanal {index}")
+
+    results = []
+    async with application:
+        await bot.post_init(application)
+        bot_instance = application.bot
+        update_ids = iter(range(1, 10 ** 9))
+        users = range(1, args.users + 1)
+
+        start_updates = [to_update(text_update(next(update_ids), user_id, '/start'), bot_instance) for user_id in users]
+        results.append(await run_scenario('start', application, fake, start_updates, args.concurrency))
+        await bot.user_buffer.flush()
+
+        submit_updates = [
+            to_update(text_update(next(update_ids), user_id, f"1*{answer}"), bot_instance)
+            for user_id in users
+            for _ in range(args.repeat)
+        ]
+        results.append(await run_scenario('submit', application, fake, submit_updates, args.concurrency))
+
+        leaderboard_updates = []
+        for _ in range(args.leaderboards):
+            leaderboard_updates.append(to_update(callback_update(next(update_ids), ADMIN, 'admin_leaderboard'), bot_instance))
+            leaderboard_updates.append(to_update(text_update(next(update_ids), ADMIN, '1'), bot_instance))
+        # Admin holati (waiting_for) tartibga bog'liq, shuning uchun ketma-ket
+        results.append(await run_scenario('leaderboard', application, fake, leaderboard_updates, 1))
+        await bot.post_shutdown(application)
+
+    return results
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'], text=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)), stderr=subprocess.DEVNULL
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def compare(results, baseline_path: str):
+    """Avvalgi natijalar bilan solishtirish"""
+    with open(baseline_path) as f:
+        baseline = {item['scenario']: item for item in json.load(f)['results']}
+
+    print(f"\nBaseline: {baseline_path}")
+    for item in results:
+        old = baseline.get(item['scenario'])
+        if not old:
+            continue
+        change = (item['updates_per_second'] / old['updates_per_second'] - 1) * 100
+        p99_change = item['latency_ms']['p99'] - old['latency_ms']['p99']
+        print(f"{item['scenario']:>12}: {change:+.1f}% yangilanish/s, p99 {p99_change:+.3f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=2000)
+    parser.add_argument('--repeat', type=int, default=1, help="har bir foydalanuvchi javobi necha marta yuboriladi")
+    parser.add_argument('--leaderboards', type=int, default=200)
+    parser.add_argument('--channels', type=int, default=0, help="majburiy kanallar soni")
+    parser.add_argument('--concurrency', type=int, default=1)
+    parser.add_argument('--api-latency', type=float, default=0.0, help="soxta Bot API kechikishi (ms)")
+    parser.add_argument('--output', help="natijalarni yozish uchun JSON fayl")
+    parser.add_argument('--baseline', help="solishtirish uchun avvalgi JSON fayl")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ['DATABASE_PATH'] = os.path.join(tmp, 'replay.db')
+        os.environ['BOT_TOKEN'] = BOT_TOKEN
+        os.environ['ADMIN_ID'] = str(ADMIN)
+        os.environ['METRICS_ENABLED'] = 'true'
+        results = asyncio.run(benchmark(args))
+
+    for item in results:
+        latency = item['latency_ms']
+        print(
+            f"{item['scenario']:>12}: {item['updates_per_second']:>9.1f} yangilanish/s  "
+            f"p50 {latency['p50']:.3f} ms  p95 {latency['p95']:.3f} ms  p99 {latency['p99']:.3f} ms  "
+            f"db/upd {item['db_ops_per_update']}  api/upd {item['api_calls_per_update']}"
+        )
+
+    report = {
+        'commit': git_commit(),
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'parameters': vars(args),
+        'results': results,
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nNatijalar yozildi: {args.output}")
+
+    if args.baseline:
+        compare(results, args.baseline)
+
+
+if __name__ == '__main__':
+    main()
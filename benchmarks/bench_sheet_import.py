@@ -0,0 +1,91 @@
+"""
+Qog'oz varaqalar importi benchmarki: `user_identifier,test_id,answers`
+qatorlaridan iborat faylni SheetImportManager orqali (soxta Telegram bilan)
+import qilish tezligini o'lchash.
+
+Faylning --duplicates ulushi takroriy qatorlar bo'lib, ular xato sifatida
+hisobotga tushishi kerak.
+
+Ishga tushirish:
+    python benchmarks/bench_sheet_import.py --rows 200000 --tests 5
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fake_telegram import BOT_TOKEN, FakeTelegram
+from telegram import Bot
+
+from async_database import AsyncDatabase
+from database import Database
+from importer import SheetImportManager
+
+
+def write_sheet(path: str, rows: int, tests: int, questions: int, duplicates: float, rng: random.Random):
+    users = rows // tests
+    with open(path, 'w') as f:
+        f.write("user_identifier,test_id,answers\n")
+        for test_id in range(1, tests + 1):
+            for user_id in range(1, users + 1):
+                answers = ''.join(rng.choice('abcd') for _ in range(questions))
+                f.write(f"{user_id},{test_id},{answers}\n")
+                if rng.random() < duplicates:
+                    f.write(f"{user_id},{test_id},{answers}\n")
+
+
+async def run(db_path: str, sheet_path: str, batch_size: int):
+    db = AsyncDatabase(Database(db_path))
+    fake = FakeTelegram()
+    bot = Bot(BOT_TOKEN, request=fake)
+    await bot.initialize()
+
+    importer = SheetImportManager(db, batch_size=batch_size, progress_interval=1)
+    started = time.perf_counter()
+    await importer.start(bot, sheet_path, chat_id=1)
+    while importer.is_running(1):
+        await asyncio.sleep(0.01)
+    elapsed = time.perf_counter() - started
+
+    reports = fake.sent_texts('editMessageText')
+    await bot.shutdown()
+    db.close()
+    return elapsed, reports
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=200000)
+    parser.add_argument('--tests', type=int, default=5)
+    parser.add_argument('--questions', type=int, default=50)
+    parser.add_argument('--duplicates', type=float, default=0.01)
+    parser.add_argument('--batch-size', type=int, default=5000)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Database(os.path.join(tmp, 'sheets.db'))
+        for test_id in range(1, args.tests + 1):
+            db.add_test(test_id, ''.join(rng.choice('abcd') for _ in range(args.questions)), created_by=0)
+        # Varaqadagi foydalanuvchilar botda ro'yxatdan o'tgan bo'lishi kerak
+        db.add_users([(user_id, None, f"User {user_id}", None) for user_id in range(1, args.rows // args.tests + 1)])
+        db.close()
+
+        sheet_path = os.path.join(tmp, 'sheet.csv')
+        write_sheet(sheet_path, args.rows, args.tests, args.questions, args.duplicates, rng)
+
+        elapsed, reports = asyncio.run(run(os.path.join(tmp, 'sheets.db'), sheet_path, args.batch_size))
+
+    print(reports[-1].split('\n\n')[0])
+    print(f"Holat xabari yangilanishlari: {len(reports)}")
+    print(f"Import: {elapsed:.2f} s ({args.rows / elapsed:,.0f} qator/s)")
+
+
+if __name__ == '__main__':
+    main()
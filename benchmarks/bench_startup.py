@@ -0,0 +1,88 @@
+"""
+Sovuq ishga tushish benchmarki: har bir urinishda yangi Python jarayoni
+bot modulini import qiladi, sxemani migratsiya qiladi, Application ni
+(soxta Telegram bilan) ishga tushiradi va birinchi yangilanishni qayta
+ishlaydi. Bosqichlar bot.startup_phases dan olinadi.
+
+Birinchi urinish yangi (bo'sh) database bilan, qolganlari migratsiya
+qilingan database bilan ishlaydi.
+
+Ishga tushirish:
+    python benchmarks/bench_startup.py --runs 5
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PHASES = ('imports', 'migrations', 'ready', 'first_update')
+
+
+async def child():
+    sys.path.insert(0, ROOT)
+    import bot
+    from fake_telegram import FakeTelegram, text_update, to_update
+
+    bot.mark_startup('imports')
+    await bot.db.migrate()
+    bot.mark_startup('migrations')
+
+    fake = FakeTelegram()
+    application = bot.build_application(request=fake)
+    async with application:
+        await application.start()
+        bot.mark_startup('ready')
+
+        await application.update_queue.put(to_update(text_update(1, 1, '/start'), application.bot))
+        while 'first_update' not in bot.startup_phases:
+            await asyncio.sleep(0.001)
+
+        await application.stop()
+        await bot.post_shutdown(application)
+
+    bot.db.close()
+    print(json.dumps(bot.startup_phases))
+
+
+def run_child(env) -> dict:
+    started = time.perf_counter()
+    output = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), '--child'],
+        env=env, capture_output=True, text=True, check=True
+    ).stdout
+    phases = json.loads(output.strip().splitlines()[-1])
+    phases['process'] = time.perf_counter() - started
+    return phases
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+        asyncio.run(child())
+        return
+
+    from fake_telegram import BOT_TOKEN
+
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(os.environ, DATABASE_PATH=os.path.join(tmp, 'startup.db'), BOT_TOKEN=BOT_TOKEN)
+        runs = [run_child(env) for _ in range(args.runs)]
+
+    print(f"{'bosqich':<14}{'yangi DB':>10}{'median':>10}")
+    for phase in PHASES + ('process',):
+        warm = [run[phase] for run in runs[1:]] or [runs[0][phase]]
+        print(f"{phase:<14}{runs[0][phase]:>9.3f}s{statistics.median(warm):>9.3f}s")
+
+
+if __name__ == '__main__':
+    main()
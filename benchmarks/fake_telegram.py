@@ -0,0 +1,121 @@
+"""
+Soxta Telegram Bot API: tarmoqqa chiqmasdan barcha so'rovlarni yozib boradi
+va Bot API formatidagi javoblarni qaytaradi. Benchmark va replay skriptlari
+uchun Application ga `request` sifatida beriladi.
+"""
+import asyncio
+import itertools
+import json
+import time
+from collections import Counter
+from typing import Dict, List, Tuple
+
+from telegram import Update
+from telegram.request import BaseRequest
+
+BOT_ID = 123456
+BOT_TOKEN = f"{BOT_ID}:TEST-TOKEN"
+
+
+class FakeTelegram(BaseRequest):
+    """Bot API so'rovlarini qayd etuvchi va darhol javob qaytaruvchi request"""
+
+    def __init__(self, latency: float = 0.0, member_status: str = 'member'):
+        self.latency = latency
+        self.member_status = member_status
+        self.calls: List[Tuple[str, Dict]] = []
+        self.counts = Counter()
+        self._message_ids = itertools.count(1)
+
+    @property
+    def read_timeout(self):
+        return None
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass
+
+    async def do_request(self, url, method, request_data=None, read_timeout=None,
+                         write_timeout=None, connect_timeout=None, pool_timeout=None):
+        endpoint = url.rsplit('/', 1)[-1]
+        params = request_data.parameters if request_data else {}
+        self.calls.append((endpoint, params))
+        self.counts[endpoint] += 1
+
+        if endpoint == 'getUpdates':
+            # Polling ishlatilmaydi, bo'sh javobni sekin qaytaramiz
+            await asyncio.sleep(1)
+        elif self.latency:
+            await asyncio.sleep(self.latency)
+
+        body = {'ok': True, 'result': self._result(endpoint, params)}
+        return 200, json.dumps(body).encode()
+
+    def sent_texts(self, endpoint: str = 'sendMessage') -> List[str]:
+        return [params.get('text') for name, params in self.calls if name == endpoint]
+
+    def _result(self, endpoint: str, params: Dict):
+        if endpoint == 'getMe':
+            return bot_user()
+        if endpoint == 'getChatMember':
+            return {'status': self.member_status, 'user': user(params['user_id'])}
+        if endpoint in ('sendMessage', 'editMessageText', 'sendDocument'):
+            return message(params.get('chat_id'), params.get('text'), message_id=next(self._message_ids))
+        if endpoint == 'getUpdates':
+            return []
+        return True
+
+
+def bot_user() -> Dict:
+    return {
+        'id': BOT_ID, 'is_bot': True, 'first_name': 'Test bot', 'username': 'test_bot',
+        'can_join_groups': True, 'can_read_all_group_messages': False,
+        'supports_inline_queries': False,
+    }
+
+
+def user(user_id: int) -> Dict:
+    return {'id': user_id, 'is_bot': False, 'first_name': f"User {user_id}", 'username': f"user{user_id}"}
+
+
+def message(chat_id, text: str, message_id: int = 1, user_id: int = None) -> Dict:
+    data = {
+        'message_id': message_id,
+        'date': int(time.time()),
+        'chat': {'id': chat_id, 'type': 'private'},
+        'text': text,
+    }
+    if user_id is not None:
+        data['from'] = user(user_id)
+    else:
+        data['from'] = bot_user()
+    return data
+
+
+def text_update(update_id: int, user_id: int, text: str) -> Dict:
+    """Foydalanuvchidan kelgan matnli xabar (Bot API JSON ko'rinishida)"""
+    data = {'update_id': update_id, 'message': message(user_id, text, update_id, user_id=user_id)}
+    if text.startswith('/'):
+        command = text.split()[0]
+        data['message']['entities'] = [{'type': 'bot_command', 'offset': 0, 'length': len(command)}]
+    return data
+
+
+def callback_update(update_id: int, user_id: int, data: str) -> Dict:
+    """Inline tugma bosilishi (Bot API JSON ko'rinishida)"""
+    return {
+        'update_id': update_id,
+        'callback_query': {
+            'id': str(update_id),
+            'from': user(user_id),
+            'chat_instance': str(user_id),
+            'data': data,
+            'message': message(user_id, 'panel', update_id),
+        },
+    }
+
+
+def to_update(data: Dict, bot) -> Update:
+    return Update.de_json(data, bot)
@@ -0,0 +1,84 @@
+"""
+Webhook rejimini mahalliy tekshirish: soxta Telegram bilan Application
+yaratiladi, aiohttp ilovasiga Telegram formatidagi POST so'rovlari yuboriladi
+va bot javoblari tekshiriladi. Noto'g'ri secret token rad etilishi ham
+tekshiriladi.
+
+Ishga tushirish:
+    python benchmarks/replay_webhook.py --users 200
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fake_telegram import BOT_TOKEN, FakeTelegram, text_update
+
+SECRET = 'replay-secret'
+
+
+async def replay(users: int):
+    import bot
+    from aiohttp.test_utils import TestClient, TestServer
+
+    fake = FakeTelegram()
+    application = bot.build_application(request=fake)
+    await bot.db.add_test(1, 'abcdabcdab', 0)
+
+    async with application:
+        await bot.post_init(application)
+        await application.start()
+
+        client = TestClient(TestServer(bot.create_web_app(application, SECRET)))
+        await client.start_server()
+        headers = {'X-Telegram-Bot-Api-Secret-Token': SECRET}
+
+        # Noto'g'ri token rad etilishi kerak
+        response = await client.post(bot.WEBHOOK_PATH, json=text_update(1, 1, '/start'),
+                                     headers={'X-Telegram-Bot-Api-Secret-Token': 'wrong'})
+        assert response.status == 403, response.status
+
+        started = time.perf_counter()
+        update_id = 1
+        for user_id in range(1, users + 1):
+            for text in ('/start', '1*abcdabcdaa'):
+                update_id += 1
+                response = await client.post(bot.WEBHOOK_PATH, json=text_update(update_id, user_id, text),
+                                             headers=headers)
+                assert response.status == 200, response.status
+
+        # Navbatdagi barcha yangilanishlar qayta ishlanishini kutish
+        expected = users * 2
+        while fake.counts['sendMessage'] < expected:
+            await asyncio.sleep(0.01)
+        elapsed = time.perf_counter() - started
+
+        await client.close()
+        await application.stop()
+        await bot.post_shutdown(application)
+
+    replies = fake.sent_texts()
+    graded = sum(1 for text in replies if 'Natija' in text)
+    assert graded == users, graded
+    print(f"Webhook orqali {expected} ta yangilanish: {elapsed:.2f} s ({expected / elapsed:.0f} yangilanish/s)")
+    print(f"Baholangan javoblar: {graded}, Bot API chaqiruvlari: {dict(fake.counts)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--users', type=int, default=200)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ['DATABASE_PATH'] = os.path.join(tmp, 'replay.db')
+        os.environ['BOT_TOKEN'] = BOT_TOKEN
+        os.environ['USE_WEBHOOK'] = 'true'
+        asyncio.run(replay(args.users))
+
+
+if __name__ == '__main__':
+    main()
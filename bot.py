@@ -1,7 +1,16 @@
+import time
+
+# Ishga tushish vaqti importlardan boshlab o'lchanadi
+STARTUP_STARTED = time.perf_counter()
+
 import asyncio
+import hmac
 import logging
-import re
+import os
+import secrets
+import signal
 from datetime import datetime
+from typing import NamedTuple, Optional
 from aiohttp import web
 import aiohttp
 
@@ -11,13 +20,41 @@ from telegram.ext import (
     CommandHandler, 
     MessageHandler, 
     CallbackQueryHandler,
+    ChatMemberHandler,
+    ApplicationHandlerStop,
+    TypeHandler,
     filters,
     ContextTypes
 )
 from telegram.error import TelegramError
 
-from database import Database
-from config import BOT_TOKEN, ADMIN_ID, PORT, SELF_URL, KEEP_ALIVE_INTERVAL
+from database import Database, SUBMIT_DUPLICATE, SUBMIT_UNKNOWN_TEST, SUBMIT_TEST_CLOSED
+from async_database import AsyncDatabase, UserWriteBuffer
+from backup import BackupManager, MAX_DOCUMENT_SIZE
+from broadcast import BroadcastManager
+from concurrency import PerUserUpdateProcessor
+from exporter import ExportManager, FORMAT_CSV, FORMAT_XLSX, xlsx_available
+from importer import (
+    ANSWER_RE, SheetImportManager, download_document, format_errors, parse_tests_file
+)
+from ratelimit import UserRateLimiter
+import metrics
+from metrics import timed_handler
+from persistence import SQLitePersistence
+from render_cache import RenderCache, paginate
+from subscription import MembershipCache, SubscriptionTracker, match_channel
+from config import (
+    BOT_TOKEN, ADMIN_ID, DATABASE_PATH, ARCHIVE_PATH, DB_READER_THREADS,
+    SUBSCRIPTION_CACHE_TTL, SUBSCRIPTION_CACHE_NEGATIVE_TTL, SUBSCRIPTION_CACHE_SIZE,
+    BROADCAST_RATE, BROADCAST_BURST, BROADCAST_CONCURRENCY,
+    BROADCAST_BATCH_SIZE, BROADCAST_PROGRESS_INTERVAL,
+    PORT, SELF_URL, KEEP_ALIVE_INTERVAL,
+    USE_WEBHOOK, WEBHOOK_URL, WEBHOOK_PATH, WEBHOOK_SECRET,
+    METRICS_ENABLED, UPDATE_CONCURRENCY, ADMISSION_MAX_PENDING,
+    FLOOD_RATE, FLOOD_BURST, FLOOD_MAX_USERS,
+    USER_FLUSH_INTERVAL, USER_FLUSH_MAX_ROWS, PERSISTENCE_INTERVAL,
+    BACKUP_DIR, BACKUP_INTERVAL, BACKUP_KEEP, BACKUP_PAGES, BACKUP_SLEEP
+)
 
 # Logging sozlash
 logging.basicConfig(
@@ -26,53 +63,320 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-# Database yaratish
-db = Database()
+# Database yaratish (so'rovlar event loop dan tashqarida bajariladi).
+# Import paytida database ga murojaat qilinmaydi, sxema main() da migratsiya qilinadi
+db = AsyncDatabase(Database(DATABASE_PATH, ARCHIVE_PATH or None), reader_threads=DB_READER_THREADS)
+
+# /start dan kelgan foydalanuvchilar uchun write-behind bufer
+user_buffer = UserWriteBuffer(db, flush_interval=USER_FLUSH_INTERVAL, max_rows=USER_FLUSH_MAX_ROWS)
+
+# Database zaxira nusxalari
+backups = BackupManager(
+    DATABASE_PATH, BACKUP_DIR, keep=BACKUP_KEEP, pages=BACKUP_PAGES, sleep=BACKUP_SLEEP,
+    archive_path=db.db.archive_path
+)
+
+# Kanal obunasi keshi
+membership_cache = MembershipCache(
+    positive_ttl=SUBSCRIPTION_CACHE_TTL,
+    negative_ttl=SUBSCRIPTION_CACHE_NEGATIVE_TTL,
+    max_size=SUBSCRIPTION_CACHE_SIZE
+)
+
+# chat_member yangilanishlaridan yig'iladigan obuna holati
+subscription_tracker = SubscriptionTracker()
+
+# Fon rejimidagi broadcasting
+broadcaster = BroadcastManager(
+    db,
+    rate=BROADCAST_RATE,
+    burst=BROADCAST_BURST,
+    concurrency=BROADCAST_CONCURRENCY,
+    batch_size=BROADCAST_BATCH_SIZE,
+    progress_interval=BROADCAST_PROGRESS_INTERVAL
+)
+
+# Test natijalarini fonda faylga eksport qilish
+exporter = ExportManager(db.db)
+
+# Qog'oz varaqalardagi javoblarni fayldan fonda import qilish
+sheet_importer = SheetImportManager(db)
+
+# Javoblar uchun foydalanuvchi bo'yicha flood nazorati
+answer_limiter = UserRateLimiter(FLOOD_RATE, FLOOD_BURST, max_users=FLOOD_MAX_USERS)
+
+async def reply_busy(update: Update):
+    """Navbat to'lganda arzon "band" javobi (database ga murojaatsiz)"""
+    try:
+        await update.message.reply_text("⏳ Bot hozir band. Iltimos, birozdan keyin qayta urinib ko'ring.")
+    except TelegramError as e:
+        logger.error(f"Band javobini yuborishda xato: {e}")
+
+# Yangilanishlar parallel, bitta foydalanuvchiniki esa tartib bilan
+update_processor = PerUserUpdateProcessor(
+    UPDATE_CONCURRENCY,
+    max_pending=ADMISSION_MAX_PENDING,
+    on_shed=reply_busy
+)
+
+if METRICS_ENABLED:
+    metrics.Gauge(
+        'bot_subscription_cache_events', 'Obuna keshi statistikasi', ('event',),
+        function=lambda: {(event,): value for event, value in membership_cache.stats().items()}
+    )
+    metrics.Gauge(
+        'bot_flood_control_events', 'Flood nazorati statistikasi', ('event',),
+        function=lambda: {(event,): value for event, value in answer_limiter.stats().items()}
+    )
+    metrics.Gauge(
+        'bot_render_cache_events', 'Tayyor xabarlar keshi statistikasi', ('event',),
+        function=lambda: {(event,): value for event, value in render_cache.stats().items()}
+    )
+    metrics.Gauge(
+        'bot_admission_events', 'Navbat va yuklamani kamaytirish statistikasi', ('event',),
+        function=lambda: {(event,): value for event, value in update_processor.stats().items()}
+    )
+
+# ============ STARTUP TIMING ============
+
+startup_phases = {}
+
+# Birinchi yangilanish o'lchovi boshqa handlerlardan keyin ishlaydi
+FIRST_UPDATE_GROUP = 99
+
+def mark_startup(phase: str):
+    """Ishga tushish bosqichi tugagan vaqtni yozish (log va metrika)"""
+    elapsed = time.perf_counter() - STARTUP_STARTED
+    startup_phases[phase] = elapsed
+    logger.info(f"Ishga tushish: {phase} - {elapsed:.3f} s")
+    if METRICS_ENABLED:
+        metrics.STARTUP_SECONDS.set(elapsed, phase=phase)
+
+async def first_update_probe(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Birinchi yangilanish qayta ishlangan vaqtni yozish (oxirgi guruhda ishlaydi)"""
+    if 'first_update' not in startup_phases:
+        mark_startup('first_update')
+    # Bir marta yetarli: keyingi yangilanishlar uchun context yaratilmasin
+    context.application.remove_handler(first_update_handler, group=FIRST_UPDATE_GROUP)
+
+first_update_handler = TypeHandler(Update, first_update_probe)
+
+async def save_admin_state(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Admin holatini (waiting_for) darhol saqlash: keyingi xabari boshqa bot nusxasiga tushishi mumkin"""
+    if update.effective_user and update.effective_user.id == ADMIN_ID and context.application.persistence:
+        await context.application.persistence.save_user_data_now(ADMIN_ID, context.user_data)
 
 # ============ HELPER FUNCTIONS ============
 
+async def check_membership(bot, channel_id: str, user_id: int) -> bool:
+    """Bitta kanal uchun obunani Telegram API orqali tekshirish va keshlash"""
+    try:
+        member = await bot.get_chat_member(chat_id=channel_id, user_id=user_id)
+    except TelegramError as e:
+        logger.error(f"Kanal tekshirishda xato {channel_id}: {e}")
+        return False
+    
+    is_member = member.status not in ['left', 'kicked']
+    membership_cache.set(user_id, channel_id, is_member)
+    
+    # Kuzatiladigan kanalda keyingi o'zgarishlar chat_member orqali keladi
+    if subscription_tracker.is_tracked(channel_id):
+        subscription_tracker.record(channel_id, user_id, is_member)
+        await db.set_channel_member(channel_id, user_id, is_member)
+    return is_member
+
 async def is_user_subscribed(bot, user_id: int) -> bool:
     """Foydalanuvchi barcha majburiy kanallarga obuna bo'lganligini tekshirish"""
-    channels = db.get_all_channels()
+    channels = await db.get_all_channels()
     
     if not channels:
         return True  # Agar kanal yo'q bo'lsa, obuna shart emas
     
+    # Avval mahalliy holat va keshdan, keyin qolgan kanallarni bir vaqtda tekshiramiz
+    pending = []
     for channel_id, _ in channels:
-        try:
-            member = await bot.get_chat_member(chat_id=channel_id, user_id=user_id)
-            if member.status in ['left', 'kicked']:
-                return False
-        except TelegramError as e:
-            logger.error(f"Kanal tekshirishda xato {channel_id}: {e}")
+        is_member = subscription_tracker.lookup(channel_id, user_id)
+        if is_member is None:
+            is_member = membership_cache.get(user_id, channel_id)
+        if is_member is False:
             return False
+        if is_member is None:
+            pending.append(channel_id)
+    
+    if not pending:
+        return True
+    
+    results = await asyncio.gather(
+        *(check_membership(bot, channel_id, user_id) for channel_id in pending)
+    )
+    return all(results)
+
+async def refresh_channel_tracking(bot, channel_id: str):
+    """Bot kanalda admin ekanligini tekshirib, kuzatuvni yoqish yoki o'chirish"""
+    try:
+        member = await bot.get_chat_member(chat_id=channel_id, user_id=bot.id)
+    except TelegramError as e:
+        logger.error(f"Bot holatini tekshirishda xato {channel_id}: {e}")
+        subscription_tracker.set_tracked(channel_id, False)
+        return
+    
+    subscription_tracker.set_tracked(channel_id, member.status in ['administrator', 'creator'])
+
+async def load_subscription_state(bot):
+    """Saqlangan obuna holatini yuklash va kuzatiladigan kanallarni aniqlash"""
+    subscription_tracker.load(await db.get_channel_members())
+    channels = await db.get_all_channels()
+    await asyncio.gather(
+        *(refresh_channel_tracking(bot, channel_id) for channel_id, _ in channels)
+    )
+
+async def flood_guard(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Juda tez-tez yuborilgan javoblarni database va API ishidan oldin to'xtatish"""
+    if not answer_limiter.allow(update.effective_user.id):
+        raise ApplicationHandlerStop
+
+# ============ RENDERED MESSAGES ============
+
+# Ro'yxatlar sahifalarga bo'linadi, xabar hajmi testlar soniga bog'liq emas
+TESTS_PAGE_SIZE = 30
+CHANNELS_PAGE_SIZE = 20
+
+# Tayyor xabarlar kontent versiyasi (testlar/kanallar) bo'yicha keshlanadi
+render_cache = RenderCache()
+
+class Rendered(NamedTuple):
+    text: str
+    reply_markup: Optional[InlineKeyboardMarkup]
+    empty: bool
+
+# Admin ro'yxatlari: ko'rinish -> (sarlavha, keyingi xabar nimani kutadi)
+ADMIN_TEST_VIEWS = {
+    'leaderboard': ("📊 <b>Leaderboard</b>\n\nTest raqamini yuboring:\n\n", 'leaderboard_view'),
+    'question_stats': ("📈 <b>Savollar tahlili</b>\n\nTest raqamini yuboring:\n\n", 'question_stats_view'),
+    'export': ("📥 <b>Natijalarni yuklab olish</b>\n\nTest raqamini yuboring:\n\n", 'export'),
+    'archive': (
+        "🗄 <b>Testni yopish va arxivlash</b>\n\n"
+        "Test raqamini yuboring. Javoblar arxivga ko'chiriladi, natijalar ko'rinib turadi, "
+        "lekin yangi javoblar qabul qilinmaydi.\n\n",
+        'test_archive'
+    ),
+}
+ADMIN_CHANNEL_VIEWS = {
+    'remove_channel': ("➖ <b>Kanal o'chirish</b>\n\nO'chirish uchun kanal ID sini yuboring:\n\n", 'channel_remove'),
+    'list_channels': ("📝 <b>Majburiy kanallar:</b>\n\n", None),
+}
+
+def page_keyboard(prefix: str, page: int, pages: int) -> Optional[InlineKeyboardMarkup]:
+    """Oldingi/keyingi sahifa tugmalari (bitta sahifa bo'lsa None)"""
+    if pages <= 1:
+        return None
     
-    return True
+    buttons = []
+    if page > 0:
+        buttons.append(InlineKeyboardButton("⬅️ Oldingi", callback_data=f"{prefix}:{page - 1}"))
+    if page < pages - 1:
+        buttons.append(InlineKeyboardButton("Keyingi ➡️", callback_data=f"{prefix}:{page + 1}"))
+    return InlineKeyboardMarkup([buttons])
+
+def page_footer(page: int, pages: int) -> str:
+    return f"\n📄 Sahifa {page + 1}/{pages}" if pages > 1 else ""
 
-def check_answer(user_answer: str, correct_answer: str) -> tuple:
-    """Javoblarni tekshirish va to'g'ri javoblar sonini qaytarish"""
-    user_answer = user_answer.lower().strip()
-    correct_answer = correct_answer.lower().strip()
+async def render_tests_page(page: int) -> Rendered:
+    """/tests ro'yxatining bitta sahifasi"""
+    key = ('tests', page)
+    version = db.tests_version
+    cached = render_cache.get(key, version)
+    if cached is not None:
+        return cached
     
-    # Uzunliklarni tenglash
-    min_len = min(len(user_answer), len(correct_answer))
-    correct_count = 0
+    # Yopilgan testlar foydalanuvchilarga ko'rsatilmaydi
+    tests = await db.get_all_tests(include_archived=False)
+    if not tests:
+        rendered = Rendered("❌ Hozircha testlar mavjud emas.", None, True)
+    else:
+        items, page, pages = paginate(tests, page, TESTS_PAGE_SIZE)
+        text = "📋 <b>Mavjud testlar:</b>\n\n"
+        for test_id in items:
+            text += f"• Test #{test_id}\n"
+        
+        text += "\n💡 Test topshirish uchun:\n<code>&lt;test raqami&gt;*javoblar</code>"
+        text += page_footer(page, pages)
+        rendered = Rendered(text, page_keyboard('tests_page', page, pages), False)
     
-    for i in range(min_len):
-        if user_answer[i] == correct_answer[i]:
-            correct_count += 1
+    # O'qish paytida test qo'shilgan bo'lsa, eski versiya bilan saqlanadi va keyingi so'rovda yangilanadi
+    render_cache.set(key, version, rendered)
+    return rendered
+
+async def render_admin_tests(view: str, page: int) -> Rendered:
+    """Admin paneldagi test tanlash ro'yxatining bitta sahifasi"""
+    key = ('admin_tests', view, page)
+    version = db.tests_version
+    cached = render_cache.get(key, version)
+    if cached is not None:
+        return cached
+    
+    tests = await db.get_all_tests(include_archived=view != 'archive')
+    if not tests:
+        rendered = Rendered("❌ Hozircha testlar mavjud emas.", None, True)
+    else:
+        items, page, pages = paginate(tests, page, TESTS_PAGE_SIZE)
+        text = ADMIN_TEST_VIEWS[view][0]
+        for test_id in items:
+            text += f"• Test #{test_id}{' 🗄' if db.is_test_archived(test_id) else ''}\n"
+        
+        if view == 'export' and xlsx_available():
+            text += "\nExcel fayli uchun: <code>&lt;test raqami&gt; xlsx</code>"
+        text += page_footer(page, pages)
+        rendered = Rendered(text, page_keyboard(f'admin_page:{view}', page, pages), False)
+    
+    render_cache.set(key, version, rendered)
+    return rendered
+
+async def render_admin_channels(view: str, page: int) -> Rendered:
+    """Admin paneldagi kanallar ro'yxatining bitta sahifasi"""
+    key = ('admin_channels', view, page)
+    version = db.channels_version
+    cached = render_cache.get(key, version)
+    if cached is not None:
+        return cached
+    
+    channels = await db.get_all_channels()
+    if not channels:
+        rendered = Rendered("❌ Hozircha kanallar mavjud emas.", None, True)
+    else:
+        items, page, pages = paginate(channels, page, CHANNELS_PAGE_SIZE)
+        text = ADMIN_CHANNEL_VIEWS[view][0]
+        for channel_id, channel_name in items:
+            text += f"• <code>{channel_id}</code> - {channel_name or 'Nomsiz'}\n"
+        
+        text += page_footer(page, pages)
+        rendered = Rendered(text, page_keyboard(f'admin_page:{view}', page, pages), False)
+    
+    render_cache.set(key, version, rendered)
+    return rendered
+
+async def show_admin_list(query, context: ContextTypes.DEFAULT_TYPE, view: str, page: int = 0):
+    """Admin ro'yxatini ko'rsatish va keyingi xabar uchun holatni o'rnatish"""
+    if view in ADMIN_TEST_VIEWS:
+        rendered = await render_admin_tests(view, page)
+        waiting_for = ADMIN_TEST_VIEWS[view][1]
+    else:
+        rendered = await render_admin_channels(view, page)
+        waiting_for = ADMIN_CHANNEL_VIEWS[view][1]
     
-    total_count = len(correct_answer)
-    return correct_count, total_count
+    await query.edit_message_text(rendered.text, reply_markup=rendered.reply_markup, parse_mode='HTML')
+    if waiting_for and not rendered.empty:
+        context.user_data['waiting_for'] = waiting_for
 
 # ============ USER COMMANDS ============
 
+@timed_handler
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Start buyrug'i"""
     user = update.effective_user
     
-    # Foydalanuvchini database ga qo'shish
-    db.add_user(
+    # Foydalanuvchini database ga qo'shish (guruh bilan, fonda saqlanadi)
+    user_buffer.add(
         user_id=user.id,
         username=user.username,
         first_name=user.first_name,
@@ -92,15 +396,15 @@ Masalan: <code>1*abcdabcdabcd</code>
 💡 Buyruqlar:
 /help - Yordam
 /tests - Mavjud testlar ro'yxati
+/rank - Umumiy reytingdagi o'rningiz
 
 ⚠️ Har bir test uchun faqat 1 marta javob yuborishingiz mumkin!
 """
     
     await update.message.reply_text(welcome_text, parse_mode='HTML')
 
-async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Yordam buyrug'i"""
-    help_text = """
+# Yordam matni o'zgarmaydi, bir marta tayyorlanadi
+HELP_TEXT = """
 📚 <b>Bot qo'llanmasi</b>
 
 <b>Test topshirish:</b>
@@ -120,39 +424,65 @@ Misol:
 /start - Botni qayta ishga tushirish
 /help - Bu yordam
 /tests - Mavjud testlar ro'yxati
+/rank - Umumiy reytingdagi o'rningiz
 """
-    
-    if update.effective_user.id == ADMIN_ID:
-        help_text += """
+
+ADMIN_HELP_TEXT = HELP_TEXT + """
 <b>Admin buyruqlari:</b>
 /admin - Admin panel
+/rebuild_stats &lt;test raqami&gt; - Savollar statistikasini qayta hisoblash
+/backup - Database ning oxirgi zaxira nusxasi
 """
-    
+
+@timed_handler
+async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Yordam buyrug'i"""
+    help_text = ADMIN_HELP_TEXT if update.effective_user.id == ADMIN_ID else HELP_TEXT
     await update.message.reply_text(help_text, parse_mode='HTML')
 
+@timed_handler
 async def tests_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Mavjud testlar ro'yxatini ko'rsatish"""
-    tests = db.get_all_tests()
+    rendered = await render_tests_page(0)
+    await update.message.reply_text(rendered.text, reply_markup=rendered.reply_markup, parse_mode='HTML')
+
+@timed_handler
+async def tests_page_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """/tests ro'yxatining boshqa sahifasini ko'rsatish"""
+    query = update.callback_query
+    await query.answer()
     
-    if not tests:
-        await update.message.reply_text("❌ Hozircha testlar mavjud emas.")
-        return
+    rendered = await render_tests_page(int(query.data.split(':')[1]))
+    await query.edit_message_text(rendered.text, reply_markup=rendered.reply_markup, parse_mode='HTML')
+
+@timed_handler
+async def rank_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Foydalanuvchining barcha testlar bo'yicha umumiy o'rni"""
+    rank = await db.get_user_global_rank(update.effective_user.id)
     
-    text = "📋 <b>Mavjud testlar:</b>\n\n"
-    for test_id in tests:
-        text += f"• Test #{test_id}\n"
+    if not rank:
+        await update.message.reply_text("❌ Siz hali birorta ham test topshirmagansiz.")
+        return
     
-    text += "\n💡 Test topshirish uchun:\n<code>&lt;test raqami&gt;*javoblar</code>"
+    text = f"""
+🌍 <b>Umumiy reyting</b>
+
+🏅 O'rningiz: {rank['rank']}/{rank['participants']}
+📝 Topshirilgan testlar: {rank['tests_taken']}
+📊 To'g'ri javoblar: {rank['total_correct']}/{rank['total_questions']}
+💯 O'rtacha ball: {rank['average_score']:.1f}%
+"""
     
     await update.message.reply_text(text, parse_mode='HTML')
 
+@timed_handler
 async def handle_answer(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Foydalanuvchi javobini qayta ishlash"""
     user = update.effective_user
     message_text = update.message.text.strip()
     
     # Javob formatini tekshirish: <test_id>*<answers>
-    match = re.match(r'^(\d+)\*([a-zA-Z]+)$', message_text)
+    match = ANSWER_RE.match(message_text)
     
     if not match:
         return  # Format noto'g'ri bo'lsa, hech narsa qilmaymiz
@@ -162,7 +492,7 @@ async def handle_answer(update: Update, context: ContextTypes.DEFAULT_TYPE):
     
     # Majburiy obunani tekshirish
     if not await is_user_subscribed(context.bot, user.id):
-        channels = db.get_all_channels()
+        channels = await db.get_all_channels()
         text = "⚠️ Testda qatnashish uchun quyidagi kanallarga obuna bo'lishingiz kerak:\n\n"
         
         for channel_id, channel_name in channels:
@@ -173,52 +503,82 @@ async def handle_answer(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await update.message.reply_text(text)
         return
     
-    # Test mavjudligini tekshirish
-    correct_answer = db.get_test(test_id)
-    if not correct_answer:
+    # Tekshirish va saqlash bitta tranzaksiyada
+    result = await db.submit_answer(user.id, test_id, user_answer)
+    
+    if result['status'] == SUBMIT_UNKNOWN_TEST:
         await update.message.reply_text(f"❌ Test #{test_id} mavjud emas!")
         return
     
-    # Foydalanuvchi oldin javob yuborgan yoki yo'qligini tekshirish
-    if db.has_user_submitted(user.id, test_id):
+    if result['status'] == SUBMIT_TEST_CLOSED:
+        await update.message.reply_text(f"🔒 Test #{test_id} yopilgan, javoblar qabul qilinmaydi.")
+        return
+    
+    if result['status'] == SUBMIT_DUPLICATE:
         await update.message.reply_text(
             f"⚠️ Siz allaqachon Test #{test_id} uchun javob yuborgansiz!\n"
             "Har bir test uchun faqat 1 marta javob berishingiz mumkin."
         )
         return
     
-    # Javoblarni tekshirish
-    correct_count, total_count = check_answer(user_answer, correct_answer)
-    
-    # Natijani saqlash
-    success = db.save_user_answer(
-        user_id=user.id,
-        test_id=test_id,
-        user_answer=user_answer,
-        correct_count=correct_count,
-        total_count=total_count
-    )
-    
-    if not success:
-        await update.message.reply_text("❌ Xatolik yuz berdi. Iltimos qaytadan urinib ko'ring.")
-        return
-    
     # Natijani ko'rsatish
-    score = (correct_count / total_count * 100) if total_count > 0 else 0
+    correct_count = result['correct_count']
+    total_count = result['total_count']
+    score = result['score']
     
     result_text = f"""
 ✅ <b>Test #{test_id} - Natija</b>
 
 📊 To'g'ri javoblar: {correct_count}/{total_count}
 💯 Ball: {score:.1f}%
+🏅 O'rningiz: {result['rank']}/{result['participants']}
 
 {"🎉 Ajoyib natija!" if score >= 80 else "💪 Keyingi safar yaxshiroq bo'ladi!"}
 """
     
     await update.message.reply_text(result_text, parse_mode='HTML')
 
+# ============ SUBSCRIPTION TRACKING ============
+
+@timed_handler
+async def track_chat_member(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Majburiy kanallardagi a'zolik o'zgarishlarini saqlash"""
+    change = update.chat_member
+    channels = await db.get_all_channels()
+    channel_id = match_channel(change.chat, [channel_id for channel_id, _ in channels])
+    
+    if not channel_id:
+        return
+    
+    # chat_member yangilanishi faqat bot admin bo'lgan kanallardan keladi
+    subscription_tracker.set_tracked(channel_id, True)
+    
+    user_id = change.new_chat_member.user.id
+    is_member = change.new_chat_member.status not in ['left', 'kicked']
+    subscription_tracker.record(channel_id, user_id, is_member)
+    membership_cache.set(user_id, channel_id, is_member)
+    await db.set_channel_member(channel_id, user_id, is_member)
+
+@timed_handler
+async def track_bot_membership(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Botning kanaldagi huquqlari o'zgarganini kuzatish"""
+    change = update.my_chat_member
+    channels = await db.get_all_channels()
+    channel_id = match_channel(change.chat, [channel_id for channel_id, _ in channels])
+    
+    if not channel_id:
+        return
+    
+    is_admin = change.new_chat_member.status in ['administrator', 'creator']
+    subscription_tracker.set_tracked(channel_id, is_admin)
+    if not is_admin:
+        await db.clear_channel_members(channel_id)
+    state = "yoqildi" if is_admin else "o'chirildi"
+    logger.info(f"Kanal {channel_id} kuzatuvi {state}")
+
 # ============ ADMIN COMMANDS ============
 
+@timed_handler
 async def admin_panel(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Admin panel"""
     if update.effective_user.id != ADMIN_ID:
@@ -230,7 +590,13 @@ async def admin_panel(update: Update, context: ContextTypes.DEFAULT_TYPE):
         [InlineKeyboardButton("➖ Kanal o'chirish", callback_data="admin_remove_channel")],
         [InlineKeyboardButton("📝 Kanallar ro'yxati", callback_data="admin_list_channels")],
         [InlineKeyboardButton("📋 Test qo'shish", callback_data="admin_add_test")],
+        [InlineKeyboardButton("📂 Testlarni fayldan yuklash", callback_data="admin_import_tests")],
+        [InlineKeyboardButton("🧾 Qog'oz varaqalarni yuklash", callback_data="admin_import_sheets")],
         [InlineKeyboardButton("📊 Leaderboard", callback_data="admin_leaderboard")],
+        [InlineKeyboardButton("🌍 Umumiy reyting", callback_data="admin_global_leaderboard")],
+        [InlineKeyboardButton("📈 Savollar tahlili", callback_data="admin_question_stats")],
+        [InlineKeyboardButton("📥 Natijalarni yuklab olish", callback_data="admin_export")],
+        [InlineKeyboardButton("🗄 Testni arxivlash", callback_data="admin_archive")],
         [InlineKeyboardButton("📢 Broadcasting", callback_data="admin_broadcast")],
     ]
     reply_markup = InlineKeyboardMarkup(keyboard)
@@ -241,6 +607,7 @@ async def admin_panel(update: Update, context: ContextTypes.DEFAULT_TYPE):
         parse_mode='HTML'
     )
 
+@timed_handler
 async def admin_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Admin callback handler"""
     query = update.callback_query
@@ -252,6 +619,12 @@ async def admin_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
     
     data = query.data
     
+    # Ro'yxat sahifalari: admin_page:<ko'rinish>:<sahifa>
+    if data.startswith("admin_page:"):
+        _, view, page = data.split(':')
+        await show_admin_list(query, context, view, int(page))
+        return
+    
     if data == "admin_add_channel":
         await query.edit_message_text(
             "➕ <b>Kanal qo'shish</b>\n\n"
@@ -264,29 +637,10 @@ async def admin_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
         context.user_data['waiting_for'] = 'channel_add'
     
     elif data == "admin_remove_channel":
-        channels = db.get_all_channels()
-        if not channels:
-            await query.edit_message_text("❌ Hozircha kanallar mavjud emas.")
-            return
-        
-        text = "➖ <b>Kanal o'chirish</b>\n\nO'chirish uchun kanal ID sini yuboring:\n\n"
-        for channel_id, channel_name in channels:
-            text += f"• <code>{channel_id}</code> - {channel_name or 'Nomsiz'}\n"
-        
-        await query.edit_message_text(text, parse_mode='HTML')
-        context.user_data['waiting_for'] = 'channel_remove'
+        await show_admin_list(query, context, 'remove_channel')
     
     elif data == "admin_list_channels":
-        channels = db.get_all_channels()
-        if not channels:
-            await query.edit_message_text("❌ Hozircha kanallar mavjud emas.")
-            return
-        
-        text = "📝 <b>Majburiy kanallar:</b>\n\n"
-        for channel_id, channel_name in channels:
-            text += f"• <code>{channel_id}</code> - {channel_name or 'Nomsiz'}\n"
-        
-        await query.edit_message_text(text, parse_mode='HTML')
+        await show_admin_list(query, context, 'list_channels')
     
     elif data == "admin_add_test":
         await query.edit_message_text(
@@ -298,18 +652,59 @@ async def admin_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
         )
         context.user_data['waiting_for'] = 'test_add'
     
+    elif data == "admin_import_tests":
+        await query.edit_message_text(
+            "📂 <b>Testlarni fayldan yuklash</b>\n\n"
+            "Har bir qatorida bitta test bo'lgan .txt yoki .csv fayl yuboring:\n"
+            "<code>&lt;test raqami&gt;*to'g'ri_javoblar</code>\n\n"
+            "Masalan:\n<code>1*abcdabcdabcd\n2*bbcadcab</code>",
+            parse_mode='HTML'
+        )
+        context.user_data['waiting_for'] = 'test_import'
+    
+    elif data == "admin_import_sheets":
+        await query.edit_message_text(
+            "🧾 <b>Qog'oz varaqalarni yuklash</b>\n\n"
+            "Har bir qatorida bitta javob bo'lgan .csv fayl yuboring:\n"
+            "<code>foydalanuvchi,test raqami,javoblar</code>\n\n"
+            "Foydalanuvchi - Telegram ID yoki @username.\n"
+            "Masalan:\n<code>123456789,1,abcdabcd\n@talaba,1,abcdaacd</code>",
+            parse_mode='HTML'
+        )
+        context.user_data['waiting_for'] = 'sheet_import'
+    
     elif data == "admin_leaderboard":
-        tests = db.get_all_tests()
-        if not tests:
-            await query.edit_message_text("❌ Hozircha testlar mavjud emas.")
+        await show_admin_list(query, context, 'leaderboard')
+    
+    elif data == "admin_global_leaderboard":
+        leaderboard = await db.get_global_leaderboard(10)
+        if not leaderboard:
+            await query.edit_message_text("❌ Hozircha natijalar yo'q.")
             return
         
-        text = "📊 <b>Leaderboard</b>\n\nTest raqamini yuboring:\n\n"
-        for test_id in tests:
-            text += f"• Test #{test_id}\n"
+        text = "🌍 <b>Umumiy reyting - Top 10</b>\n\n"
+        
+        for idx, result in enumerate(leaderboard, 1):
+            medal = "🥇" if idx == 1 else "🥈" if idx == 2 else "🥉" if idx == 3 else f"{idx}."
+            name = result['first_name'] or result['username'] or "Nomsiz"
+            correct = result['total_correct']
+            total = result['total_questions']
+            
+            text += (
+                f"{medal} {name} - {correct}/{total} "
+                f"({result['tests_taken']} ta test, o'rtacha {result['average_score']:.1f}%)\n"
+            )
         
         await query.edit_message_text(text, parse_mode='HTML')
-        context.user_data['waiting_for'] = 'leaderboard_view'
+    
+    elif data == "admin_question_stats":
+        await show_admin_list(query, context, 'question_stats')
+    
+    elif data == "admin_export":
+        await show_admin_list(query, context, 'export')
+    
+    elif data == "admin_archive":
+        await show_admin_list(query, context, 'archive')
     
     elif data == "admin_broadcast":
         await query.edit_message_text(
@@ -319,6 +714,7 @@ async def admin_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
         )
         context.user_data['waiting_for'] = 'broadcast'
 
+@timed_handler
 async def admin_message_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Admin xabarlarini qayta ishlash"""
     if update.effective_user.id != ADMIN_ID:
@@ -337,7 +733,9 @@ async def admin_message_handler(update: Update, context: ContextTypes.DEFAULT_TY
         channel_id = parts[0]
         channel_name = parts[1] if len(parts) > 1 else None
         
-        db.add_channel(channel_id, channel_name)
+        await db.add_channel(channel_id, channel_name)
+        membership_cache.invalidate_channel(channel_id)
+        await refresh_channel_tracking(context.bot, channel_id)
         await update.message.reply_text(
             f"✅ Kanal qo'shildi!\n"
             f"ID: <code>{channel_id}</code>\n"
@@ -348,7 +746,9 @@ async def admin_message_handler(update: Update, context: ContextTypes.DEFAULT_TY
     
     elif waiting_for == 'channel_remove':
         channel_id = message_text
-        db.remove_channel(channel_id)
+        await db.remove_channel(channel_id)
+        membership_cache.invalidate_channel(channel_id)
+        subscription_tracker.forget_channel(channel_id)
         await update.message.reply_text(
             f"✅ Kanal o'chirildi: <code>{channel_id}</code>",
             parse_mode='HTML'
@@ -357,7 +757,7 @@ async def admin_message_handler(update: Update, context: ContextTypes.DEFAULT_TY
     
     elif waiting_for == 'test_add':
         # Format: <test_id>*<answers>
-        match = re.match(r'^(\d+)\*([a-zA-Z]+)$', message_text)
+        match = ANSWER_RE.match(message_text)
         
         if not match:
             await update.message.reply_text(
@@ -371,13 +771,21 @@ async def admin_message_handler(update: Update, context: ContextTypes.DEFAULT_TY
         test_id = int(match.group(1))
         answers = match.group(2).lower()
         
-        db.add_test(test_id, answers, ADMIN_ID)
-        await update.message.reply_text(
+        regrade = await db.add_test(test_id, answers, ADMIN_ID)
+        text = (
             f"✅ Test qo'shildi!\n"
             f"Test #{test_id}\n"
-            f"Savollar soni: {len(answers)}",
-            parse_mode='HTML'
+            f"Savollar soni: {len(answers)}"
         )
+        
+        if regrade:
+            text += (
+                f"\n\n♻️ Kalit o'zgardi, javoblar qayta baholandi:\n"
+                f"Tekshirilgan javoblar: {regrade['regraded']}\n"
+                f"Natijasi o'zgarganlar: {regrade['changed']}"
+            )
+        
+        await update.message.reply_text(text, parse_mode='HTML')
         context.user_data.pop('waiting_for', None)
     
     elif waiting_for == 'leaderboard_view':
@@ -387,7 +795,7 @@ async def admin_message_handler(update: Update, context: ContextTypes.DEFAULT_TY
             await update.message.reply_text("❌ Noto'g'ri test raqami!")
             return
         
-        leaderboard = db.get_leaderboard(test_id, limit=10)
+        leaderboard = await db.get_leaderboard(test_id, limit=10)
         
         if not leaderboard:
             await update.message.reply_text(f"❌ Test #{test_id} uchun natijalar yo'q.")
@@ -408,54 +816,262 @@ async def admin_message_handler(update: Update, context: ContextTypes.DEFAULT_TY
         await update.message.reply_text(text, parse_mode='HTML')
         context.user_data.pop('waiting_for', None)
     
-    elif waiting_for == 'broadcast':
-        users = db.get_all_users()
+    elif waiting_for == 'question_stats_view':
+        try:
+            test_id = int(message_text)
+        except ValueError:
+            await update.message.reply_text("❌ Noto'g'ri test raqami!")
+            return
+        
+        stats = await db.get_question_stats(test_id)
+        context.user_data.pop('waiting_for', None)
+        
+        if stats is None:
+            await update.message.reply_text(f"❌ Test #{test_id} mavjud emas!")
+            return
+        
+        await update.message.reply_text(format_question_stats(test_id, stats), parse_mode='HTML')
+    
+    elif waiting_for == 'export':
+        # Format: <test_id> yoki <test_id> xlsx
+        parts = message_text.lower().split()
+        try:
+            test_id = int(parts[0])
+        except (IndexError, ValueError):
+            await update.message.reply_text("❌ Noto'g'ri test raqami!")
+            return
+        fmt = FORMAT_XLSX if parts[1:] == [FORMAT_XLSX] else FORMAT_CSV
+        context.user_data.pop('waiting_for', None)
+        
+        if not await db.get_test(test_id):
+            await update.message.reply_text(f"❌ Test #{test_id} mavjud emas!")
+            return
+        
+        # Fayl fonda tayyorlanadi, bot bu vaqtda boshqa so'rovlarga javob beradi
+        if not await exporter.start(context.bot, test_id, update.effective_chat.id, fmt):
+            await update.message.reply_text(f"⏳ Test #{test_id} natijalari allaqachon tayyorlanmoqda.")
+    
+    elif waiting_for == 'test_archive':
+        try:
+            test_id = int(message_text)
+        except ValueError:
+            await update.message.reply_text("❌ Noto'g'ri test raqami!")
+            return
+        context.user_data.pop('waiting_for', None)
         
-        success_count = 0
-        fail_count = 0
+        before = await db.get_storage_stats()
+        result = await db.archive_test(test_id)
+        if result is None:
+            await update.message.reply_text(f"❌ Test #{test_id} mavjud emas!")
+            return
+        if result['already']:
+            await update.message.reply_text(f"ℹ️ Test #{test_id} allaqachon arxivlangan.")
+            return
         
+        # Bo'shagan joy fayldan qismlab qaytariladi, oradagi javoblar kutib qolmaydi
+        after = await db.compact()
+        logger.info(f"Test #{test_id} arxivlandi: {result['archived']} ta javob")
         await update.message.reply_text(
-            f"📤 Xabar yuborilmoqda...\n"
-            f"Jami foydalanuvchilar: {len(users)}"
+            f"✅ Test #{test_id} yopildi va arxivlandi!\n"
+            f"Ko'chirilgan javoblar: {result['archived']}\n"
+            f"Database: {before['size'] / 1024 / 1024:.1f} MB → {after['size'] / 1024 / 1024:.1f} MB"
+            + ("" if after['incremental'] else "\nℹ️ Fayl qisqartirilmadi (auto_vacuum yoqilmagan), bo'sh joy qayta ishlatiladi.")
         )
+    
+    elif waiting_for == 'broadcast':
+        # Yuborish fonda bajariladi, holat shu chatda yangilanib boradi
+        job_id = await broadcaster.start(context.bot, message_text, update.effective_chat.id)
+        logger.info(f"Broadcasting #{job_id} boshlandi")
+        context.user_data.pop('waiting_for', None)
+
+@timed_handler
+async def admin_document_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Admin yuborgan fayllarni qayta ishlash"""
+    if update.effective_user.id != ADMIN_ID:
+        return
+    
+    waiting_for = context.user_data.get('waiting_for')
+    
+    if waiting_for == 'test_import':
+        context.user_data.pop('waiting_for', None)
+        path = await download_document(update.message.document)
+        try:
+            # Fayl oqim bilan o'qiladi, event loop bloklanmaydi
+            tests, errors = await asyncio.to_thread(parse_tests_file, path)
+        finally:
+            os.remove(path)
         
-        for user_id in users:
-            try:
-                await context.bot.send_message(
-                    chat_id=user_id,
-                    text=f"📢 <b>E'lon</b>\n\n{message_text}",
-                    parse_mode='HTML'
+        text = ""
+        if tests:
+            summary = await db.add_tests_bulk(list(tests.items()), ADMIN_ID)
+            text += (
+                f"✅ Testlar yuklandi!\n"
+                f"Yangi: {summary['added']}\n"
+                f"Yangilangan: {summary['updated']}\n"
+            )
+            if summary['regraded']:
+                text += (
+                    f"♻️ Qayta baholangan javoblar: {summary['regraded']} "
+                    f"(o'zgarganlar: {summary['changed']})\n"
                 )
-                success_count += 1
-                await asyncio.sleep(0.05)  # Telegram limitga tushmaslik uchun
-            except Exception as e:
-                fail_count += 1
-                logger.error(f"Xabar yuborishda xato {user_id}: {e}")
+        else:
+            text += "❌ Faylda yaroqli test topilmadi.\n"
+        
+        if errors:
+            text += f"\n⚠️ Xatolar ({len(errors)}):\n" + format_errors(errors)
+        
+        await update.message.reply_text(text)
+    
+    elif waiting_for == 'sheet_import':
+        chat_id = update.effective_chat.id
+        if sheet_importer.is_running(chat_id):
+            await update.message.reply_text("⏳ Oldingi import hali tugamagan.")
+            return
+        
+        context.user_data.pop('waiting_for', None)
+        path = await download_document(update.message.document)
+        # Import fonda bajariladi, holat shu chatda yangilanib boradi
+        await sheet_importer.start(context.bot, path, chat_id)
+
+def format_question_stats(test_id: int, stats: list, limit: int = 15) -> str:
+    """Eng ko'p xato qilingan savollar ro'yxatini tayyorlash"""
+    answered = [item for item in stats if item['answered']]
+    if not answered:
+        return f"❌ Test #{test_id} uchun natijalar yo'q."
+    
+    # To'g'ri javob ulushi bo'yicha o'sish tartibida (eng qiyinlari birinchi)
+    answered.sort(key=lambda item: item['correct_count'] / item['answered'])
+    
+    text = f"📈 <b>Test #{test_id} - Savollar tahlili</b>\n"
+    text += f"Eng qiyin {min(limit, len(answered))} ta savol:\n\n"
+    
+    for item in answered[:limit]:
+        rate = item['correct_count'] / item['answered'] * 100
+        text += f"<b>{item['position']}-savol</b>: {rate:.0f}% to'g'ri (kalit: {item['correct_answer'].upper()})"
         
+        wrong = {choice: picks for choice, picks in item['choices'].items() if choice != item['correct_answer']}
+        if wrong:
+            choice, picks = max(wrong.items(), key=lambda pair: pair[1])
+            text += f", ko'p tanlangan xato: {choice.upper()} ({picks / item['answered'] * 100:.0f}%)"
+        text += "\n"
+    
+    return text
+
+@timed_handler
+async def rebuild_stats_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Savollar statistikasini qayta hisoblash: /rebuild_stats <test raqami>"""
+    if update.effective_user.id != ADMIN_ID:
+        await update.message.reply_text("❌ Sizda admin huquqi yo'q!")
+        return
+    
+    try:
+        test_id = int(context.args[0])
+    except (IndexError, ValueError):
         await update.message.reply_text(
-            f"✅ Broadcasting tugadi!\n"
-            f"Muvaffaqiyatli: {success_count}\n"
-            f"Xatolik: {fail_count}"
+            "Format: <code>/rebuild_stats &lt;test raqami&gt;</code>",
+            parse_mode='HTML'
         )
-        context.user_data.pop('waiting_for', None)
+        return
+    
+    if not await db.rebuild_question_stats(test_id):
+        await update.message.reply_text(f"❌ Test #{test_id} mavjud emas!")
+        return
+    
+    await update.message.reply_text(f"✅ Test #{test_id} statistikasi qayta hisoblandi.")
 
-# ============ KEEP-ALIVE MECHANISM ============
+@timed_handler
+async def backup_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Oxirgi zaxira nusxani yuborish (nusxa bo'lmasa yangisi olinadi)"""
+    if update.effective_user.id != ADMIN_ID:
+        await update.message.reply_text("❌ Sizda admin huquqi yo'q!")
+        return
+    
+    path = backups.latest()
+    if path is None:
+        await update.message.reply_text("⏳ Zaxira nusxa olinmoqda...")
+        try:
+            path = await backups.run_backup()
+        except Exception as e:
+            logger.error(f"Zaxira nusxa olishda xato: {e}")
+            await update.message.reply_text("❌ Zaxira nusxa olib bo'lmadi!")
+            return
+    
+    created = datetime.fromtimestamp(os.path.getmtime(path)).strftime('%Y-%m-%d %H:%M')
+    
+    # Asosiy database va (bo'lsa) arxiv nusxasi
+    for title, snapshot in (("Zaxira nusxa", path), ("Arxiv nusxasi", backups.archive_snapshot(path))):
+        if snapshot is None:
+            continue
+        
+        size = os.path.getsize(snapshot)
+        if size > MAX_DOCUMENT_SIZE:
+            await update.message.reply_text(
+                f"⚠️ {title} Telegram orqali yuborish uchun juda katta ({size / 1024 / 1024:.0f} MB).\n"
+                f"Serverdagi fayl: <code>{snapshot}</code>",
+                parse_mode='HTML'
+            )
+            continue
+        
+        with open(snapshot, 'rb') as f:
+            await update.message.reply_document(
+                document=f,
+                filename=os.path.basename(snapshot),
+                caption=f"💾 {title}: {created}, {size / 1024 / 1024:.1f} MB"
+            )
+
+# ============ WEB SERVER (HEALTH + WEBHOOK) ============
 
 async def health_check(request):
     """Health check endpoint"""
     return web.Response(text="OK")
 
-async def start_web_server():
-    """Aiohttp web server ishga tushirish"""
+async def metrics_endpoint(request):
+    """Prometheus metrikalari"""
+    return web.Response(text=metrics.render(), content_type='text/plain', charset='utf-8')
+
+async def telegram_webhook(request):
+    """Telegram yangilanishlarini qabul qilib, Application navbatiga qo'yish"""
+    application = request.app['application']
+    
+    token = request.headers.get('X-Telegram-Bot-Api-Secret-Token', '')
+    if not hmac.compare_digest(token.encode(), request.app['webhook_secret'].encode()):
+        return web.Response(status=403)
+    
+    try:
+        data = await request.json()
+    except ValueError:
+        return web.Response(status=400)
+    
+    update = Update.de_json(data, application.bot)
+    await application.update_queue.put(update)
+    return web.Response(text="OK")
+
+def create_web_app(application: Application = None, webhook_secret: str = None) -> web.Application:
+    """Aiohttp ilovasini yaratish (webhook_secret berilsa webhook ham qabul qilinadi)"""
     app = web.Application()
     app.router.add_get('/health', health_check)
     
+    if METRICS_ENABLED:
+        app.router.add_get('/metrics', metrics_endpoint)
+    
+    if webhook_secret:
+        app['application'] = application
+        app['webhook_secret'] = webhook_secret
+        app.router.add_post(WEBHOOK_PATH, telegram_webhook)
+    
+    return app
+
+async def start_web_server(app: web.Application) -> web.AppRunner:
+    """Aiohttp web server ishga tushirish"""
     runner = web.AppRunner(app)
     await runner.setup()
     site = web.TCPSite(runner, '0.0.0.0', PORT)
     await site.start()
     
     logger.info(f"Web server started on port {PORT}")
+    return runner
+
+# ============ KEEP-ALIVE MECHANISM ============
 
 async def keep_alive_ping():
     """O'zini o'zi ping qilish (Render uchun)"""
@@ -474,29 +1090,28 @@ async def keep_alive_ping():
 
 # ============ MAIN ============
 
-async def main():
-    """Asosiy funksiya"""
-    # Application yaratish (kompatibilik uchun)
-    try:
-        # Birinchi usul: Builder pattern (eski versialar)
-        application = Application.builder().token(BOT_TOKEN).build()
-    except AttributeError:
-        try:
-            # Ikkinchi usul: To'g'ri Application (yangi versialar)
-            application = Application(token=BOT_TOKEN)
-        except Exception as e:
-            logger.error(f"Application yaratish xatosi: {e}")
-            # Uchinchi usul: Builder pattern odatiy usul
-            application = Application()
-            application.token = BOT_TOKEN
+def register_handlers(application: Application):
+    """Handlerlarni qo'shish"""
+    # Flood nazorati boshqa handlerlardan oldin ishlaydi (group -1)
+    application.add_handler(MessageHandler(
+        filters.Regex(ANSWER_RE) & ~filters.User(ADMIN_ID),
+        flood_guard
+    ), group=-1)
     
-    # Handlerlarni qo'shish
     application.add_handler(CommandHandler("start", start))
     application.add_handler(CommandHandler("help", help_command))
     application.add_handler(CommandHandler("tests", tests_command))
+    application.add_handler(CommandHandler("rank", rank_command))
     application.add_handler(CommandHandler("admin", admin_panel))
+    application.add_handler(CommandHandler("rebuild_stats", rebuild_stats_command))
+    application.add_handler(CommandHandler("backup", backup_command))
     
     application.add_handler(CallbackQueryHandler(admin_callback, pattern="^admin_"))
+    application.add_handler(CallbackQueryHandler(tests_page_callback, pattern=r"^tests_page:\d+$"))
+    
+    # Kanal a'zoligi yangilanishlari
+    application.add_handler(ChatMemberHandler(track_chat_member, ChatMemberHandler.CHAT_MEMBER))
+    application.add_handler(ChatMemberHandler(track_bot_membership, ChatMemberHandler.MY_CHAT_MEMBER))
     
     # Message handlerlar (tartib muhim!)
     application.add_handler(MessageHandler(
@@ -504,17 +1119,116 @@ async def main():
         admin_message_handler
     ))
     application.add_handler(MessageHandler(
-        filters.Regex(r'^\d+\*[a-zA-Z]+$'),
+        filters.Document.ALL & filters.User(ADMIN_ID),
+        admin_document_handler
+    ))
+    application.add_handler(MessageHandler(
+        filters.Regex(ANSWER_RE),
         handle_answer
     ))
     
+    # Boshqa handlerlardan keyin: admin holatini darhol saqlash va birinchi yangilanish vaqtini o'lchash
+    application.add_handler(TypeHandler(Update, save_admin_state), group=98)
+    application.add_handler(first_update_handler, group=FIRST_UPDATE_GROUP)
+
+def build_application(request=None) -> Application:
+    """Application yaratish va handlerlarni ro'yxatdan o'tkazish
+    
+    request berilsa (masalan, test uchun soxta Telegram), barcha API
+    so'rovlari u orqali yuboriladi.
+    """
+    builder = Application.builder().token(BOT_TOKEN)
+    if request is not None:
+        builder = builder.request(request).get_updates_request(request)
+    elif METRICS_ENABLED:
+        # getUpdates (long polling) o'lchanmaydi, faqat bot chaqiruvlari
+        builder = builder.request(metrics.InstrumentedRequest(connection_pool_size=256))
+    
+    builder = builder.concurrent_updates(update_processor)
+    
+    # Admin holati (waiting_for) qayta ishga tushganda yo'qolmasligi uchun
+    builder = builder.persistence(
+        SQLitePersistence(db, update_interval=PERSISTENCE_INTERVAL, shared_user_ids=(ADMIN_ID,))
+    )
+    
+    application = builder.build()
+    register_handlers(application)
+    return application
+
+async def post_init(application: Application):
+    """Bot ishga tushgandan keyin bajariladigan sozlashlar"""
+    user_buffer.start()
+    await load_subscription_state(application.bot)
+    await broadcaster.resume(application.bot)
+    if BACKUP_INTERVAL > 0:
+        backups.start(BACKUP_INTERVAL)
+
+async def post_shutdown(application: Application):
+    """To'xtashdan oldin buferlarni bo'shatish"""
+    await user_buffer.stop()
+    await backups.stop()
+
+async def main():
+    """Asosiy funksiya"""
+    mark_startup('imports')
+    
+    # Sxemani yangilash va javob kalitlarini yuklash
+    schema_version = await db.migrate()
+    mark_startup('migrations')
+    logger.info(f"Database sxemasi versiyasi: {schema_version}")
+    await db.check_auto_vacuum()
+    
+    application = build_application()
+    
+    webhook_secret = None
+    if USE_WEBHOOK:
+        webhook_secret = WEBHOOK_SECRET
+        if not webhook_secret:
+            webhook_secret = secrets.token_urlsafe(32)
+            logger.warning("WEBHOOK_SECRET o'rnatilmagan, vaqtinchalik token yaratildi")
+    
     # Web server va keep-alive boshlash
-    asyncio.create_task(start_web_server())
-    asyncio.create_task(keep_alive_ping())
+    runner = await start_web_server(create_web_app(application, webhook_secret))
+    keep_alive_task = asyncio.create_task(keep_alive_ping())
+    if METRICS_ENABLED:
+        lag_task = asyncio.create_task(metrics.monitor_event_loop_lag())
     
-    # Botni ishga tushirish (polling)
-    logger.info("Bot ishga tushmoqda...")
-    await application.run_polling(allowed_updates=Update.ALL_TYPES)
+    # SIGINT/SIGTERM kelganda to'xtash
+    stop_event = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop_event.set)
+    
+    try:
+        async with application:
+            await post_init(application)
+            await application.start()
+            
+            if USE_WEBHOOK:
+                # Yangilanishlar aiohttp serverdagi WEBHOOK_PATH orqali keladi
+                logger.info("Bot webhook rejimida ishga tushmoqda...")
+                await application.bot.set_webhook(
+                    url=f"{WEBHOOK_URL}{WEBHOOK_PATH}",
+                    secret_token=webhook_secret,
+                    allowed_updates=Update.ALL_TYPES
+                )
+            else:
+                logger.info("Bot ishga tushmoqda...")
+                await application.updater.start_polling(allowed_updates=Update.ALL_TYPES)
+            mark_startup('ready')
+            
+            await stop_event.wait()
+            
+            if application.updater.running:
+                await application.updater.stop()
+            await application.stop()
+            await post_shutdown(application)
+    finally:
+        keep_alive_task.cancel()
+        if METRICS_ENABLED:
+            lag_task.cancel()
+        await runner.cleanup()
+        db.close()
 
 if __name__ == '__main__':
     asyncio.run(main())
@@ -0,0 +1,163 @@
+import asyncio
+import logging
+import time
+from datetime import timedelta
+from typing import Dict
+
+from telegram.error import Forbidden, RetryAfter, TelegramError
+
+from async_database import AsyncDatabase
+from config import METRICS_ENABLED
+from metrics import BROADCAST_MESSAGES
+from ratelimit import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+# Bitta xabarni RetryAfter dan keyin qayta yuborishlar soni
+MAX_SEND_ATTEMPTS = 5
+
+SEND_OK = 'sent'
+SEND_FAILED = 'failed'
+SEND_BLOCKED = 'blocked'
+
+
+def retry_delay(error: RetryAfter) -> float:
+    """RetryAfter dagi kutish vaqtini soniyalarda olish"""
+    delay = error.retry_after
+    if isinstance(delay, timedelta):
+        return delay.total_seconds()
+    return float(delay)
+
+
+class BroadcastManager:
+    """Fon rejimida ishlaydigan, qayta ishga tushganda davom etadigan broadcasting.
+
+    Foydalanuvchilar database dan user_id bo'yicha qismlab o'qiladi, har bir
+    qism bir vaqtda (concurrency bilan cheklangan) yuboriladi. Umumiy tezlik
+    Telegram limitiga mos token bucket bilan cheklanadi. Har bir chatga vazifa
+    davomida bitta xabar yuboriladi (qayta urinish faqat RetryAfter kutilgandan
+    keyin), shuning uchun alohida chat uchun cheklovchi yo'q.
+
+    Har bir yuborish natijasi darhol broadcast_deliveries ga, qism oxirida esa
+    holat broadcast_jobs ga yoziladi. Jarayon to'xtab qolsa, vazifa 'running'
+    holatida qoladi va keyingi ishga tushishda oxirgi saqlangan qismdan davom
+    etadi: natijasi saqlangan foydalanuvchilarga qayta yuborilmaydi.
+    """
+
+    def __init__(self, db: AsyncDatabase, rate: float = 28, burst: float = 30,
+                 concurrency: int = 20, batch_size: int = 500, progress_interval: float = 5):
+        self.db = db
+        self.bucket = TokenBucket(rate, burst)
+        self.concurrency = concurrency
+        self.batch_size = batch_size
+        self.progress_interval = progress_interval
+        self._tasks: Dict[int, asyncio.Task] = {}
+
+    async def start(self, bot, text: str, chat_id: int) -> int:
+        """Yangi broadcasting vazifasini yaratib, fonda ishga tushirish"""
+        progress = await bot.send_message(chat_id=chat_id, text="📤 Xabar yuborilmoqda...")
+        job_id = await self.db.create_broadcast_job(text, chat_id, progress.message_id)
+        self._spawn(bot, job_id)
+        return job_id
+
+    async def resume(self, bot):
+        """Qayta ishga tushgandan keyin tugallanmagan vazifalarni davom ettirish"""
+        for job in await self.db.get_running_broadcast_jobs():
+            if job['job_id'] not in self._tasks:
+                logger.info(f"Broadcasting #{job['job_id']} davom ettirilmoqda")
+                self._spawn(bot, job['job_id'])
+
+    def _spawn(self, bot, job_id: int):
+        task = asyncio.create_task(self._run(bot, job_id))
+        self._tasks[job_id] = task
+        task.add_done_callback(lambda _: self._tasks.pop(job_id, None))
+
+    async def _run(self, bot, job_id: int):
+        job = await self.db.get_broadcast_job(job_id)
+        # To'xtab qolgan qismda yuborilganlar ham hisobga kiradi
+        counts = {SEND_OK: 0, SEND_FAILED: 0, SEND_BLOCKED: 0}
+        counts.update(await self.db.get_broadcast_counts(job_id))
+        last_user_id = job['last_user_id']
+        semaphore = asyncio.Semaphore(self.concurrency)
+        last_report = 0.0
+
+        async def send(user_id: int) -> str:
+            async with semaphore:
+                result = await self._send(bot, user_id, job['text'])
+            await self.db.record_broadcast_delivery(job_id, user_id, result)
+            return result
+
+        try:
+            while True:
+                page = await self.db.get_user_ids_page(last_user_id, self.batch_size)
+                if not page:
+                    break
+
+                delivered = await self.db.get_broadcast_delivered(job_id, page)
+                results = await asyncio.gather(*(send(user_id) for user_id in page if user_id not in delivered))
+
+                for result in results:
+                    counts[result] += 1
+                    if METRICS_ENABLED:
+                        BROADCAST_MESSAGES.inc(result=result)
+
+                last_user_id = page[-1]
+                await self.db.update_broadcast_progress(
+                    job_id, last_user_id, counts[SEND_OK], counts[SEND_FAILED], counts[SEND_BLOCKED]
+                )
+
+                if time.monotonic() - last_report >= self.progress_interval:
+                    last_report = time.monotonic()
+                    await self._report(bot, job, counts, finished=False)
+        except Exception as e:
+            logger.error(f"Broadcasting #{job_id} xatosi: {e}")
+            await self.db.finish_broadcast_job(job_id, 'failed')
+            return
+
+        await self.db.finish_broadcast_job(job_id, 'done')
+        await self._report(bot, job, counts, finished=True)
+
+    async def _send(self, bot, user_id: int, text: str) -> str:
+        """Bitta foydalanuvchiga yuborish (RetryAfter da kutib qayta urinadi)"""
+        for _ in range(MAX_SEND_ATTEMPTS):
+            await self.bucket.acquire()
+            try:
+                await bot.send_message(
+                    chat_id=user_id,
+                    text=f"📢 <b>E'lon</b>\n\n{text}",
+                    parse_mode='HTML'
+                )
+                return SEND_OK
+            except RetryAfter as e:
+                # Limitdan oshib ketdik: butun bucket ni to'xtatib turamiz
+                self.bucket.pause(retry_delay(e))
+            except Forbidden:
+                return SEND_BLOCKED
+            except TelegramError as e:
+                logger.error(f"Xabar yuborishda xato {user_id}: {e}")
+                return SEND_FAILED
+
+        return SEND_FAILED
+
+    async def _report(self, bot, job: Dict, counts: Dict, finished: bool):
+        """Admin ga jarayon haqida xabarni yangilash"""
+        if finished:
+            text = "✅ Broadcasting tugadi!\n"
+        else:
+            text = "📤 Xabar yuborilmoqda...\n"
+
+        done = counts[SEND_OK] + counts[SEND_FAILED] + counts[SEND_BLOCKED]
+        text += (
+            f"Jarayon: {done}/{job['total_count']}\n"
+            f"Muvaffaqiyatli: {counts[SEND_OK]}\n"
+            f"Xatolik: {counts[SEND_FAILED]}\n"
+            f"Botni bloklagan: {counts[SEND_BLOCKED]}"
+        )
+
+        try:
+            if job['message_id']:
+                await bot.edit_message_text(chat_id=job['chat_id'], message_id=job['message_id'], text=text)
+            else:
+                await bot.send_message(chat_id=job['chat_id'], text=text)
+        except TelegramError as e:
+            logger.error(f"Broadcasting holatini yangilashda xato: {e}")
@@ -0,0 +1,97 @@
+import asyncio
+from typing import Awaitable, Callable, Dict, List
+
+from telegram import Update
+from telegram.ext import BaseUpdateProcessor
+
+# Asosiy semaforni amalda cheklamaslik uchun: navbat va parallellikni
+# PerUserUpdateProcessor o'zi boshqaradi
+UNBOUNDED = 1_000_000
+
+
+class PerUserUpdateProcessor(BaseUpdateProcessor):
+    """Yangilanishlarni parallel, lekin har bir foydalanuvchi uchun ketma-ket qayta ishlash.
+
+    Bir vaqtda ko'pi bilan max_concurrent_updates ta yangilanish bajariladi,
+    qolganlari navbatda kutadi. Bitta foydalanuvchining yangilanishlari
+    (masalan, ikki marta yuborilgan javob yoki admin panelidagi waiting_for
+    holati) kelgan tartibida birma-bir bajariladi: Application yangilanishlar
+    uchun tasklarni kelish tartibida yaratadi, asyncio.Lock esa kutuvchilarni
+    FIFO tartibida o'tkazadi.
+
+    Navbatdagi va bajarilayotgan yangilanishlar soni max_pending dan oshsa,
+    foydalanuvchi xabarlari qayta ishlanmaydi va on_shed chaqiriladi
+    (masalan, "band, keyinroq urinib ko'ring" javobi uchun).
+    """
+
+    def __init__(self, max_concurrent_updates: int, max_pending: int = None,
+                 on_shed: Callable[[Update], Awaitable] = None):
+        super().__init__(UNBOUNDED)
+        self.concurrency = max_concurrent_updates
+        self.max_pending = max_pending
+        self.on_shed = on_shed
+        self._slots = asyncio.Semaphore(max_concurrent_updates)
+        # user_id -> [lock, shu lockni kutayotgan/ushlab turgan yangilanishlar soni]
+        self._user_locks: Dict[int, List] = {}
+        self.pending = 0
+        self.admitted = 0
+        self.shed = 0
+
+    def _should_shed(self, update) -> bool:
+        if self.max_pending is None or self.pending < self.max_pending:
+            return False
+        # Faqat foydalanuvchi xabarlari tashlanadi; callback va chat_member
+        # yangilanishlari holatni o'zgartiradi, ular navbatda kutadi
+        return isinstance(update, Update) and update.message is not None
+
+    async def do_process_update(self, update, coroutine):
+        if self._should_shed(update):
+            self.shed += 1
+            coroutine.close()
+            if self.on_shed is not None:
+                await self.on_shed(update)
+            return
+
+        self.admitted += 1
+        self.pending += 1
+        try:
+            user_id = None
+            if isinstance(update, Update) and update.effective_user:
+                user_id = update.effective_user.id
+
+            if user_id is None:
+                async with self._slots:
+                    await coroutine
+                return
+
+            entry = self._user_locks.get(user_id)
+            if entry is None:
+                entry = self._user_locks[user_id] = [asyncio.Lock(), 0]
+            entry[1] += 1
+
+            try:
+                # Avval foydalanuvchi navbati, keyin umumiy slot: bitta foydalanuvchi
+                # xabarlari slotlarni band qilib turmaydi
+                async with entry[0]:
+                    async with self._slots:
+                        await coroutine
+            finally:
+                entry[1] -= 1
+                if entry[1] == 0:
+                    del self._user_locks[user_id]
+        finally:
+            self.pending -= 1
+
+    def stats(self) -> Dict:
+        """Navbat statistikasi"""
+        return {
+            'pending': self.pending,
+            'admitted': self.admitted,
+            'shed': self.shed,
+        }
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass
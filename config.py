@@ -4,8 +4,57 @@ BOT_TOKEN = os.getenv("BOT_TOKEN", "8351720359:AAG7N6I1zcb_zcSDSA6oFwkfhvDeEGJZ2
 ADMIN_ID = int(os.getenv("ADMIN_ID", "5792951787"))
 
 DATABASE_PATH = os.getenv("DATABASE_PATH", "bot_data.db")
+DB_READER_THREADS = int(os.getenv("DB_READER_THREADS", "4"))
+# Yopilgan testlar javoblari (bo'sh bo'lsa: <DATABASE_PATH nomi>_archive.db)
+ARCHIVE_PATH = os.getenv("ARCHIVE_PATH", "")
+
+# /start foydalanuvchilarini guruh bilan saqlash (soniya / yozuvlar soni)
+USER_FLUSH_INTERVAL = float(os.getenv("USER_FLUSH_INTERVAL", "0.2"))
+USER_FLUSH_MAX_ROWS = int(os.getenv("USER_FLUSH_MAX_ROWS", "500"))
+
+# user_data/chat_data/bot_data ni database ga saqlash oralig'i (soniya)
+PERSISTENCE_INTERVAL = float(os.getenv("PERSISTENCE_INTERVAL", "5"))
 
 PORT = 8000
 SELF_URL ="https://mini-zyou.onrender.com"
 
+# Webhook rejimi (standart: polling)
+USE_WEBHOOK = os.getenv("USE_WEBHOOK", "false").lower() in ("1", "true", "yes")
+WEBHOOK_URL = os.getenv("WEBHOOK_URL", SELF_URL)
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/webhook")
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET", "")
+
+# Majburiy obuna tekshiruvi keshi (soniyalarda)
+SUBSCRIPTION_CACHE_TTL = int(os.getenv("SUBSCRIPTION_CACHE_TTL", "300"))
+SUBSCRIPTION_CACHE_NEGATIVE_TTL = int(os.getenv("SUBSCRIPTION_CACHE_NEGATIVE_TTL", "30"))
+SUBSCRIPTION_CACHE_SIZE = int(os.getenv("SUBSCRIPTION_CACHE_SIZE", "50000"))
+
+# Broadcasting (Telegram: umumiy ~30 xabar/soniya)
+BROADCAST_RATE = float(os.getenv("BROADCAST_RATE", "28"))
+BROADCAST_BURST = float(os.getenv("BROADCAST_BURST", "30"))
+BROADCAST_CONCURRENCY = int(os.getenv("BROADCAST_CONCURRENCY", "20"))
+BROADCAST_BATCH_SIZE = int(os.getenv("BROADCAST_BATCH_SIZE", "500"))
+BROADCAST_PROGRESS_INTERVAL = float(os.getenv("BROADCAST_PROGRESS_INTERVAL", "5"))
+
+# Bir vaqtda qayta ishlanadigan yangilanishlar soni (1 - ketma-ket)
+UPDATE_CONCURRENCY = int(os.getenv("UPDATE_CONCURRENCY", "64"))
+
+# Navbat chegarasi: undan oshsa foydalanuvchiga "band" javobi qaytariladi
+ADMISSION_MAX_PENDING = int(os.getenv("ADMISSION_MAX_PENDING", "1000"))
+
+# Foydalanuvchi javoblari uchun flood nazorati (token bucket)
+FLOOD_RATE = float(os.getenv("FLOOD_RATE", "0.5"))   # soniyasiga
+FLOOD_BURST = float(os.getenv("FLOOD_BURST", "3"))
+FLOOD_MAX_USERS = int(os.getenv("FLOOD_MAX_USERS", "100000"))
+
+# Zaxira nusxalar (BACKUP_INTERVAL=0 - davriy nusxa olinmaydi)
+BACKUP_DIR = os.getenv("BACKUP_DIR", "backups")
+BACKUP_INTERVAL = float(os.getenv("BACKUP_INTERVAL", "21600"))  # 6 soat
+BACKUP_KEEP = int(os.getenv("BACKUP_KEEP", "5"))
+BACKUP_PAGES = int(os.getenv("BACKUP_PAGES", "256"))  # bir qadamdagi sahifalar
+BACKUP_SLEEP = float(os.getenv("BACKUP_SLEEP", "0.005"))  # qadamlar orasida (soniya)
+
+# Prometheus /metrics (o'chiq bo'lsa o'lchovlar umuman qo'shilmaydi)
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "false").lower() in ("1", "true", "yes")
+
 KEEP_ALIVE_INTERVAL = 600  # 10 daqiqa
@@ -1,89 +1,153 @@
+import os
 import sqlite3
 import json
+import threading
+from collections import Counter
 from datetime import datetime
-from typing import List, Dict, Optional, Tuple
+from typing import Iterator, List, Dict, Optional, Set, Tuple
+
+import migrations
+from grading import AnswerKey, choice_rows, compile_key, count_choices, grade_many
+from leaderboard import RankIndex
+
+# Har bir connection ochilganda o'rnatiladigan sozlamalar
+SQLITE_PRAGMAS = (
+    # Birinchi bo'lishi kerak: yangi database da darhol, mavjudida VACUUM dan keyin kuchga kiradi
+    ('auto_vacuum', 'INCREMENTAL'),
+    ('journal_mode', 'WAL'),       # o'quvchilar yozuvchini bloklamaydi
+    ('synchronous', 'NORMAL'),     # WAL da har commit uchun fsync shart emas
+    ('cache_size', -20000),        # ~20 MB sahifa keshi
+    ('mmap_size', 268435456),      # 256 MB memory-mapped I/O
+    ('temp_store', 'MEMORY'),
+    ('busy_timeout', 5000),        # yozuv qulfini 5 soniyagacha kutish
+)
+
+# submit_answer natijalari
+SUBMIT_GRADED = 'graded'
+SUBMIT_DUPLICATE = 'duplicate'
+SUBMIT_UNKNOWN_TEST = 'unknown_test'
+SUBMIT_TEST_CLOSED = 'test_closed'
+
+# Qog'oz varaqalarni import qilishdagi xato sabablari
+IMPORT_UNKNOWN_USER = 'unknown_user'
+IMPORT_UNKNOWN_TEST = 'unknown_test'
+IMPORT_DUPLICATE = 'duplicate'
+IMPORT_ALREADY_SUBMITTED = 'already_submitted'
+IMPORT_TEST_CLOSED = 'test_closed'
+
+# Qayta baholashda bir martada o'qiladigan javoblar soni
+REGRADE_BATCH_SIZE = 5000
+
+# Eksportda bir martada o'qiladigan qatorlar soni
+EXPORT_CHUNK_SIZE = 1000
+
+# Arxivlangan testlar javoblari saqlanadigan database (ATTACH nomi)
+ARCHIVE_SCHEMA = 'archive'
+
+# Incremental vacuum da bir martada bo'shatiladigan sahifalar soni
+VACUUM_STEP_PAGES = 2000
+
+# Har bir connection uchun tayyorlangan (prepared) so'rovlar keshi hajmi
+STATEMENT_CACHE_SIZE = 256
 
 class Database:
-    def __init__(self, db_path: str = "bot_data.db"):
+    def __init__(self, db_path: str = "bot_data.db", archive_path: str = None):
         self.db_path = db_path
-        self.init_db()
+        # Standart: bot_data.db -> bot_data_archive.db
+        self.archive_path = archive_path or f"{os.path.splitext(db_path)[0]}_archive.db"
+        self._local = threading.local()
+        self._connections = []
+        self._connections_lock = threading.Lock()
+        self._channels_cache = None
+        self._channels_version = 0
+        # Kanallar keshi ham reader oqimlarida to'ldiriladi, writer oqimida tozalanadi
+        self._channels_lock = threading.Lock()
+        self._tests_version = 0
+        self._answer_keys: Dict[int, AnswerKey] = {}
+        self._archived_tests = set()
+        self._ranks = RankIndex()
+        self._leaderboard_cache: Dict[Tuple[int, int], List[Dict]] = {}
+        self._leaderboard_versions: Dict[int, int] = {}
+        # Kesh reader oqimlarida to'ldiriladi, writer oqimida tozalanadi
+        self._leaderboard_lock = threading.Lock()
+        # Konstruktor database ga murojaat qilmaydi, sxema migrate() da tayyorlanadi
+        self._schema_version: Optional[int] = None
+        self._migrate_lock = threading.RLock()
     
     def get_connection(self):
-        """Database connection yaratish"""
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row
+        """Joriy oqim (thread) uchun doimiy database connection olish"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(
+                self.db_path,
+                check_same_thread=False,
+                cached_statements=STATEMENT_CACHE_SIZE
+            )
+            conn.row_factory = sqlite3.Row
+            for name, value in SQLITE_PRAGMAS:
+                conn.execute(f'PRAGMA {name} = {value}')
+            self._attach_archive(conn)
+            self._local.conn = conn
+            with self._connections_lock:
+                self._connections.append(conn)
+            if self._schema_version is None:
+                self.migrate()
         return conn
     
-    def init_db(self):
-        """Database jadvallarini yaratish"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        # Foydalanuvchilar jadvali
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS users (
-                user_id INTEGER PRIMARY KEY,
-                username TEXT,
-                first_name TEXT,
-                last_name TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        # Testlar jadvali (admin tomonidan kiritilgan to'g'ri javoblar)
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS tests (
-                test_id INTEGER PRIMARY KEY,
-                answers TEXT NOT NULL,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                created_by INTEGER,
-                FOREIGN KEY (created_by) REFERENCES users(user_id)
-            )
-        ''')
-        
-        # Foydalanuvchilar javoblari
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS user_answers (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id INTEGER NOT NULL,
-                test_id INTEGER NOT NULL,
-                user_answer TEXT NOT NULL,
-                correct_count INTEGER NOT NULL,
-                total_count INTEGER NOT NULL,
-                score REAL NOT NULL,
-                submitted_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (user_id) REFERENCES users(user_id),
-                FOREIGN KEY (test_id) REFERENCES tests(test_id),
-                UNIQUE(user_id, test_id)
-            )
-        ''')
-        
-        # Majburiy kanallar
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS channels (
-                channel_id TEXT PRIMARY KEY,
-                channel_name TEXT,
-                added_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
+    def close(self):
+        """Barcha ochiq connectionlarni yopish"""
+        with self._connections_lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections.clear()
+        self._local = threading.local()
+    
+    def _attach_archive(self, conn: sqlite3.Connection):
+        """Arxiv database ni connection ga ulash (fayl bo'lmasa yaratiladi)"""
+        conn.execute(f'ATTACH DATABASE ? AS {ARCHIVE_SCHEMA}', (self.archive_path,))
+        conn.execute(f'PRAGMA {ARCHIVE_SCHEMA}.journal_mode = WAL')
+        conn.execute(f'PRAGMA {ARCHIVE_SCHEMA}.synchronous = NORMAL')
+    
+    def migrate(self) -> int:
+        """Sxemani oxirgi versiyaga keltirish va kalitlar keshini yuklash
         
-        conn.commit()
-        conn.close()
+        Bir marta bajariladi: main() dan oldindan chaqiriladi, aks holda
+        birinchi connection ochilganda avtomatik ishga tushadi.
+        """
+        with self._migrate_lock:
+            if self._schema_version is None:
+                conn = self.get_connection()
+                self._schema_version = migrations.migrate(conn)
+                migrations.create_archive_tables(conn, ARCHIVE_SCHEMA)
+                self.load_answer_keys()
+        return self._schema_version
     
     # ============ USER OPERATIONS ============
     
     def add_user(self, user_id: int, username: str = None, first_name: str = None, last_name: str = None):
         """Yangi foydalanuvchi qo'shish yoki mavjudini yangilash"""
+        self.add_users([(user_id, username, first_name, last_name)])
+    
+    def add_users(self, users: List[Tuple[int, str, str, str]]):
+        """Foydalanuvchilarni bitta tranzaksiyada qo'shish yoki yangilash
+        
+        Mavjud foydalanuvchining created_at qiymati saqlanib qoladi, botni
+        qayta ishga tushirgani uchun blocked_at belgisi olib tashlanadi.
+        """
         conn = self.get_connection()
         cursor = conn.cursor()
         
-        cursor.execute('''
-            INSERT OR REPLACE INTO users (user_id, username, first_name, last_name)
+        cursor.executemany('''
+            INSERT INTO users (user_id, username, first_name, last_name)
             VALUES (?, ?, ?, ?)
-        ''', (user_id, username, first_name, last_name))
+            ON CONFLICT(user_id) DO UPDATE SET
+                username = excluded.username,
+                first_name = excluded.first_name,
+                last_name = excluded.last_name,
+                blocked_at = NULL
+        ''', users)
         
         conn.commit()
-        conn.close()
     
     def get_all_users(self) -> List[int]:
         """Barcha foydalanuvchilar ID larini olish"""
@@ -93,44 +157,248 @@ class Database:
         cursor.execute('SELECT user_id FROM users')
         users = [row[0] for row in cursor.fetchall()]
         
-        conn.close()
         return users
     
-    # ============ TEST OPERATIONS ============
-    
-    def add_test(self, test_id: int, answers: str, created_by: int):
-        """Yangi test qo'shish yoki mavjudini yangilash"""
+    def get_user_ids_page(self, after_user_id: int, limit: int) -> List[int]:
+        """Botni bloklamagan foydalanuvchilarni user_id bo'yicha qismlab olish"""
         conn = self.get_connection()
         cursor = conn.cursor()
         
         cursor.execute('''
-            INSERT OR REPLACE INTO tests (test_id, answers, created_by)
-            VALUES (?, ?, ?)
-        ''', (test_id, answers.lower(), created_by))
+            SELECT user_id FROM users
+            WHERE user_id > ? AND blocked_at IS NULL
+            ORDER BY user_id
+            LIMIT ?
+        ''', (after_user_id, limit))
+        
+        return [row[0] for row in cursor.fetchall()]
+    
+    def mark_users_blocked(self, user_ids: List[int]):
+        """Botni bloklagan foydalanuvchilarni belgilash"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.executemany(
+            'UPDATE users SET blocked_at = CURRENT_TIMESTAMP WHERE user_id = ?',
+            [(user_id,) for user_id in user_ids]
+        )
         
         conn.commit()
-        conn.close()
+    
+    # ============ TEST OPERATIONS ============
+    
+    def add_test(self, test_id: int, answers: str, created_by: int) -> Optional[Dict]:
+        """Yangi test qo'shish yoki mavjudini yangilash
+        
+        Mavjud testning kaliti o'zgarsa, saqlangan barcha javoblar shu
+        tranzaksiyada qayta baholanadi va natija qaytariladi:
+        {'regraded': ..., 'changed': ...}. Aks holda None.
+        """
+        old_key = self.get_answer_key(test_id)
+        key = compile_key(answers)
+        
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        try:
+            cursor.execute('BEGIN IMMEDIATE')
+            cursor.execute('''
+                INSERT INTO tests (test_id, answers, created_by)
+                VALUES (?, ?, ?)
+                ON CONFLICT(test_id) DO UPDATE SET
+                    answers = excluded.answers,
+                    created_by = excluded.created_by
+            ''', (test_id, answers.lower(), created_by))
+            
+            summary = None
+            if old_key is not None and old_key.answers != key.answers:
+                summary = self._regrade(cursor, test_id, key)
+                self._rebuild_question_stats(cursor, test_id, key.total_count)
+            
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        
+        self._answer_keys[test_id] = key
+        self._tests_version += 1
+        if summary and summary['changed']:
+            self._invalidate_leaderboard(test_id)
+        return summary
+    
+    def add_tests_bulk(self, tests: List[Tuple[int, str]], created_by: int) -> Dict:
+        """Ko'p testni bitta tranzaksiyada qo'shish yoki yangilash
+        
+        Kaliti o'zgargan mavjud testlar shu tranzaksiyada qayta baholanadi.
+        Kalitlar keshi va leaderboardlar oxirida bir marta yangilanadi.
+        Natija: {'added': ..., 'updated': ..., 'regraded': ..., 'changed': ...}
+        """
+        keys = {test_id: compile_key(answers) for test_id, answers in tests}
+        old_keys = {test_id: self.get_answer_key(test_id) for test_id in keys}
+        summary = {'added': 0, 'updated': 0, 'regraded': 0, 'changed': 0}
+        changed_tests = []
+        
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        try:
+            cursor.execute('BEGIN IMMEDIATE')
+            cursor.executemany('''
+                INSERT INTO tests (test_id, answers, created_by)
+                VALUES (?, ?, ?)
+                ON CONFLICT(test_id) DO UPDATE SET
+                    answers = excluded.answers,
+                    created_by = excluded.created_by
+            ''', [(test_id, key.answers, created_by) for test_id, key in keys.items()])
+            
+            for test_id, key in keys.items():
+                old_key = old_keys[test_id]
+                if old_key is None:
+                    summary['added'] += 1
+                    continue
+                
+                summary['updated'] += 1
+                if old_key.answers != key.answers:
+                    regrade = self._regrade(cursor, test_id, key)
+                    self._rebuild_question_stats(cursor, test_id, key.total_count)
+                    summary['regraded'] += regrade['regraded']
+                    summary['changed'] += regrade['changed']
+                    if regrade['changed']:
+                        changed_tests.append(test_id)
+            
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        
+        self._answer_keys.update(keys)
+        self._tests_version += 1
+        for test_id in changed_tests:
+            self._invalidate_leaderboard(test_id)
+        return summary
+    
+    def regrade_test(self, test_id: int) -> Optional[Dict]:
+        """Test javoblarini joriy kalit bo'yicha qayta baholash"""
+        key = self.get_answer_key(test_id)
+        if key is None:
+            return None
+        
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        try:
+            cursor.execute('BEGIN IMMEDIATE')
+            summary = self._regrade(cursor, test_id, key)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        
+        if summary['changed']:
+            self._invalidate_leaderboard(test_id)
+        return summary
+    
+    def _regrade(self, cursor, test_id: int, key: AnswerKey,
+                 batch_size: int = REGRADE_BATCH_SIZE) -> Dict:
+        """Javoblarni qismlab o'qib, vektorli tekshirib, yangilarini yozish"""
+        total_count = key.total_count
+        table = self._answers_table(test_id)
+        regraded = 0
+        changed = 0
+        last_id = 0
+        
+        while True:
+            cursor.execute(f'''
+                SELECT id, user_answer, correct_count, total_count, score, user_id
+                FROM {table}
+                WHERE test_id = ? AND id > ?
+                ORDER BY id
+                LIMIT ?
+            ''', (test_id, last_id, batch_size))
+            rows = cursor.fetchall()
+            
+            if not rows:
+                break
+            
+            last_id = rows[-1][0]
+            regraded += len(rows)
+            correct_counts = grade_many([row[1] for row in rows], key)
+            
+            updates = []
+            deltas = []
+            for row, correct_count in zip(rows, correct_counts.tolist()):
+                if correct_count != row[2] or total_count != row[3]:
+                    score = (correct_count / total_count * 100) if total_count > 0 else 0
+                    updates.append((correct_count, total_count, score, row[0]))
+                    deltas.append((correct_count - row[2], total_count - row[3], score - row[4], row[5]))
+            
+            if updates:
+                cursor.executemany(f'''
+                    UPDATE {table}
+                    SET correct_count = ?, total_count = ?, score = ?
+                    WHERE id = ?
+                ''', updates)
+                cursor.executemany('''
+                    UPDATE user_totals
+                    SET total_correct = total_correct + ?,
+                        total_questions = total_questions + ?,
+                        score_sum = score_sum + ?
+                    WHERE user_id = ?
+                ''', deltas)
+                changed += len(updates)
+        
+        return {'regraded': regraded, 'changed': changed}
     
     def get_test(self, test_id: int) -> Optional[str]:
         """Test javoblarini olish"""
+        key = self.get_answer_key(test_id)
+        return key.answers if key else None
+    
+    def get_answer_key(self, test_id: int) -> Optional[AnswerKey]:
+        """Keshdan tayyor javob kalitini olish (keshda bo'lmasa database dan)"""
+        key = self._answer_keys.get(test_id)
+        if key is not None:
+            return key
+        
         conn = self.get_connection()
         cursor = conn.cursor()
         
         cursor.execute('SELECT answers FROM tests WHERE test_id = ?', (test_id,))
         result = cursor.fetchone()
         
-        conn.close()
-        return result[0] if result else None
+        if not result:
+            return None
+        
+        key = compile_key(result[0])
+        self._answer_keys[test_id] = key
+        return key
+    
+    def load_answer_keys(self):
+        """Barcha javob kalitlarini keshga yuklash"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute('SELECT test_id, answers, archived_at FROM tests')
+        rows = cursor.fetchall()
+        self._answer_keys = {row[0]: compile_key(row[1]) for row in rows}
+        self._archived_tests = {row[0] for row in rows if row[2] is not None}
+    
+    @property
+    def tests_version(self) -> int:
+        """Testlar o'zgarganda oshadigan hisoblagich (tayyor xabarlar keshi uchun)"""
+        return self._tests_version
     
-    def get_all_tests(self) -> List[int]:
-        """Barcha test ID larini olish"""
+    def get_all_tests(self, include_archived: bool = True) -> List[int]:
+        """Barcha test ID larini olish (include_archived=False - faqat ochiq testlar)"""
         conn = self.get_connection()
         cursor = conn.cursor()
         
-        cursor.execute('SELECT test_id FROM tests ORDER BY test_id')
+        if include_archived:
+            cursor.execute('SELECT test_id FROM tests ORDER BY test_id')
+        else:
+            cursor.execute('SELECT test_id FROM tests WHERE archived_at IS NULL ORDER BY test_id')
         tests = [row[0] for row in cursor.fetchall()]
         
-        conn.close()
         return tests
     
     # ============ USER ANSWER OPERATIONS ============
@@ -149,35 +417,196 @@ class Database:
                 (user_id, test_id, user_answer, correct_count, total_count, score)
                 VALUES (?, ?, ?, ?, ?, ?)
             ''', (user_id, test_id, user_answer, correct_count, total_count, score))
+            self._record_question_stats(cursor, test_id, [user_answer], total_count)
+            self._record_user_totals(cursor, [(user_id, 1, correct_count, total_count, score)])
             
             conn.commit()
-            conn.close()
+            self._invalidate_leaderboard(test_id)
             return True
         except sqlite3.IntegrityError:
-            conn.close()
+            conn.rollback()
             return False
     
+    def submit_answer(self, user_id: int, test_id: int, user_answer: str) -> Dict:
+        """Javobni keshdagi kalit bo'yicha tekshirish va bitta tranzaksiyada saqlash
+        
+        Takroriy javob UNIQUE(user_id, test_id) cheklovi orqali aniqlanadi.
+        Natija: {'status': ..., 'correct_count': ..., 'total_count': ...,
+                 'score': ..., 'rank': ..., 'participants': ...}
+        """
+        key = self.get_answer_key(test_id)
+        if key is None:
+            return {'status': SUBMIT_UNKNOWN_TEST}
+        if test_id in self._archived_tests:
+            return {'status': SUBMIT_TEST_CLOSED}
+        
+        correct_count, total_count = key.grade(user_answer)
+        score = (correct_count / total_count * 100) if total_count > 0 else 0
+        
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        try:
+            cursor.execute('BEGIN IMMEDIATE')
+            cursor.execute('''
+                INSERT INTO user_answers 
+                (user_id, test_id, user_answer, correct_count, total_count, score)
+                VALUES (?, ?, ?, ?, ?, ?)
+                RETURNING id, submitted_at
+            ''', (user_id, test_id, user_answer, correct_count, total_count, score))
+            row_id, submitted_at = cursor.fetchone()
+            self._record_question_stats(cursor, test_id, [user_answer], total_count)
+            self._record_user_totals(cursor, [(user_id, 1, correct_count, total_count, score)])
+            
+            conn.commit()
+        except sqlite3.IntegrityError:
+            conn.rollback()
+            return {'status': SUBMIT_DUPLICATE}
+        except Exception:
+            conn.rollback()
+            raise
+        
+        self._clear_leaderboard_cache(test_id)
+        self._ranks.add(test_id, user_id, score, submitted_at, row_id)
+        rank = self.get_user_rank(user_id, test_id)
+        
+        return {
+            'status': SUBMIT_GRADED,
+            'correct_count': correct_count,
+            'total_count': total_count,
+            'score': score,
+            'rank': rank['rank'] if rank else None,
+            'participants': rank['participants'] if rank else None
+        }
+    
+    def import_answer_sheets(self, rows: List[Tuple[int, object, int, str]]) -> Dict:
+        """Qog'oz varaqalardagi javoblar qismini tekshirib, bitta tranzaksiyada saqlash
+        
+        Qator: (fayldagi qator raqami, user_id yoki username, test_id, javoblar).
+        Har bir test javoblari grade_many bilan birga tekshiriladi va executemany
+        bilan yoziladi. UNIQUE(user_id, test_id) ga zid qatorlar va users
+        jadvalida yo'q foydalanuvchilar (ID yoki username) yozilmaydi.
+        Natija: {'inserted': ..., 'errors': [(qator raqami, sabab, qiymat), ...]}
+        """
+        errors = []
+        
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        # Username va ID lar bo'yicha mavjud foydalanuvchilarni topish
+        usernames = {ref.lstrip('@').lower() for _, ref, _, _ in rows if isinstance(ref, str)}
+        user_ids = {}
+        if usernames:
+            cursor.execute('''
+                SELECT lower(username), user_id FROM users
+                WHERE lower(username) IN (SELECT value FROM json_each(?))
+            ''', (json.dumps(list(usernames)),))
+            user_ids = dict(cursor.fetchall())
+        
+        numeric_ids = {ref for _, ref, _, _ in rows if not isinstance(ref, str)}
+        if numeric_ids:
+            cursor.execute('''
+                SELECT user_id, user_id FROM users
+                WHERE user_id IN (SELECT value FROM json_each(?))
+            ''', (json.dumps(list(numeric_ids)),))
+            user_ids.update(cursor.fetchall())
+        
+        by_test: Dict[int, Dict[int, Tuple[int, str]]] = {}
+        for line_no, ref, test_id, answer in rows:
+            user_id = user_ids.get(ref.lstrip('@').lower() if isinstance(ref, str) else ref)
+            if user_id is None:
+                errors.append((line_no, IMPORT_UNKNOWN_USER, ref))
+            elif self.get_answer_key(test_id) is None:
+                errors.append((line_no, IMPORT_UNKNOWN_TEST, test_id))
+            elif test_id in self._archived_tests:
+                errors.append((line_no, IMPORT_TEST_CLOSED, test_id))
+            elif user_id in by_test.setdefault(test_id, {}):
+                errors.append((line_no, IMPORT_DUPLICATE, user_id))
+            else:
+                by_test[test_id][user_id] = (line_no, answer.lower())
+        
+        inserted = 0
+        totals: Dict[int, List] = {}
+        try:
+            cursor.execute('BEGIN IMMEDIATE')
+            for test_id, answers in by_test.items():
+                if not answers:
+                    continue
+                
+                # Avval javob berganlar (UNIQUE indeksi orqali)
+                cursor.execute('''
+                    SELECT user_id FROM user_answers
+                    WHERE test_id = ? AND user_id IN (SELECT value FROM json_each(?))
+                ''', (test_id, json.dumps(list(answers))))
+                for (user_id,) in cursor.fetchall():
+                    line_no, _ = answers.pop(user_id)
+                    errors.append((line_no, IMPORT_ALREADY_SUBMITTED, user_id))
+                
+                if not answers:
+                    continue
+                
+                key = self.get_answer_key(test_id)
+                total_count = key.total_count
+                user_answers = [answer for _, answer in answers.values()]
+                correct_counts = grade_many(user_answers, key).tolist()
+                
+                inserts = []
+                for user_id, answer, correct_count in zip(answers, user_answers, correct_counts):
+                    score = (correct_count / total_count * 100) if total_count > 0 else 0
+                    inserts.append((user_id, test_id, answer, correct_count, total_count, score))
+                    user_total = totals.setdefault(user_id, [user_id, 0, 0, 0, 0.0])
+                    user_total[1] += 1
+                    user_total[2] += correct_count
+                    user_total[3] += total_count
+                    user_total[4] += score
+                
+                cursor.executemany('''
+                    INSERT INTO user_answers
+                    (user_id, test_id, user_answer, correct_count, total_count, score)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                ''', inserts)
+                self._record_question_stats(cursor, test_id, user_answers, total_count)
+                inserted += len(inserts)
+            
+            self._record_user_totals(cursor, [tuple(row) for row in totals.values()])
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        
+        for test_id, answers in by_test.items():
+            if answers:
+                self._invalidate_leaderboard(test_id)
+        
+        errors.sort()
+        return {'inserted': inserted, 'errors': errors}
+    
     def has_user_submitted(self, user_id: int, test_id: int) -> bool:
         """Foydalanuvchi bu test uchun javob yuborgan yoki yo'qligini tekshirish"""
         conn = self.get_connection()
         cursor = conn.cursor()
         
-        cursor.execute('''
-            SELECT COUNT(*) FROM user_answers 
+        cursor.execute(f'''
+            SELECT COUNT(*) FROM {self._answers_table(test_id)}
             WHERE user_id = ? AND test_id = ?
         ''', (user_id, test_id))
         
         count = cursor.fetchone()[0]
-        conn.close()
         
         return count > 0
     
     def get_leaderboard(self, test_id: int, limit: int = 10) -> List[Dict]:
-        """Ma'lum test uchun eng yaxshi natijalarni olish"""
+        """Ma'lum test uchun eng yaxshi natijalarni olish (arxivlangan test arxivdan o'qiladi)"""
+        with self._leaderboard_lock:
+            cached = self._leaderboard_cache.get((test_id, limit))
+            if cached is not None:
+                return list(cached)
+            version = self._leaderboard_versions.get(test_id, 0)
+        
         conn = self.get_connection()
         cursor = conn.cursor()
         
-        cursor.execute('''
+        cursor.execute(f'''
             SELECT 
                 ua.user_id,
                 u.first_name,
@@ -187,10 +616,10 @@ class Database:
                 ua.total_count,
                 ua.score,
                 ua.submitted_at
-            FROM user_answers ua
+            FROM {self._answers_table(test_id)} ua
             JOIN users u ON ua.user_id = u.user_id
             WHERE ua.test_id = ?
-            ORDER BY ua.score DESC, ua.submitted_at ASC
+            ORDER BY ua.score DESC, ua.submitted_at ASC, ua.id ASC
             LIMIT ?
         ''', (test_id, limit))
         
@@ -207,9 +636,385 @@ class Database:
                 'submitted_at': row[7]
             })
         
-        conn.close()
+        # O'qish paytida yangi javob saqlangan bo'lsa, keshlamaymiz
+        with self._leaderboard_lock:
+            if version == self._leaderboard_versions.get(test_id, 0):
+                self._leaderboard_cache[(test_id, limit)] = results
+        return list(results)
+    
+    def iter_test_results(self, test_id: int, chunk_size: int = EXPORT_CHUNK_SIZE) -> Iterator[Tuple]:
+        """Testning barcha natijalarini leaderboard tartibida qismlab o'qish
+        
+        Alohida connection ochiladi va qatorlar fetchmany bilan olinadi,
+        shuning uchun xotira natijalar soniga bog'liq emas. Generator
+        oxirigacha o'qilmasa ham connection close() da yopiladi.
+        Qator: (rank, user_id, username, first_name, last_name,
+                correct_count, total_count, score, user_answer, submitted_at)
+        """
+        conn = sqlite3.connect(self.db_path)
+        try:
+            self._attach_archive(conn)
+            cursor = conn.cursor()
+            cursor.execute(f'''
+                SELECT
+                    ua.user_id,
+                    u.username,
+                    u.first_name,
+                    u.last_name,
+                    ua.correct_count,
+                    ua.total_count,
+                    ua.score,
+                    ua.user_answer,
+                    ua.submitted_at
+                FROM {self._answers_table(test_id)} ua
+                LEFT JOIN users u ON ua.user_id = u.user_id
+                WHERE ua.test_id = ?
+                ORDER BY ua.score DESC, ua.submitted_at ASC, ua.id ASC
+            ''', (test_id,))
+        
+            rank = 0
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                for row in rows:
+                    rank += 1
+                    yield (rank,) + row
+        finally:
+            conn.close()
+    
+    def get_user_rank(self, user_id: int, test_id: int) -> Optional[Dict]:
+        """Foydalanuvchining test bo'yicha o'rni: {'rank': ..., 'participants': ...}"""
+        with self._ranks.lock:
+            if not self._ranks.is_loaded(test_id):
+                conn = self.get_connection()
+                cursor = conn.cursor()
+                
+                cursor.execute(f'''
+                    SELECT user_id, score, submitted_at, id
+                    FROM {self._answers_table(test_id)}
+                    WHERE test_id = ?
+                ''', (test_id,))
+                self._ranks.load(test_id, cursor.fetchall())
+            
+            rank = self._ranks.rank(test_id, user_id)
+        
+        if rank is None:
+            return None
+        return {'rank': rank[0], 'participants': rank[1]}
+    
+    def _clear_leaderboard_cache(self, test_id: int):
+        with self._leaderboard_lock:
+            self._leaderboard_versions[test_id] = self._leaderboard_versions.get(test_id, 0) + 1
+            for key in [key for key in self._leaderboard_cache if key[0] == test_id]:
+                self._leaderboard_cache.pop(key, None)
+    
+    def _invalidate_leaderboard(self, test_id: int):
+        """Top-N keshini va o'rinlar indeksini bekor qilish"""
+        self._clear_leaderboard_cache(test_id)
+        self._ranks.invalidate(test_id)
+    
+    # ============ GLOBAL LEADERBOARD ============
+    
+    def _record_user_totals(self, cursor, totals: List[Tuple[int, int, int, int, float]]):
+        """Yangi javoblarni foydalanuvchilar jamlanmasiga qo'shish (chaqiruvchi tranzaksiyasida)
+        
+        Qator: (user_id, testlar soni, to'g'ri javoblar, savollar, ballar yig'indisi)
+        """
+        cursor.executemany('''
+            INSERT INTO user_totals (user_id, tests_taken, total_correct, total_questions, score_sum)
+            VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT(user_id) DO UPDATE SET
+                tests_taken = tests_taken + excluded.tests_taken,
+                total_correct = total_correct + excluded.total_correct,
+                total_questions = total_questions + excluded.total_questions,
+                score_sum = score_sum + excluded.score_sum
+        ''', totals)
+    
+    def get_global_leaderboard(self, limit: int = 10) -> List[Dict]:
+        """Barcha testlar bo'yicha eng ko'p to'g'ri javob berganlar"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            SELECT 
+                t.user_id,
+                u.first_name,
+                u.last_name,
+                u.username,
+                t.tests_taken,
+                t.total_correct,
+                t.total_questions,
+                t.score_sum
+            FROM user_totals t
+            LEFT JOIN users u ON t.user_id = u.user_id
+            ORDER BY t.total_correct DESC, t.total_questions ASC, t.user_id ASC
+            LIMIT ?
+        ''', (limit,))
+        
+        results = []
+        for row in cursor.fetchall():
+            results.append({
+                'user_id': row[0],
+                'first_name': row[1],
+                'last_name': row[2],
+                'username': row[3],
+                'tests_taken': row[4],
+                'total_correct': row[5],
+                'total_questions': row[6],
+                'average_score': row[7] / row[4] if row[4] else 0
+            })
+        
         return results
     
+    def get_user_global_rank(self, user_id: int) -> Optional[Dict]:
+        """Foydalanuvchining umumiy reytingdagi o'rni va jamlangan natijalari
+        
+        O'rin indeks bo'yicha uchta oraliqni sanash orqali topiladi, shuning
+        uchun butun jadvalni saralash shart emas.
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            SELECT tests_taken, total_correct, total_questions, score_sum
+            FROM user_totals WHERE user_id = ?
+        ''', (user_id,))
+        row = cursor.fetchone()
+        
+        if not row:
+            return None
+        
+        tests_taken, total_correct, total_questions, score_sum = row
+        cursor.execute('''
+            SELECT
+                (SELECT COUNT(*) FROM user_totals WHERE total_correct > ?)
+              + (SELECT COUNT(*) FROM user_totals
+                 WHERE total_correct = ? AND total_questions < ?)
+              + (SELECT COUNT(*) FROM user_totals
+                 WHERE total_correct = ? AND total_questions = ? AND user_id < ?),
+                (SELECT COUNT(*) FROM user_totals)
+        ''', (total_correct, total_correct, total_questions,
+              total_correct, total_questions, user_id))
+        ahead, participants = cursor.fetchone()
+        
+        return {
+            'rank': ahead + 1,
+            'participants': participants,
+            'tests_taken': tests_taken,
+            'total_correct': total_correct,
+            'total_questions': total_questions,
+            'average_score': score_sum / tests_taken if tests_taken else 0
+        }
+    
+    # ============ QUESTION STATISTICS ============
+    
+    def _record_question_stats(self, cursor, test_id: int, user_answers: List[str], total_count: int):
+        """Yangi javoblardagi tanlovlarni statistikaga qo'shish (chaqiruvchi tranzaksiyasida)"""
+        if len(user_answers) > 1:
+            # Ko'p javob (fayldan import) numpy bilan sanaladi
+            rows = self._choice_rows(test_id, count_choices(user_answers, total_count))
+        else:
+            picks = Counter()
+            for answer in user_answers:
+                for position, choice in enumerate(answer.lower()[:total_count]):
+                    picks[(position, choice)] += 1
+            rows = [(test_id, position, choice, count) for (position, choice), count in picks.items()]
+        
+        cursor.executemany('''
+            INSERT INTO question_stats (test_id, position, choice, picks)
+            VALUES (?, ?, ?, ?)
+            ON CONFLICT(test_id, position, choice) DO UPDATE SET
+                picks = picks + excluded.picks
+        ''', rows)
+    
+    @staticmethod
+    def _choice_rows(test_id: int, totals) -> List[Tuple[int, int, str, int]]:
+        """count_choices natijasini question_stats qatorlariga aylantirish"""
+        return [(test_id, position, choice, count) for position, choice, count in choice_rows(totals)]
+    
+    def _rebuild_question_stats(self, cursor, test_id: int, total_count: int,
+                                batch_size: int = REGRADE_BATCH_SIZE):
+        """Statistikani saqlangan javoblardan vektorli hisoblab qayta yozish"""
+        totals = count_choices([], total_count)
+        last_id = 0
+        
+        table = self._answers_table(test_id)
+        
+        while True:
+            cursor.execute(f'''
+                SELECT id, user_answer FROM {table}
+                WHERE test_id = ? AND id > ?
+                ORDER BY id
+                LIMIT ?
+            ''', (test_id, last_id, batch_size))
+            rows = cursor.fetchall()
+            
+            if not rows:
+                break
+            
+            last_id = rows[-1][0]
+            totals += count_choices([row[1] for row in rows], total_count)
+        
+        cursor.execute('DELETE FROM question_stats WHERE test_id = ?', (test_id,))
+        cursor.executemany('''
+            INSERT INTO question_stats (test_id, position, choice, picks)
+            VALUES (?, ?, ?, ?)
+        ''', self._choice_rows(test_id, totals))
+    
+    def rebuild_question_stats(self, test_id: int) -> bool:
+        """Test statistikasini bitta tranzaksiyada qayta hisoblash"""
+        key = self.get_answer_key(test_id)
+        if key is None:
+            return False
+        
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        try:
+            cursor.execute('BEGIN IMMEDIATE')
+            self._rebuild_question_stats(cursor, test_id, key.total_count)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        
+        return True
+    
+    def get_question_stats(self, test_id: int) -> Optional[List[Dict]]:
+        """Har bir savol bo'yicha statistika (test bo'lmasa None)
+        
+        [{'position': 1, 'correct_answer': 'a', 'answered': ..., 'correct_count': ...,
+          'choices': {'a': ..., 'b': ...}}, ...]
+        """
+        key = self.get_answer_key(test_id)
+        if key is None:
+            return None
+        
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            SELECT position, choice, picks FROM question_stats
+            WHERE test_id = ? AND position < ?
+        ''', (test_id, key.total_count))
+        
+        stats = [
+            {
+                'position': position + 1,
+                'correct_answer': correct_answer,
+                'answered': 0,
+                'correct_count': 0,
+                'choices': {}
+            }
+            for position, correct_answer in enumerate(key.answers)
+        ]
+        for position, choice, picks in cursor.fetchall():
+            item = stats[position]
+            item['choices'][choice] = picks
+            item['answered'] += picks
+            if choice == item['correct_answer']:
+                item['correct_count'] = picks
+        
+        return stats
+    
+    # ============ ARCHIVE OPERATIONS ============
+    
+    def _answers_table(self, test_id: int) -> str:
+        """Test javoblari qaysi jadvalda: arxivlangan bo'lsa arxivda"""
+        if test_id in self._archived_tests:
+            return f'{ARCHIVE_SCHEMA}.user_answers'
+        return 'user_answers'
+    
+    def is_test_archived(self, test_id: int) -> bool:
+        return test_id in self._archived_tests
+    
+    def archive_test(self, test_id: int) -> Optional[Dict]:
+        """Testni yopish va javoblarini arxiv database ga ko'chirish
+        
+        Ikki tranzaksiyada bajariladi: avval javoblar arxivga yoziladi, keyin
+        asosiy jadvaldan faqat arxivda bor qatorlar o'chiriladi va test
+        arxivlangan deb belgilanadi. (WAL rejimida bir nechta database ga
+        yozuvchi tranzaksiya fayllar bo'yicha birgalikda atomar emas.)
+        Oradagi xatoda javoblar ikkala joyda qoladi, test ochiq qoladi va
+        qayta chaqirish xavfsiz. Natija: {'archived': ..., 'already': ...},
+        test bo'lmasa None.
+        """
+        if self.get_answer_key(test_id) is None:
+            return None
+        if test_id in self._archived_tests:
+            return {'archived': 0, 'already': True}
+        
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        try:
+            cursor.execute('BEGIN IMMEDIATE')
+            cursor.execute(f'''
+                INSERT OR REPLACE INTO {ARCHIVE_SCHEMA}.user_answers
+                (id, user_id, test_id, user_answer, correct_count, total_count, score, submitted_at)
+                SELECT id, user_id, test_id, user_answer, correct_count, total_count, score, submitted_at
+                FROM main.user_answers
+                WHERE test_id = ?
+            ''', (test_id,))
+            conn.commit()
+            
+            cursor.execute('BEGIN IMMEDIATE')
+            cursor.execute(f'''
+                DELETE FROM main.user_answers
+                WHERE test_id = ? AND id IN (
+                    SELECT id FROM {ARCHIVE_SCHEMA}.user_answers WHERE test_id = ?
+                )
+            ''', (test_id, test_id))
+            archived = cursor.rowcount
+            cursor.execute('''
+                UPDATE tests SET archived_at = CURRENT_TIMESTAMP WHERE test_id = ?
+            ''', (test_id,))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        
+        self._archived_tests.add(test_id)
+        self._tests_version += 1
+        self._invalidate_leaderboard(test_id)
+        return {'archived': archived, 'already': False}
+    
+    def get_storage_stats(self) -> Dict:
+        """Asosiy database hajmi: {'size': baytlar, 'free': bo'sh sahifalar baytlarda,
+        'incremental': auto_vacuum INCREMENTAL yoqilganmi}"""
+        conn = self.get_connection()
+        
+        page_size = conn.execute('PRAGMA page_size').fetchone()[0]
+        page_count = conn.execute('PRAGMA page_count').fetchone()[0]
+        free_pages = conn.execute('PRAGMA freelist_count').fetchone()[0]
+        auto_vacuum = conn.execute('PRAGMA auto_vacuum').fetchone()[0]
+        
+        return {'size': page_count * page_size, 'free': free_pages * page_size, 'incremental': auto_vacuum == 2}
+    
+    def vacuum_step(self, pages: int = VACUUM_STEP_PAGES) -> int:
+        """Bo'sh sahifalarning bir qismini fayldan qaytarish, qolganlar sonini qaytaradi
+        
+        Qisqa qadamlar orasida boshqa yozuvlar bajarilishi mumkin. auto_vacuum
+        hali INCREMENTAL bo'lmagan eski database da hech narsa qilinmaydi:
+        to'liq VACUUM writer ni butun fayl qayta yozilguncha to'xtatib qo'yadi,
+        shuning uchun u bot to'xtatilganda alohida bajariladi. Bo'sh sahifalar
+        fayl ichida yangi yozuvlar uchun qayta ishlatiladi.
+        """
+        conn = self.get_connection()
+        
+        if conn.execute('PRAGMA auto_vacuum').fetchone()[0] != 2:
+            return 0
+        
+        # execute() bu pragma ni bitta qadam (bitta sahifa) bajaradi, executescript oxirigacha
+        conn.executescript(f'PRAGMA incremental_vacuum({pages})')
+        return conn.execute('PRAGMA freelist_count').fetchone()[0]
+    
+    def checkpoint(self):
+        """WAL ni asosiy faylga yozib, uni qisqartirish"""
+        conn = self.get_connection()
+        conn.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+    
     # ============ CHANNEL OPERATIONS ============
     
     def add_channel(self, channel_id: str, channel_name: str = None):
@@ -223,7 +1028,7 @@ class Database:
         ''', (channel_id, channel_name))
         
         conn.commit()
-        conn.close()
+        self._invalidate_channels()
     
     def remove_channel(self, channel_id: str):
         """Kanalni o'chirish"""
@@ -231,17 +1036,234 @@ class Database:
         cursor = conn.cursor()
         
         cursor.execute('DELETE FROM channels WHERE channel_id = ?', (channel_id,))
+        cursor.execute('DELETE FROM channel_members WHERE channel_id = ?', (channel_id,))
         
         conn.commit()
-        conn.close()
+        self._invalidate_channels()
     
     def get_all_channels(self) -> List[Tuple[str, str]]:
         """Barcha majburiy kanallarni olish"""
+        cached = self.get_cached_channels()
+        if cached is not None:
+            return cached
+        
+        with self._channels_lock:
+            version = self._channels_version
         conn = self.get_connection()
         cursor = conn.cursor()
         
         cursor.execute('SELECT channel_id, channel_name FROM channels')
         channels = [(row[0], row[1]) for row in cursor.fetchall()]
         
-        conn.close()
-        return channels
+        # O'qish paytida kanal qo'shilgan/o'chirilgan bo'lsa, keshlamaymiz
+        with self._channels_lock:
+            if version == self._channels_version:
+                self._channels_cache = channels
+        return list(channels)
+    
+    def get_cached_channels(self) -> Optional[List[Tuple[str, str]]]:
+        """Keshdagi kanallar ro'yxati (kesh bo'sh bo'lsa None)"""
+        channels = self._channels_cache
+        return list(channels) if channels is not None else None
+    
+    @property
+    def channels_version(self) -> int:
+        """Kanallar o'zgarganda oshadigan hisoblagich (tayyor xabarlar keshi uchun)"""
+        return self._channels_version
+    
+    def _invalidate_channels(self):
+        with self._channels_lock:
+            self._channels_version += 1
+            self._channels_cache = None
+    
+    # ============ SUBSCRIPTION STATE OPERATIONS ============
+    
+    def set_channel_member(self, channel_id: str, user_id: int, is_member: bool):
+        """Foydalanuvchining kanaldagi a'zolik holatini saqlash"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            INSERT INTO channel_members (channel_id, user_id, is_member)
+            VALUES (?, ?, ?)
+            ON CONFLICT(channel_id, user_id) DO UPDATE SET
+                is_member = excluded.is_member,
+                updated_at = CURRENT_TIMESTAMP
+        ''', (channel_id, user_id, int(is_member)))
+        
+        conn.commit()
+    
+    def clear_channel_members(self, channel_id: str):
+        """Kanal bo'yicha saqlangan a'zolik holatlarini o'chirish"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute('DELETE FROM channel_members WHERE channel_id = ?', (channel_id,))
+        
+        conn.commit()
+    
+    def get_channel_members(self) -> List[Tuple[str, int, bool]]:
+        """Barcha saqlangan a'zolik holatlarini olish"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute('SELECT channel_id, user_id, is_member FROM channel_members')
+        members = [(row[0], row[1], bool(row[2])) for row in cursor.fetchall()]
+        
+        return members
+    
+    # ============ PERSISTENCE OPERATIONS ============
+    
+    def get_persistence_data(self, kind: str) -> Dict[int, str]:
+        """Saqlangan holatlarni olish: {kalit: JSON}"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute('SELECT key, data FROM persistence_data WHERE kind = ?', (kind,))
+        
+        return {row[0]: row[1] for row in cursor.fetchall()}
+    
+    def get_persistence_entry(self, kind: str, key: int) -> Optional[str]:
+        """Bitta saqlangan holat (JSON) yoki None"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute('SELECT data FROM persistence_data WHERE kind = ? AND key = ?', (kind, key))
+        row = cursor.fetchone()
+        
+        return row[0] if row else None
+    
+    def save_persistence_data(self, rows: List[Tuple[str, int, Optional[str]]]):
+        """Holatlarni bitta tranzaksiyada saqlash (data None bo'lsa o'chiriladi)"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        upserts = [row for row in rows if row[2] is not None]
+        deletes = [row[:2] for row in rows if row[2] is None]
+        
+        try:
+            cursor.execute('BEGIN IMMEDIATE')
+            cursor.executemany('''
+                INSERT INTO persistence_data (kind, key, data)
+                VALUES (?, ?, ?)
+                ON CONFLICT(kind, key) DO UPDATE SET
+                    data = excluded.data,
+                    updated_at = CURRENT_TIMESTAMP
+            ''', upserts)
+            cursor.executemany('DELETE FROM persistence_data WHERE kind = ? AND key = ?', deletes)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+    
+    # ============ BROADCAST OPERATIONS ============
+    
+    def create_broadcast_job(self, text: str, chat_id: int, message_id: int = None) -> int:
+        """Yangi broadcasting vazifasini yaratish"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            INSERT INTO broadcast_jobs (text, chat_id, message_id, total_count)
+            VALUES (?, ?, ?, (SELECT COUNT(*) FROM users WHERE blocked_at IS NULL))
+        ''', (text, chat_id, message_id))
+        
+        conn.commit()
+        return cursor.lastrowid
+    
+    def update_broadcast_progress(self, job_id: int, last_user_id: int, sent_count: int,
+                                  failed_count: int, blocked_count: int):
+        """Broadcasting holatini saqlash (qayta ishga tushganda davom etish uchun)"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            UPDATE broadcast_jobs
+            SET last_user_id = ?, sent_count = ?, failed_count = ?, blocked_count = ?
+            WHERE job_id = ?
+        ''', (last_user_id, sent_count, failed_count, blocked_count, job_id))
+        
+        conn.commit()
+    
+    def record_broadcast_delivery(self, job_id: int, user_id: int, result: str):
+        """Foydalanuvchiga yuborish natijasini saqlash (qayta ishga tushganda takror yuborilmaydi)
+        
+        Botni bloklagan foydalanuvchi shu tranzaksiyada belgilanadi.
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        try:
+            cursor.execute('BEGIN IMMEDIATE')
+            cursor.execute('''
+                INSERT OR IGNORE INTO broadcast_deliveries (job_id, user_id, result)
+                VALUES (?, ?, ?)
+            ''', (job_id, user_id, result))
+            if result == 'blocked':
+                cursor.execute('UPDATE users SET blocked_at = CURRENT_TIMESTAMP WHERE user_id = ?', (user_id,))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+    
+    def get_broadcast_delivered(self, job_id: int, user_ids: List[int]) -> Set[int]:
+        """Berilgan foydalanuvchilardan shu vazifa bo'yicha natijasi saqlanganlari"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            SELECT user_id FROM broadcast_deliveries
+            WHERE job_id = ? AND user_id IN (SELECT value FROM json_each(?))
+        ''', (job_id, json.dumps(user_ids)))
+        
+        return {row[0] for row in cursor.fetchall()}
+    
+    def get_broadcast_counts(self, job_id: int) -> Dict[str, int]:
+        """Vazifa bo'yicha natijalar soni: {'sent': ..., 'failed': ..., 'blocked': ...}"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            SELECT result, COUNT(*) FROM broadcast_deliveries
+            WHERE job_id = ?
+            GROUP BY result
+        ''', (job_id,))
+        
+        return {row[0]: row[1] for row in cursor.fetchall()}
+    
+    def finish_broadcast_job(self, job_id: int, status: str = 'done'):
+        """Broadcasting vazifasini yakunlash (yuborish belgilari endi kerak emas)"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        try:
+            cursor.execute('BEGIN IMMEDIATE')
+            cursor.execute('''
+                UPDATE broadcast_jobs
+                SET status = ?, finished_at = CURRENT_TIMESTAMP
+                WHERE job_id = ?
+            ''', (status, job_id))
+            cursor.execute('DELETE FROM broadcast_deliveries WHERE job_id = ?', (job_id,))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+    
+    def get_broadcast_job(self, job_id: int) -> Optional[Dict]:
+        """Broadcasting vazifasi ma'lumotlarini olish"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute('SELECT * FROM broadcast_jobs WHERE job_id = ?', (job_id,))
+        row = cursor.fetchone()
+        
+        return dict(row) if row else None
+    
+    def get_running_broadcast_jobs(self) -> List[Dict]:
+        """Tugallanmagan broadcasting vazifalarini olish"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute("SELECT * FROM broadcast_jobs WHERE status = 'running' ORDER BY job_id")
+        
+        return [dict(row) for row in cursor.fetchall()]
@@ -0,0 +1,127 @@
+import asyncio
+import csv
+import logging
+import os
+import tempfile
+from typing import Dict, Iterable, Tuple
+
+from telegram.error import TelegramError
+
+from database import Database
+
+try:
+    from openpyxl import Workbook
+except ImportError:  # XLSX ixtiyoriy: openpyxl o'rnatilmagan bo'lsa faqat CSV
+    Workbook = None
+
+logger = logging.getLogger(__name__)
+
+FORMAT_CSV = 'csv'
+FORMAT_XLSX = 'xlsx'
+
+EXPORT_COLUMNS = (
+    "O'rin", 'User ID', 'Username', 'Ism', 'Familiya',
+    "To'g'ri", 'Jami', 'Ball (%)', 'Javoblar', 'Yuborilgan vaqt'
+)
+
+
+def xlsx_available() -> bool:
+    return Workbook is not None
+
+
+def write_csv(rows: Iterable[Tuple], path: str) -> int:
+    """Qatorlarni CSV ga oqim bilan yozish (Excel uchun UTF-8 BOM bilan)"""
+    count = 0
+    with open(path, 'w', newline='', encoding='utf-8-sig') as f:
+        writer = csv.writer(f)
+        writer.writerow(EXPORT_COLUMNS)
+        for row in rows:
+            writer.writerow(row)
+            count += 1
+    return count
+
+
+def write_xlsx(rows: Iterable[Tuple], path: str) -> int:
+    """Qatorlarni XLSX ga write-only rejimda yozish (xotirada saqlanmaydi)"""
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet('Natijalar')
+    sheet.append(EXPORT_COLUMNS)
+    count = 0
+    for row in rows:
+        sheet.append(row)
+        count += 1
+    workbook.save(path)
+    return count
+
+
+def export_test_results(database: Database, test_id: int, path: str, fmt: str = FORMAT_CSV) -> int:
+    """Test natijalarini faylga yozish va qatorlar sonini qaytarish (bloklovchi)"""
+    rows = database.iter_test_results(test_id)
+    try:
+        if fmt == FORMAT_XLSX:
+            return write_xlsx(rows, path)
+        return write_csv(rows, path)
+    finally:
+        rows.close()
+
+
+class ExportManager:
+    """Test natijalarini fonda faylga chiqarib, admin ga hujjat sifatida yuborish.
+
+    Fayl alohida oqimda (asyncio.to_thread) database dan qismlab o'qilib
+    yoziladi, shuning uchun event loop band bo'lmaydi va xotira sarfi
+    natijalar soniga bog'liq emas. Yuborilgandan keyin vaqtinchalik fayl
+    o'chiriladi.
+    """
+
+    def __init__(self, database: Database):
+        self.database = database
+        self._tasks: Dict[Tuple[int, int], asyncio.Task] = {}
+
+    async def start(self, bot, test_id: int, chat_id: int, fmt: str = FORMAT_CSV) -> bool:
+        """Eksportni fonda boshlash (shu test allaqachon eksport qilinayotgan bo'lsa False)"""
+        if (chat_id, test_id) in self._tasks:
+            return False
+        if fmt == FORMAT_XLSX and not xlsx_available():
+            fmt = FORMAT_CSV
+
+        progress = await bot.send_message(chat_id=chat_id, text=f"⏳ Test #{test_id} natijalari tayyorlanmoqda...")
+        task = asyncio.create_task(self._run(bot, test_id, chat_id, fmt, progress.message_id))
+        self._tasks[(chat_id, test_id)] = task
+        task.add_done_callback(lambda _: self._tasks.pop((chat_id, test_id), None))
+        return True
+
+    async def _run(self, bot, test_id: int, chat_id: int, fmt: str, message_id: int):
+        fd, path = tempfile.mkstemp(prefix=f'test_{test_id}_', suffix=f'.{fmt}')
+        os.close(fd)
+        try:
+            count = await asyncio.to_thread(export_test_results, self.database, test_id, path, fmt)
+
+            if not count:
+                await bot.edit_message_text(
+                    chat_id=chat_id, message_id=message_id,
+                    text=f"❌ Test #{test_id} uchun natijalar yo'q."
+                )
+                return
+
+            with open(path, 'rb') as f:
+                await bot.send_document(
+                    chat_id=chat_id,
+                    document=f,
+                    filename=f'test_{test_id}_natijalar.{fmt}',
+                    caption=f"📥 Test #{test_id}: {count} ta natija"
+                )
+            await bot.delete_message(chat_id=chat_id, message_id=message_id)
+        except TelegramError as e:
+            logger.error(f"Test #{test_id} eksportini yuborishda xato: {e}")
+        except Exception as e:
+            logger.error(f"Test #{test_id} eksporti xatosi: {e}")
+            try:
+                await bot.edit_message_text(
+                    chat_id=chat_id, message_id=message_id,
+                    text=f"❌ Test #{test_id} natijalarini eksport qilib bo'lmadi."
+                )
+            except TelegramError:
+                pass
+        finally:
+            os.remove(path)
@@ -0,0 +1,104 @@
+import numpy as np
+
+
+class AnswerKey:
+    """Oldindan tayyorlangan (kompilyatsiya qilingan) javob kaliti.
+
+    Kalit baytlar va butun son ko'rinishida saqlanadi. Foydalanuvchi javobi
+    kalit bilan XOR qilinganda mos kelgan pozitsiyalar nol bayt bo'lib qoladi,
+    shuning uchun to'g'ri javoblar soni nol baytlarni sanash orqali topiladi.
+    """
+
+    __slots__ = ('answers', 'data', 'value', 'total_count', '_array')
+
+    def __init__(self, answers: str):
+        self.answers = answers.lower().strip()
+        self.data = _to_bytes(self.answers)
+        self.value = int.from_bytes(self.data, 'little')
+        self.total_count = len(self.data)
+        self._array = None
+    
+    @property
+    def array(self) -> np.ndarray:
+        """Kalitning uint8 massiv ko'rinishi (matritsali tekshiruv uchun)"""
+        if self._array is None:
+            self._array = np.frombuffer(self.data, dtype=np.uint8)
+        return self._array
+
+    def grade(self, user_answer: str) -> tuple:
+        """Javobni tekshirish va (to'g'ri javoblar soni, savollar soni) qaytarish"""
+        total_count = self.total_count
+        answer = _to_bytes(user_answer.lower().strip())[:total_count]
+        
+        # Qisqa javob nol baytlar bilan to'ldiriladi (kalitda nol bayt yo'q)
+        if len(answer) < total_count:
+            answer = answer.ljust(total_count, b'\0')
+        
+        diff = int.from_bytes(answer, 'little') ^ self.value
+        correct_count = diff.to_bytes(total_count, 'little').count(0)
+        return correct_count, total_count
+
+
+def _to_bytes(text: str) -> bytes:
+    # ASCII bo'lmagan belgilar '?' ga almashtiriladi, pozitsiyalar saqlanadi
+    return text.encode('ascii', 'replace')
+
+
+def compile_key(answers: str) -> AnswerKey:
+    """Javob kalitini tekshirishga tayyorlash"""
+    return AnswerKey(answers)
+
+
+def grade_many(user_answers: list, key: AnswerKey) -> np.ndarray:
+    """Ko'p javoblarni bir vaqtda tekshirish.
+
+    Javoblar kalit uzunligiga keltirilib (qisqalari nol bayt bilan to'ldiriladi)
+    2 o'lchamli uint8 matritsaga joylanadi va kalit qatori bilan solishtiriladi.
+    Har bir javob uchun to'g'ri javoblar sonini qaytaradi.
+    """
+    total_count = key.total_count
+    if not user_answers or total_count == 0:
+        return np.zeros(len(user_answers), dtype=np.int64)
+    
+    matrix = answer_matrix(user_answers, total_count)
+    return np.count_nonzero(matrix == key.array, axis=1)
+
+
+def answer_matrix(user_answers: list, total_count: int) -> np.ndarray:
+    """Javoblarni (javoblar soni x total_count) o'lchamli uint8 matritsaga joylash"""
+    buffer = b''.join(
+        _to_bytes(answer.lower().strip())[:total_count].ljust(total_count, b'\0')
+        for answer in user_answers
+    )
+    return np.frombuffer(buffer, dtype=np.uint8).reshape(len(user_answers), total_count)
+
+
+def count_choices(user_answers: list, total_count: int) -> np.ndarray:
+    """Har bir savol uchun tanlangan variantlar soni.
+
+    (total_count x 256) o'lchamli massiv qaytaradi: [savol, belgi kodi] -> soni.
+    Javob berilmagan savollar 0-ustunga tushadi.
+    """
+    if not user_answers or total_count == 0:
+        return np.zeros((total_count, 256), dtype=np.int64)
+    
+    matrix = answer_matrix(user_answers, total_count)
+    positions = np.arange(total_count, dtype=np.int64) * 256
+    flat = (matrix.astype(np.int64) + positions).ravel()
+    return np.bincount(flat, minlength=total_count * 256).reshape(total_count, 256)
+
+
+def choice_rows(totals: np.ndarray) -> list:
+    """count_choices natijasini (savol, variant, soni) qatorlariga aylantirish"""
+    # 0-ustun - javob berilmagan savollar
+    totals[:, 0] = 0
+    positions, codes = totals.nonzero()
+    return [
+        (position, chr(code), count)
+        for position, code, count in zip(positions.tolist(), codes.tolist(), totals[positions, codes].tolist())
+    ]
+
+
+def check_answer(user_answer: str, correct_answer: str) -> tuple:
+    """Javoblarni tekshirish va to'g'ri javoblar sonini qaytarish"""
+    return compile_key(correct_answer).grade(user_answer)
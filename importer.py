@@ -0,0 +1,248 @@
+import asyncio
+import csv
+import logging
+import os
+import re
+import tempfile
+import time
+from typing import Dict, Iterator, List, Tuple
+
+from telegram.error import TelegramError
+
+from async_database import AsyncDatabase
+from database import (
+    IMPORT_UNKNOWN_USER, IMPORT_UNKNOWN_TEST, IMPORT_DUPLICATE, IMPORT_ALREADY_SUBMITTED,
+    IMPORT_TEST_CLOSED
+)
+
+logger = logging.getLogger(__name__)
+
+# Javob va test kaliti formati: <test_id>*<javoblar>
+ANSWER_RE = re.compile(r'^(\d+)\*([a-zA-Z]+)$')
+
+# Xatolar hisobotida ko'rsatiladigan qatorlar soni
+MAX_REPORTED_ERRORS = 30
+
+
+def iter_lines(path: str) -> Iterator[Tuple[int, str]]:
+    """Faylni qatorma-qator o'qish: (qator raqami, matn)
+
+    Bo'sh qatorlar va # bilan boshlanadigan izohlar o'tkazib yuboriladi.
+    """
+    with open(path, encoding='utf-8-sig', errors='replace') as f:
+        for line_no, line in enumerate(f, 1):
+            line = line.strip()
+            if line and not line.startswith('#'):
+                yield line_no, line
+
+
+def parse_tests(lines: Iterator[Tuple[int, str]]) -> Tuple[Dict[int, str], List[Tuple[int, str]]]:
+    """`id*javoblar` qatorlarini tekshirish
+
+    Natija: ({test_id: javoblar}, [(qator raqami, xato), ...]).
+    Bitta test bir necha marta uchrasa, oxirgisi olinadi.
+    """
+    tests: Dict[int, str] = {}
+    seen: Dict[int, int] = {}
+    errors: List[Tuple[int, str]] = []
+
+    for line_no, line in lines:
+        # CSV dan kelgan qo'shtirnoq va ajratgichlarni olib tashlaymiz
+        match = ANSWER_RE.match(line.strip('"\',; \t'))
+        if not match:
+            errors.append((line_no, f"noto'g'ri format: {line[:40]}"))
+            continue
+
+        test_id = int(match.group(1))
+        if test_id in seen:
+            errors.append((line_no, f"Test #{test_id} {seen[test_id]}-qatorda ham bor, oxirgisi olindi"))
+        seen[test_id] = line_no
+        tests[test_id] = match.group(2).lower()
+
+    return tests, errors
+
+
+def parse_tests_file(path: str) -> Tuple[Dict[int, str], List[Tuple[int, str]]]:
+    return parse_tests(iter_lines(path))
+
+
+def format_errors(errors: List[Tuple[int, str]], limit: int = MAX_REPORTED_ERRORS) -> str:
+    """Qatorlar bo'yicha xatolar hisoboti"""
+    text = ""
+    for line_no, error in errors[:limit]:
+        text += f"• {line_no}-qator: {error}\n"
+    if len(errors) > limit:
+        text += f"... va yana {len(errors) - limit} ta\n"
+    return text
+
+
+async def download_document(document) -> str:
+    """Telegram hujjatini vaqtinchalik faylga yuklab olish (yo'lini qaytaradi)"""
+    fd, path = tempfile.mkstemp(prefix='import_', suffix=os.path.splitext(document.file_name or '')[1])
+    os.close(fd)
+    try:
+        file = await document.get_file()
+        await file.download_to_drive(path)
+    except Exception:
+        os.remove(path)
+        raise
+    return path
+
+
+# ============ ANSWER SHEETS ============
+
+# Qog'oz varaqalar importida bitta tranzaksiyaga yoziladigan qatorlar soni
+SHEET_BATCH_SIZE = 5000
+
+USERNAME_RE = re.compile(r'^@?[A-Za-z][A-Za-z0-9_]{3,31}$')
+SHEET_ANSWERS_RE = re.compile(r'^[a-zA-Z]+$')
+
+SHEET_ERRORS = {
+    IMPORT_UNKNOWN_USER: "foydalanuvchi topilmadi: {}",
+    IMPORT_UNKNOWN_TEST: "Test #{} mavjud emas",
+    IMPORT_DUPLICATE: "{} faylda takrorlangan",
+    IMPORT_ALREADY_SUBMITTED: "{} bu testga allaqachon javob bergan",
+    IMPORT_TEST_CLOSED: "Test #{} yopilgan",
+}
+
+
+def parse_sheet_row(row: List[str]) -> Tuple[object, int, str]:
+    """`user_identifier,test_id,answers` qatorini tekshirish (xato bo'lsa ValueError)"""
+    if len(row) != 3:
+        raise ValueError(f"3 ta ustun kerak, {len(row)} ta bor")
+
+    user_ref, test_id, answers = (value.strip() for value in row)
+    if user_ref.isdigit():
+        user_ref = int(user_ref)
+    elif not USERNAME_RE.match(user_ref):
+        raise ValueError(f"noto'g'ri foydalanuvchi: {user_ref[:40]}")
+    if not test_id.isdigit():
+        raise ValueError(f"noto'g'ri test raqami: {test_id[:20]}")
+    if not SHEET_ANSWERS_RE.match(answers):
+        raise ValueError(f"noto'g'ri javoblar: {answers[:40]}")
+
+    return user_ref, int(test_id), answers
+
+
+def iter_sheet_batches(path: str, batch_size: int = SHEET_BATCH_SIZE) -> Iterator[Tuple[List, List]]:
+    """Faylni oqim bilan o'qib, (qatorlar, xatolar) qismlarini qaytarish
+
+    Qator: (qator raqami, user_id yoki username, test_id, javoblar).
+    Ajratgich birinchi qatordan aniqlanadi (',' yoki ';'), sarlavha qatori
+    o'tkazib yuboriladi.
+    """
+    with open(path, newline='', encoding='utf-8-sig', errors='replace') as f:
+        first_line = f.readline()
+        delimiter = ';' if ';' in first_line and ',' not in first_line else ','
+        f.seek(0)
+
+        reader = csv.reader(f, delimiter=delimiter)
+        rows, errors = [], []
+        for row in reader:
+            line_no = reader.line_num
+            if not any(value.strip() for value in row) or row[0].startswith('#'):
+                continue
+            try:
+                rows.append((line_no,) + parse_sheet_row(row))
+            except ValueError as e:
+                # Birinchi qator sarlavha bo'lishi mumkin
+                if line_no > 1:
+                    errors.append((line_no, str(e)))
+
+            if len(rows) >= batch_size:
+                yield rows, errors
+                rows, errors = [], []
+
+        if rows or errors:
+            yield rows, errors
+
+
+class SheetImportManager:
+    """Qog'oz varaqalardagi javoblarni fayldan fonda import qilish.
+
+    Fayl alohida oqimda qismlab o'qiladi, har bir qism writer oqimida bitta
+    tranzaksiyada vektorli tekshirilib saqlanadi. Admin ga jarayon haqida
+    xabar progress_interval soniyada bir yangilanadi.
+    """
+
+    def __init__(self, db: AsyncDatabase, batch_size: int = SHEET_BATCH_SIZE,
+                 progress_interval: float = 3):
+        self.db = db
+        self.batch_size = batch_size
+        self.progress_interval = progress_interval
+        self._tasks: Dict[int, asyncio.Task] = {}
+
+    def is_running(self, chat_id: int) -> bool:
+        return chat_id in self._tasks
+
+    async def start(self, bot, path: str, chat_id: int):
+        """Importni fonda boshlash (fayl tugagach o'chiriladi)"""
+        progress = await bot.send_message(chat_id=chat_id, text="⏳ Javoblar import qilinmoqda...")
+        task = asyncio.create_task(self._run(bot, path, chat_id, progress.message_id))
+        self._tasks[chat_id] = task
+        task.add_done_callback(lambda _: self._tasks.pop(chat_id, None))
+
+    async def _run(self, bot, path: str, chat_id: int, message_id: int):
+        batches = iter_sheet_batches(path, self.batch_size)
+        counts = {'processed': 0, 'inserted': 0, 'errors': 0}
+        errors: List[Tuple[int, str]] = []
+        started = last_report = time.monotonic()
+
+        try:
+            while True:
+                batch = await asyncio.to_thread(next, batches, None)
+                if batch is None:
+                    break
+
+                rows, parse_errors = batch
+                result = await self.db.import_answer_sheets(rows) if rows else {'inserted': 0, 'errors': []}
+
+                batch_errors = parse_errors + [
+                    (line_no, SHEET_ERRORS[reason].format(value))
+                    for line_no, reason, value in result['errors']
+                ]
+                counts['processed'] += len(rows) + len(parse_errors)
+                counts['inserted'] += result['inserted']
+                counts['errors'] += len(batch_errors)
+                if len(errors) < MAX_REPORTED_ERRORS:
+                    errors.extend(sorted(batch_errors)[:MAX_REPORTED_ERRORS - len(errors)])
+
+                if time.monotonic() - last_report >= self.progress_interval:
+                    last_report = time.monotonic()
+                    await self._report(bot, chat_id, message_id, counts)
+        except Exception as e:
+            logger.error(f"Javoblar importi xatosi: {e}")
+            await self._report(bot, chat_id, message_id, counts, errors, failed=True)
+            return
+        finally:
+            batches.close()
+            os.remove(path)
+
+        elapsed = time.monotonic() - started
+        logger.info(f"Javoblar importi: {counts['processed']} qator, {elapsed:.1f} s")
+        await self._report(bot, chat_id, message_id, counts, errors, finished=True)
+
+    async def _report(self, bot, chat_id: int, message_id: int, counts: Dict,
+                      errors: List[Tuple[int, str]] = None, finished: bool = False, failed: bool = False):
+        """Admin ga jarayon haqidagi xabarni yangilash"""
+        if failed:
+            text = "❌ Import to'xtadi (xatolik)!\n"
+        elif finished:
+            text = "✅ Javoblar import qilindi!\n"
+        else:
+            text = "⏳ Javoblar import qilinmoqda...\n"
+
+        text += (
+            f"Qatorlar: {counts['processed']}\n"
+            f"Saqlangan: {counts['inserted']}\n"
+            f"Xatolar: {counts['errors']}"
+        )
+        if errors:
+            text += "\n\n" + format_errors(errors)
+            if counts['errors'] > len(errors):
+                text += f"... va yana {counts['errors'] - len(errors)} ta\n"
+
+        try:
+            await bot.edit_message_text(chat_id=chat_id, message_id=message_id, text=text)
+        except TelegramError as e:
+            logger.error(f"Import holatini yangilashda xato: {e}")
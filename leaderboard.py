@@ -0,0 +1,58 @@
+import threading
+from bisect import bisect_left, insort
+from typing import Dict, Iterable, List, Optional, Tuple
+
+
+class RankIndex:
+    """Har bir test uchun saralangan natijalar ro'yxati.
+
+    Kalit (-score, submitted_at, id) ko'rinishida bo'lib, get_leaderboard dagi
+    "score DESC, submitted_at ASC" tartibiga mos keladi. O'rin bisect orqali
+    O(log n) da topiladi. Testlar birinchi so'rovda database dan yuklanadi.
+    """
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self._keys: Dict[int, List[Tuple]] = {}
+        self._entries: Dict[int, Dict[int, Tuple]] = {}
+
+    def is_loaded(self, test_id: int) -> bool:
+        return test_id in self._keys
+
+    def load(self, test_id: int, rows: Iterable[Tuple[int, float, str, int]]):
+        """(user_id, score, submitted_at, id) qatorlaridan indeks qurish"""
+        entries = {user_id: (-score, submitted_at, row_id) for user_id, score, submitted_at, row_id in rows}
+        with self.lock:
+            self._entries[test_id] = entries
+            self._keys[test_id] = sorted(entries.values())
+
+    def add(self, test_id: int, user_id: int, score: float, submitted_at: str, row_id: int):
+        """Yangi natijani qo'shish (test yuklanmagan bo'lsa hech narsa qilmaydi)"""
+        with self.lock:
+            entries = self._entries.get(test_id)
+            if entries is None or user_id in entries:
+                return
+
+            key = (-score, submitted_at, row_id)
+            entries[user_id] = key
+            insort(self._keys[test_id], key)
+
+    def rank(self, test_id: int, user_id: int) -> Optional[Tuple[int, int]]:
+        """(o'rin, ishtirokchilar soni) yoki natija bo'lmasa None"""
+        with self.lock:
+            entries = self._entries.get(test_id)
+            if not entries or user_id not in entries:
+                return None
+
+            keys = self._keys[test_id]
+            return bisect_left(keys, entries[user_id]) + 1, len(keys)
+
+    def invalidate(self, test_id: int = None):
+        """Test (yoki barcha testlar) indeksini o'chirish"""
+        with self.lock:
+            if test_id is None:
+                self._keys.clear()
+                self._entries.clear()
+            else:
+                self._keys.pop(test_id, None)
+                self._entries.pop(test_id, None)
@@ -0,0 +1,220 @@
+import asyncio
+import functools
+import threading
+import time
+from typing import Callable, Dict, List, Tuple
+
+from telegram.request import HTTPXRequest
+
+from config import METRICS_ENABLED
+
+# Kechikishlar uchun standart chegaralar (soniyalarda)
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _format_labels(labelnames: Tuple[str, ...], values: Tuple, extra: str = '') -> str:
+    parts = [f'{name}="{value}"' for name, value in zip(labelnames, values)]
+    if extra:
+        parts.append(extra)
+    return '{' + ','.join(parts) + '}' if parts else ''
+
+
+class Metric:
+    """Prometheus metrikalari uchun asosiy sinf"""
+
+    kind = 'untyped'
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def _key(self, labels: Dict) -> Tuple:
+        return tuple(str(labels.get(name, '')) for name in self.labelnames)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self._samples())
+        return lines
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple, float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {value}" for key, value in items]
+
+
+class Gauge(Metric):
+    """Qiymati o'rnatiladigan yoki har so'rovda funksiyadan olinadigan metrika"""
+
+    kind = 'gauge'
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (),
+                 function: Callable[[], Dict[Tuple, float]] = None):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple, float] = {}
+        self._function = function
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def _samples(self) -> List[str]:
+        if self._function is not None:
+            items = list(self._function().items())
+        else:
+            with self._lock:
+                items = list(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {value}" for key, value in items]
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+        self._values: Dict[Tuple, List] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            counts = state[0]
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[index] += 1
+                    break
+            state[1] += value
+            state[2] += 1
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = [(key, list(state[0]), state[1], state[2]) for key, state in self._values.items()]
+
+        lines = []
+        for key, counts, total, count in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                labels = _format_labels(self.labelnames, key, f'le="{bound}"')
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, key, 'le="+Inf"')
+            lines.append(f"{self.name}_bucket{labels} {count}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {total}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {count}")
+        return lines
+
+
+REGISTRY: List[Metric] = []
+
+HANDLER_SECONDS = Histogram(
+    'bot_handler_duration_seconds', 'Handler bajarilish vaqti', ('handler',)
+)
+DB_QUERY_SECONDS = Histogram(
+    'bot_db_query_duration_seconds', 'Database metodlari bajarilish vaqti', ('method',)
+)
+TELEGRAM_API_SECONDS = Histogram(
+    'bot_telegram_api_duration_seconds', 'Telegram Bot API so\'rovlari vaqti', ('method',)
+)
+TELEGRAM_API_REQUESTS = Counter(
+    'bot_telegram_api_requests_total', 'Telegram Bot API so\'rovlari soni', ('method', 'status')
+)
+BROADCAST_MESSAGES = Counter(
+    'bot_broadcast_messages_total', 'Broadcasting orqali yuborilgan xabarlar', ('result',)
+)
+EVENT_LOOP_LAG_SECONDS = Histogram(
+    'bot_event_loop_lag_seconds', 'Event loop kechikishi',
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0)
+)
+
+STARTUP_SECONDS = Gauge(
+    'bot_startup_seconds', 'Ishga tushish bosqichlari tugagan vaqt (importlardan boshlab)', ('phase',)
+)
+
+
+def render() -> str:
+    """Barcha metrikalarni Prometheus text formatida qaytarish"""
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return '\n'.join(lines) + '\n'
+
+
+def timed_handler(func):
+    """Handler vaqtini o'lchovchi dekorator (metrikalar o'chiq bo'lsa funksiyani o'zgartirmaydi)"""
+    if not METRICS_ENABLED:
+        return func
+
+    name = func.__name__
+
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return await func(*args, **kwargs)
+        finally:
+            HANDLER_SECONDS.observe(time.perf_counter() - started, handler=name)
+
+    return wrapper
+
+
+def timed_call(func, histogram: Histogram = DB_QUERY_SECONDS):
+    """Sinxron funksiya vaqtini o'lchaydigan o'ram (database oqimlarida ishlatiladi)"""
+    name = getattr(func, '__name__', 'unknown')
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            histogram.observe(time.perf_counter() - started, method=name)
+
+    return wrapper
+
+
+class InstrumentedRequest(HTTPXRequest):
+    """Har bir Bot API so'rovining soni va vaqtini qayd qiluvchi HTTPX request"""
+
+    async def do_request(self, url, method, request_data=None, *args, **kwargs):
+        endpoint = url.rsplit('/', 1)[-1]
+        started = time.perf_counter()
+        status = 'error'
+        try:
+            code, payload = await super().do_request(url, method, request_data, *args, **kwargs)
+            status = str(code)
+            return code, payload
+        finally:
+            TELEGRAM_API_SECONDS.observe(time.perf_counter() - started, method=endpoint)
+            TELEGRAM_API_REQUESTS.inc(method=endpoint, status=status)
+
+
+async def monitor_event_loop_lag(interval: float = 0.5):
+    """Event loop kechikishini o'lchash: uxlash kutilganidan qancha kech tugashi"""
+    loop = asyncio.get_running_loop()
+    while True:
+        started = loop.time()
+        await asyncio.sleep(interval)
+        EVENT_LOOP_LAG_SECONDS.observe(max(0.0, loop.time() - started - interval))
@@ -0,0 +1,319 @@
+"""
+Database sxemasi migratsiyalari.
+
+Joriy versiya `PRAGMA user_version` da saqlanadi. Har bir migratsiya
+o'z tranzaksiyasida bajariladi va versiyani oshiradi, shuning uchun
+faqat yetishmayotgan qadamlar qo'llaniladi. Migratsiyalar versiya
+paydo bo'lishidan oldin init_db yaratgan bazalarda ham xatosiz
+ishlashi uchun idempotent yozilgan (IF NOT EXISTS, ustunni tekshirish).
+
+Yangi o'zgarish faqat ro'yxat oxiriga yangi funksiya sifatida qo'shiladi,
+mavjud migratsiyalar o'zgartirilmaydi.
+"""
+import logging
+import sqlite3
+from typing import Callable, List, Tuple
+
+from grading import choice_rows, compile_key, count_choices
+
+logger = logging.getLogger(__name__)
+
+# Mavjud javoblardan statistikani to'ldirishda bir martada o'qiladigan javoblar soni
+BACKFILL_BATCH_SIZE = 5000
+
+
+def _table_exists(cursor, name: str) -> bool:
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (name,))
+    return cursor.fetchone() is not None
+
+
+def _column_exists(cursor, table: str, column: str) -> bool:
+    cursor.execute(f'PRAGMA table_info({table})')
+    return column in [row[1] for row in cursor.fetchall()]
+
+
+def create_core_tables(cursor):
+    """Foydalanuvchilar, testlar, javoblar va kanallar jadvallari"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS users (
+            user_id INTEGER PRIMARY KEY,
+            username TEXT,
+            first_name TEXT,
+            last_name TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+    # Admin tomonidan kiritilgan to'g'ri javoblar
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS tests (
+            test_id INTEGER PRIMARY KEY,
+            answers TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            created_by INTEGER,
+            FOREIGN KEY (created_by) REFERENCES users(user_id)
+        )
+    ''')
+
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS user_answers (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            test_id INTEGER NOT NULL,
+            user_answer TEXT NOT NULL,
+            correct_count INTEGER NOT NULL,
+            total_count INTEGER NOT NULL,
+            score REAL NOT NULL,
+            submitted_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users(user_id),
+            FOREIGN KEY (test_id) REFERENCES tests(test_id),
+            UNIQUE(user_id, test_id)
+        )
+    ''')
+
+    # Majburiy kanallar
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS channels (
+            channel_id TEXT PRIMARY KEY,
+            channel_name TEXT,
+            added_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+
+def add_leaderboard_index(cursor):
+    """Leaderboard tartibini (score DESC, submitted_at ASC) qoplovchi indeks
+
+    (test_id, score DESC, submitted_at) indeksining o'zi ham shu, qolgan
+    ustunlar top-N va o'rinlarni jadvalga murojaatsiz o'qish uchun.
+    """
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_user_answers_leaderboard
+        ON user_answers (test_id, score DESC, submitted_at, id, user_id, correct_count, total_count)
+    ''')
+
+
+def create_channel_members(cursor):
+    """Kanal a'zoligi holati (chat_member yangilanishlaridan)"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS channel_members (
+            channel_id TEXT NOT NULL,
+            user_id INTEGER NOT NULL,
+            is_member INTEGER NOT NULL,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (channel_id, user_id)
+        )
+    ''')
+
+
+def _backfill_question_stats(cursor, test_id: int, answers: str):
+    """Bitta testning saqlangan javoblaridan statistikani hisoblash"""
+    total_count = compile_key(answers).total_count
+    totals = count_choices([], total_count)
+    last_id = 0
+    while True:
+        cursor.execute('''
+            SELECT id, user_answer FROM user_answers
+            WHERE test_id = ? AND id > ?
+            ORDER BY id
+            LIMIT ?
+        ''', (test_id, last_id, BACKFILL_BATCH_SIZE))
+        rows = cursor.fetchall()
+        if not rows:
+            break
+        last_id = rows[-1][0]
+        totals += count_choices([row[1] for row in rows], total_count)
+
+    cursor.executemany('''
+        INSERT INTO question_stats (test_id, position, choice, picks)
+        VALUES (?, ?, ?, ?)
+    ''', [(test_id, position, choice, count) for position, choice, count in choice_rows(totals)])
+
+
+def create_question_stats(cursor):
+    """Savollar bo'yicha statistika: har bir savolda qaysi variant necha marta tanlangan"""
+    if not _table_exists(cursor, 'question_stats'):
+        cursor.execute('''
+            CREATE TABLE question_stats (
+                test_id INTEGER NOT NULL,
+                position INTEGER NOT NULL,
+                choice TEXT NOT NULL,
+                picks INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (test_id, position, choice)
+            ) WITHOUT ROWID
+        ''')
+        # Mavjud javoblardan to'ldirish (javobsiz testlar o'tkazib yuboriladi)
+        cursor.execute('''
+            SELECT test_id, answers FROM tests
+            WHERE test_id IN (SELECT DISTINCT test_id FROM user_answers)
+        ''')
+        for test_id, answers in cursor.fetchall():
+            _backfill_question_stats(cursor, test_id, answers)
+
+
+def create_user_totals(cursor):
+    """Foydalanuvchilarning barcha testlar bo'yicha jamlangan natijalari"""
+    if not _table_exists(cursor, 'user_totals'):
+        cursor.execute('''
+            CREATE TABLE user_totals (
+                user_id INTEGER PRIMARY KEY,
+                tests_taken INTEGER NOT NULL DEFAULT 0,
+                total_correct INTEGER NOT NULL DEFAULT 0,
+                total_questions INTEGER NOT NULL DEFAULT 0,
+                score_sum REAL NOT NULL DEFAULT 0
+            )
+        ''')
+        # Mavjud javoblardan to'ldirish
+        cursor.execute('''
+            INSERT INTO user_totals (user_id, tests_taken, total_correct, total_questions, score_sum)
+            SELECT user_id, COUNT(*), SUM(correct_count), SUM(total_count), SUM(score)
+            FROM user_answers
+            GROUP BY user_id
+        ''')
+
+    # Umumiy reyting tartibini (total_correct DESC, total_questions ASC) qoplovchi indeks
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_user_totals_rank
+        ON user_totals (total_correct DESC, total_questions, user_id)
+    ''')
+
+
+def add_users_blocked_at(cursor):
+    """Botni bloklagan foydalanuvchilar belgisi"""
+    if not _column_exists(cursor, 'users', 'blocked_at'):
+        cursor.execute('ALTER TABLE users ADD COLUMN blocked_at TIMESTAMP')
+
+
+def create_broadcast_jobs(cursor):
+    """Broadcasting vazifalari va ularning holati"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS broadcast_jobs (
+            job_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            text TEXT NOT NULL,
+            chat_id INTEGER NOT NULL,
+            message_id INTEGER,
+            status TEXT NOT NULL DEFAULT 'running',
+            last_user_id INTEGER NOT NULL DEFAULT 0,
+            total_count INTEGER NOT NULL DEFAULT 0,
+            sent_count INTEGER NOT NULL DEFAULT 0,
+            failed_count INTEGER NOT NULL DEFAULT 0,
+            blocked_count INTEGER NOT NULL DEFAULT 0,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            finished_at TIMESTAMP
+        )
+    ''')
+
+
+def add_username_index(cursor):
+    """username bo'yicha qidiruv (qog'oz varaqalar importida @username ni topish)"""
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_users_username ON users (lower(username))')
+
+
+def create_persistence_data(cursor):
+    """Bot holati (user_data, chat_data, bot_data) - JSON ko'rinishida"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS persistence_data (
+            kind TEXT NOT NULL,
+            key INTEGER NOT NULL,
+            data TEXT NOT NULL,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (kind, key)
+        ) WITHOUT ROWID
+    ''')
+
+
+def add_tests_archived_at(cursor):
+    """Yopilgan (javoblari arxivga ko'chirilgan) testlar belgisi"""
+    if not _column_exists(cursor, 'tests', 'archived_at'):
+        cursor.execute('ALTER TABLE tests ADD COLUMN archived_at TIMESTAMP')
+
+
+def create_broadcast_deliveries(cursor):
+    """Broadcasting vazifasi bo'yicha xabar yuborilgan (yoki yuborib bo'lmagan) foydalanuvchilar"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS broadcast_deliveries (
+            job_id INTEGER NOT NULL,
+            user_id INTEGER NOT NULL,
+            result TEXT NOT NULL,
+            PRIMARY KEY (job_id, user_id)
+        ) WITHOUT ROWID
+    ''')
+
+
+# (versiya, nomi, funksiya) - tartib muhim, faqat oxiriga qo'shiladi
+MIGRATIONS: List[Tuple[int, str, Callable]] = [
+    (1, 'core_tables', create_core_tables),
+    (2, 'leaderboard_index', add_leaderboard_index),
+    (3, 'channel_members', create_channel_members),
+    (4, 'question_stats', create_question_stats),
+    (5, 'user_totals', create_user_totals),
+    (6, 'users_blocked_at', add_users_blocked_at),
+    (7, 'broadcast_jobs', create_broadcast_jobs),
+    (8, 'username_index', add_username_index),
+    (9, 'persistence_data', create_persistence_data),
+    (10, 'tests_archived_at', add_tests_archived_at),
+    (11, 'broadcast_deliveries', create_broadcast_deliveries),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def get_version(conn: sqlite3.Connection) -> int:
+    return conn.execute('PRAGMA user_version').fetchone()[0]
+
+
+def migrate(conn: sqlite3.Connection) -> int:
+    """Yetishmayotgan migratsiyalarni qo'llash va joriy versiyani qaytarish"""
+    version = get_version(conn)
+    if version >= LATEST_VERSION:
+        return version
+
+    cursor = conn.cursor()
+    for target, name, func in MIGRATIONS:
+        if target <= version:
+            continue
+
+        try:
+            cursor.execute('BEGIN IMMEDIATE')
+            # Boshqa jarayon shu vaqtda migratsiya qilgan bo'lishi mumkin
+            if get_version(conn) >= target:
+                conn.rollback()
+                continue
+            func(cursor)
+            cursor.execute(f'PRAGMA user_version = {target}')
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+
+        logger.info(f"Migratsiya {target} ({name}) qo'llandi")
+        version = target
+
+    return version
+
+
+def create_archive_tables(conn: sqlite3.Connection, schema: str):
+    """Ulangan (ATTACH) arxiv database jadvallari
+
+    Arxiv alohida fayl bo'lgani uchun versiyalanmaydi, har safar
+    IF NOT EXISTS bilan tekshiriladi. id asosiy jadvaldagi bilan bir xil,
+    shuning uchun ko'chirishni takrorlash xavfsiz.
+    """
+    conn.execute(f'''
+        CREATE TABLE IF NOT EXISTS {schema}.user_answers (
+            id INTEGER PRIMARY KEY,
+            user_id INTEGER NOT NULL,
+            test_id INTEGER NOT NULL,
+            user_answer TEXT NOT NULL,
+            correct_count INTEGER NOT NULL,
+            total_count INTEGER NOT NULL,
+            score REAL NOT NULL,
+            submitted_at TIMESTAMP,
+            archived_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    conn.execute(f'''
+        CREATE INDEX IF NOT EXISTS {schema}.idx_archive_leaderboard
+        ON user_answers (test_id, score DESC, submitted_at, id, user_id, correct_count, total_count)
+    ''')
+    conn.commit()
@@ -0,0 +1,185 @@
+import asyncio
+import json
+import logging
+from typing import Dict, Iterable, Optional, Tuple
+
+from telegram.ext import BasePersistence, PersistenceInput
+
+from async_database import AsyncDatabase
+
+logger = logging.getLogger(__name__)
+
+USER_DATA = 'user'
+CHAT_DATA = 'chat'
+BOT_DATA = 'bot'
+
+# bot_data bitta yozuv sifatida shu kalit bilan saqlanadi
+BOT_DATA_KEY = 0
+
+# Bo'sh holat saqlanmaydi (yozuv o'chiriladi)
+EMPTY = '{}'
+
+
+class SQLitePersistence(BasePersistence):
+    """user_data, chat_data va bot_data ni asosiy SQLite database da saqlash.
+
+    Application har update_interval soniyada faqat ishlatilgan
+    foydalanuvchi/chatlar uchun update_*_data ni chaqiradi. Bu yerda holat
+    JSON ga aylantirilib oxirgi saqlangan qiymat bilan solishtiriladi:
+    o'zgarmaganlari tashlab yuboriladi, o'zgarganlari yig'ilib writer
+    oqimida bitta tranzaksiyada yoziladi. Shuning uchun oddiy
+    foydalanuvchilar (bo'sh user_data) database ga umuman yozilmaydi.
+
+    Holat JSON da saqlanadi: lug'at kalitlari qayta yuklanganda satrga
+    aylanadi, qiymatlar JSON ga mos bo'lishi kerak. Callback data va
+    ConversationHandler holatlari saqlanmaydi (bot ularni ishlatmaydi).
+
+    shared_user_ids dagi foydalanuvchilar (admin) holati bir nechta bot
+    nusxasi orasida umumiy: har bir yangilanishdan oldin database dan
+    qayta o'qiladi (bitta indeksli so'rov), save_user_data_now() bilan
+    darhol yoziladi. Qolgan holatlar faqat shu jarayonda o'zgaradi deb
+    hisoblanadi.
+    """
+
+    def __init__(self, db: AsyncDatabase, update_interval: float = 5, shared_user_ids: Iterable[int] = ()):
+        super().__init__(store_data=PersistenceInput(callback_data=False), update_interval=update_interval)
+        self.db = db
+        self.shared_user_ids = set(shared_user_ids)
+        self._saved: Dict[Tuple[str, int], str] = {}
+        self._pending: Dict[Tuple[str, int], Optional[str]] = {}
+        self._flush_task: Optional[asyncio.Task] = None
+        self._flush_lock = asyncio.Lock()
+        self.written = 0
+        self.skipped = 0
+
+    async def _load(self, kind: str) -> Dict[int, dict]:
+        data = {}
+        for key, payload in (await self.db.get_persistence_data(kind)).items():
+            self._saved[(kind, key)] = payload
+            data[key] = json.loads(payload)
+        return data
+
+    def _stage(self, kind: str, key: int, payload: Optional[str]):
+        """O'zgarishni navbatga qo'shish (oxirgi saqlangan qiymatdan farq qilsa)"""
+        entry = (kind, key)
+        current = self._pending[entry] if entry in self._pending else self._saved.get(entry)
+        if payload == current:
+            self.skipped += 1
+            return
+
+        if payload == self._saved.get(entry):
+            # Saqlangan holatga qaytdi - yozish shart emas
+            self._pending.pop(entry, None)
+            return
+
+        self._pending[entry] = payload
+        if self._flush_task is None or self._flush_task.done():
+            # update_*_data chaqiruvlari bir vaqtda keladi, yozish ulardan keyin bajariladi
+            self._flush_task = asyncio.create_task(self._flush())
+
+    def _update(self, kind: str, key: int, data: dict):
+        try:
+            payload = json.dumps(data, ensure_ascii=False, separators=(',', ':'))
+        except (TypeError, ValueError) as e:
+            logger.error(f"{kind} {key} holatini saqlab bo'lmadi: {e}")
+            return
+        self._stage(kind, key, None if payload == EMPTY else payload)
+
+    async def _flush(self):
+        async with self._flush_lock:
+            while self._pending:
+                rows, self._pending = self._pending, {}
+                try:
+                    await self.db.save_persistence_data(
+                        [(kind, key, payload) for (kind, key), payload in rows.items()]
+                    )
+                except Exception as e:
+                    logger.error(f"Bot holatini saqlashda xato: {e}")
+                    # Keyingi urinishda saqlash uchun qaytaramiz (yangi o'zgarishlar ustun)
+                    rows.update(self._pending)
+                    self._pending = rows
+                    return
+
+                for entry, payload in rows.items():
+                    if payload is None:
+                        self._saved.pop(entry, None)
+                    else:
+                        self._saved[entry] = payload
+                self.written += len(rows)
+
+    # ============ LOAD ============
+
+    async def get_user_data(self) -> Dict[int, dict]:
+        return await self._load(USER_DATA)
+
+    async def get_chat_data(self) -> Dict[int, dict]:
+        return await self._load(CHAT_DATA)
+
+    async def get_bot_data(self) -> dict:
+        return (await self._load(BOT_DATA)).get(BOT_DATA_KEY, {})
+
+    async def get_callback_data(self) -> None:
+        return None
+
+    async def get_conversations(self, name: str) -> Dict:
+        return {}
+
+    # ============ UPDATE ============
+
+    async def update_user_data(self, user_id: int, data: dict):
+        self._update(USER_DATA, user_id, data)
+
+    async def update_chat_data(self, chat_id: int, data: dict):
+        self._update(CHAT_DATA, chat_id, data)
+
+    async def update_bot_data(self, data: dict):
+        self._update(BOT_DATA, BOT_DATA_KEY, data)
+
+    async def update_callback_data(self, data) -> None:
+        pass
+
+    async def update_conversation(self, name: str, key, new_state) -> None:
+        pass
+
+    async def drop_user_data(self, user_id: int):
+        self._stage(USER_DATA, user_id, None)
+
+    async def drop_chat_data(self, chat_id: int):
+        self._stage(CHAT_DATA, chat_id, None)
+
+    async def save_user_data_now(self, user_id: int, data: dict):
+        """Holatni intervalni kutmasdan saqlash (boshqa nusxa keyingi xabarda ko'radi)"""
+        self._update(USER_DATA, user_id, data)
+        await self._flush()
+
+    async def refresh_user_data(self, user_id: int, user_data: dict):
+        """Umumiy foydalanuvchi holatini boshqa nusxa yozgan qiymat bilan yangilash"""
+        entry = (USER_DATA, user_id)
+        # Saqlanmagan o'zimizdagi o'zgarish ustun
+        if user_id not in self.shared_user_ids or entry in self._pending:
+            return
+
+        payload = await self.db.get_persistence_entry(USER_DATA, user_id)
+        if payload == self._saved.get(entry):
+            return
+
+        user_data.clear()
+        if payload is None:
+            self._saved.pop(entry, None)
+        else:
+            user_data.update(json.loads(payload))
+            self._saved[entry] = payload
+
+    # Qolgan holatlar faqat shu jarayon xotirasida o'zgaradi, qayta o'qish shart emas
+
+    async def refresh_chat_data(self, chat_id: int, chat_data: dict):
+        pass
+
+    async def refresh_bot_data(self, bot_data: dict):
+        pass
+
+    async def flush(self):
+        """To'xtashdan oldin navbatdagi barcha o'zgarishlarni saqlash"""
+        if self._flush_task is not None:
+            await self._flush_task
+        await self._flush()
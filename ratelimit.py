@@ -0,0 +1,107 @@
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Dict
+
+
+class TokenBucket:
+    """Token bucket tezlik cheklovchisi.
+
+    Bucket soniyasiga `rate` ta token bilan to'ladi va ko'pi bilan `capacity`
+    ta token saqlaydi. Har bir amal bitta token sarflaydi.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated_at = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def _refill(self, now: float):
+        elapsed = now - self._updated_at
+        if elapsed > 0:
+            self._tokens = min(self.capacity, self._tokens + elapsed * self.rate)
+            self._updated_at = now
+
+    def try_acquire(self, tokens: float = 1) -> bool:
+        """Token bo'lsa darhol oladi, bo'lmasa False qaytaradi (kutmaydi)"""
+        now = time.monotonic()
+        if now < self._paused_until:
+            return False
+
+        self._refill(now)
+        if self._tokens >= tokens:
+            self._tokens -= tokens
+            return True
+        return False
+
+    async def acquire(self, tokens: float = 1):
+        """Token bo'shaguncha kutish"""
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self._paused_until:
+                    await asyncio.sleep(self._paused_until - now)
+                    continue
+
+                self._refill(now)
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+
+                await asyncio.sleep((tokens - self._tokens) / self.rate)
+
+    def pause(self, seconds: float):
+        """Bucketni vaqtincha to'xtatish (masalan, RetryAfter kelganda)"""
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+        self._updated_at = self._paused_until
+        self._tokens = 0
+
+
+class UserRateLimiter:
+    """Har bir foydalanuvchi uchun alohida token bucket (kutmasdan tekshiriladi).
+
+    Foydalanuvchi soniyasiga `rate` ta va ketma-ket ko'pi bilan `burst` ta
+    amal bajara oladi. Xotira max_users bilan cheklanadi: eng uzoq vaqt
+    faol bo'lmaganlar o'chiriladi (ular to'liq bucket bilan qaytadi).
+    """
+
+    def __init__(self, rate: float, burst: float, max_users: int = 100000):
+        self.rate = rate
+        self.burst = burst
+        self.max_users = max_users
+        # user_id -> [tokens, updated_at]
+        self._buckets = OrderedDict()
+        self.allowed = 0
+        self.limited = 0
+
+    def allow(self, user_id: int) -> bool:
+        """Amalga ruxsat bo'lsa True (bitta token sarflanadi)"""
+        now = time.monotonic()
+        bucket = self._buckets.get(user_id)
+
+        if bucket is None:
+            bucket = self._buckets[user_id] = [self.burst, now]
+            while len(self._buckets) > self.max_users:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(user_id)
+            bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+            bucket[1] = now
+
+        if bucket[0] >= 1:
+            bucket[0] -= 1
+            self.allowed += 1
+            return True
+
+        self.limited += 1
+        return False
+
+    def stats(self) -> Dict:
+        return {
+            'users': len(self._buckets),
+            'allowed': self.allowed,
+            'limited': self.limited,
+        }
@@ -0,0 +1,53 @@
+import threading
+from collections import OrderedDict
+from typing import Any, Hashable, List, Optional, Sequence, Tuple
+
+
+class RenderCache:
+    """Tayyor (render qilingan) xabarlar keshi.
+
+    Har bir yozuv o'zi qurilgan paytdagi kontent versiyasi bilan saqlanadi.
+    Versiya o'zgarsa (test yoki kanal qo'shilsa/o'chirilsa) yozuv eskirgan
+    hisoblanadi va qayta quriladi, shuning uchun alohida tozalash kerak emas.
+    Yozuvlar soni max_size bilan cheklangan (LRU).
+    """
+
+    def __init__(self, max_size: int = 512):
+        self.max_size = max_size
+        self._entries: 'OrderedDict[Hashable, Tuple[Any, Any]]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable, version) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != version:
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key: Hashable, version, value: Any):
+        with self._lock:
+            self._entries[key] = (version, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> dict:
+        return {'hits': self.hits, 'misses': self.misses, 'size': len(self._entries)}
+
+
+def paginate(items: Sequence, page: int, page_size: int) -> Tuple[List, int, int]:
+    """Ro'yxatning bitta sahifasi: (elementlar, sahifa raqami, sahifalar soni)
+
+    Sahifalar 0 dan boshlanadi; chegaradan tashqaridagi raqam eng yaqin
+    mavjud sahifaga keltiriladi.
+    """
+    pages = max(1, (len(items) + page_size - 1) // page_size)
+    page = min(max(page, 0), pages - 1)
+    start = page * page_size
+    return list(items[start:start + page_size]), page, pages
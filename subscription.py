@@ -0,0 +1,128 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Dict, Iterable, List, Tuple
+
+
+class MembershipCache:
+    """(user_id, channel_id) juftligi uchun obuna holatini saqlovchi TTL + LRU kesh.
+
+    Obuna bo'lganlar (positive_ttl) va obuna bo'lmaganlar (negative_ttl) uchun
+    alohida yashash muddati beriladi. Hajm max_size dan oshsa, eng uzoq vaqt
+    ishlatilmagan yozuvlar o'chiriladi.
+    """
+
+    def __init__(self, positive_ttl: float = 300, negative_ttl: float = 30, max_size: int = 50000):
+        self.positive_ttl = positive_ttl
+        self.negative_ttl = negative_ttl
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, user_id: int, channel_id: str) -> Optional[bool]:
+        """Keshdagi holatni qaytarish (yo'q yoki eskirgan bo'lsa None)"""
+        key = (user_id, channel_id)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            is_member, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return is_member
+
+    def set(self, user_id: int, channel_id: str, is_member: bool):
+        """Obuna holatini keshga yozish"""
+        ttl = self.positive_ttl if is_member else self.negative_ttl
+        key = (user_id, channel_id)
+        with self._lock:
+            self._entries[key] = (is_member, time.monotonic() + ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate_channel(self, channel_id: str):
+        """Bitta kanalga tegishli barcha yozuvlarni o'chirish"""
+        with self._lock:
+            stale = [key for key in self._entries if key[1] == channel_id]
+            for key in stale:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict:
+        """Kesh statistikasi"""
+        with self._lock:
+            return {
+                'size': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+            }
+
+
+class SubscriptionTracker:
+    """chat_member yangilanishlaridan yig'ilgan mahalliy a'zolik holati.
+
+    Faqat bot admin bo'lgan ("kuzatiladigan") kanallar uchun javob beradi, chunki
+    Telegram chat_member yangilanishlarini faqat shunday kanallarga yuboradi.
+    Noma'lum juftliklar uchun None qaytariladi va API ga murojaat qilinadi.
+    """
+
+    def __init__(self):
+        self._members = {}
+        self._tracked_channels = set()
+
+    def load(self, rows: Iterable[Tuple[str, int, bool]]):
+        """Database dan o'qilgan holatlarni yuklash"""
+        self._members = {(channel_id, user_id): is_member for channel_id, user_id, is_member in rows}
+
+    def lookup(self, channel_id: str, user_id: int) -> Optional[bool]:
+        """A'zolik holati (kanal kuzatilmasa yoki juftlik noma'lum bo'lsa None)"""
+        if channel_id not in self._tracked_channels:
+            return None
+        return self._members.get((channel_id, user_id))
+
+    def record(self, channel_id: str, user_id: int, is_member: bool):
+        self._members[(channel_id, user_id)] = is_member
+
+    def is_tracked(self, channel_id: str) -> bool:
+        return channel_id in self._tracked_channels
+
+    def set_tracked(self, channel_id: str, tracked: bool):
+        """Bot kanalda admin bo'lgan/bo'lmaganini belgilash"""
+        if tracked:
+            self._tracked_channels.add(channel_id)
+        else:
+            self._tracked_channels.discard(channel_id)
+            self.forget_channel(channel_id)
+
+    def forget_channel(self, channel_id: str):
+        """Kanal bo'yicha barcha holatlarni unutish"""
+        self._tracked_channels.discard(channel_id)
+        self._members = {key: value for key, value in self._members.items() if key[0] != channel_id}
+
+
+def match_channel(chat, channel_ids: List[str]) -> Optional[str]:
+    """Telegram chat obyektiga mos keluvchi majburiy kanal ID sini topish.
+
+    Kanallar @username yoki raqamli ID ko'rinishida saqlanadi.
+    """
+    username = f"@{chat.username}".lower() if chat.username else None
+    for channel_id in channel_ids:
+        if channel_id == str(chat.id) or (username and channel_id.lower() == username):
+            return channel_id
+    return None